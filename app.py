@@ -8,13 +8,22 @@ from datetime import timedelta
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from backend.config import get_config
-from backend.utils.database import init_db
+from backend.utils.database import init_db, init_app as init_db_app, get_pool_stats
+from backend.utils.idempotency import configure_idempotency, get_idempotency_stats
+from backend.utils.cache import configure_cache, get_cache_stats
 from backend.blueprints.auth import auth_bp
 from backend.blueprints.doctors import doctors_bp
 from backend.blueprints.appointments import appointments_bp
 from backend.blueprints.chatbot import chatbot_bp
 from backend.blueprints.admin import admin_bp
 from backend import mail
+from backend.services.analytics_service import AnalyticsService
+from backend.services.appointment_service import AppointmentService
+from backend.services.availability_worker import AvailabilityWorker
+from backend.services.llm_client import configure_llm_client, get_llm_stats
+from backend.services.slot_hold_service import SlotHoldService
+from backend.services.suggest_service import SuggestService
+from backend.services.waitlist_service import WaitlistService
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +45,8 @@ def create_app():
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
 
     mail.init_app(app)
+    init_db_app(app)
+    configure_cache(app.config)
     if not (app.config.get("MAIL_USERNAME") and app.config.get("MAIL_PASSWORD")):
         logger.warning("Email not configured: set GMAIL_SENDER and GMAIL_PASSWORD in .env to send OTP/verification emails")
 
@@ -143,7 +154,37 @@ def create_app():
     # Health check
     @app.route('/api/health')
     def health():
-        return jsonify({'status': 'healthy', 'app': 'MedSync AI'})
+        return jsonify({
+            'status': 'healthy',
+            'app': 'MedSync AI',
+            'db_pool': get_pool_stats(),
+            'availability_worker': AvailabilityWorker.stats(),
+            'slot_holds': SlotHoldService.stats(),
+            'waitlist': WaitlistService.stats(),
+            'idempotency': get_idempotency_stats(),
+            'response_cache': get_cache_stats(),
+            'suggest_index': SuggestService.stats(),
+            'llm_client': get_llm_stats()
+        })
+
+    # Typeahead prefix index, rebuilt in the background after doctor changes
+    with app.app_context():
+        SuggestService.build()
+        # Analytics rollups for appointments booked before the table existed (no-op afterwards)
+        AnalyticsService.backfill()
+
+    # One pooled OpenRouter client per process, shared by every chat request
+    configure_llm_client(app.config)
+
+    # Idempotency-Key retention (IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES)
+    configure_idempotency(app.config)
+
+    # Keep the rolling availability horizon precomputed off the request path
+    AvailabilityWorker.start(app.config['AVAILABILITY_HORIZON_DAYS'], app.config['AVAILABILITY_REFRESH_INTERVAL'])
+    WaitlistService.OFFER_TTL_SECONDS = app.config['WAITLIST_OFFER_TTL_SECONDS']
+    AppointmentService.PROPOSAL_TTL_SECONDS = app.config['EMERGENCY_PROPOSAL_TTL_SECONDS']
+    SlotHoldService.add_expiry_listener(WaitlistService.handle_expired_holds)
+    SlotHoldService.start_sweeper(app.config['SLOT_HOLD_TTL_SECONDS'])
 
     return app
 
@@ -1,6 +1,10 @@
+from datetime import date, timedelta
 from flask import Blueprint, request, session
 from backend.services.admin_service import AdminService
+from backend.services.analytics_service import AnalyticsService
 from backend.services.auth_service import AuthService
+from backend.utils.pagination import page_args
+from backend.utils.streaming import EXPORT_FORMATS, stream_query
 from backend.utils.helpers import success_response, error_response, admin_required, validate_required_fields
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
@@ -40,9 +44,15 @@ def get_stats():
 @admin_bp.route('/doctors', methods=['GET'])
 @admin_required
 def get_doctors():
-    """Get all registered doctors."""
-    doctors = AdminService.get_all_doctors()
-    return success_response(doctors)
+    """Get registered doctors, newest first."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        doctors, next_cursor = AdminService.get_all_doctors(limit, cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(doctors, next_cursor=next_cursor)
 
 
 @admin_bp.route('/doctors', methods=['POST'])
@@ -82,9 +92,15 @@ def delete_doctor(doctor_id):
 @admin_bp.route('/patients', methods=['GET'])
 @admin_required
 def get_patients():
-    """Get all registered patients."""
-    patients = AdminService.get_all_patients()
-    return success_response(patients)
+    """Get registered patients, newest first."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        patients, next_cursor = AdminService.get_all_patients(limit, cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(patients, next_cursor=next_cursor)
 
 
 @admin_bp.route('/patients/<int:patient_id>', methods=['DELETE'])
@@ -100,17 +116,61 @@ def delete_patient(patient_id):
 @admin_bp.route('/appointments', methods=['GET'])
 @admin_required
 def get_appointments():
-    """Get recent appointments."""
-    appointments = AdminService.get_all_appointments()
-    return success_response(appointments)
+    """Get appointments, newest first."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        appointments, next_cursor = AdminService.get_all_appointments(limit, cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(appointments, next_cursor=next_cursor)
 
 
 @admin_bp.route('/chat-logs', methods=['GET'])
 @admin_required
 def get_chat_logs():
-    """Get system-wide chat logs."""
-    logs = AdminService.get_recent_chat_logs()
-    return success_response(logs)
+    """Get system-wide chat logs, newest first."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        logs, next_cursor = AdminService.get_recent_chat_logs(limit, cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(logs, next_cursor=next_cursor)
+
+
+@admin_bp.route('/export/<kind>', methods=['GET'])
+@admin_required
+def export(kind):
+    """Stream every patient, doctor, appointment or chat log as JSON, NDJSON or CSV."""
+    query = AdminService.EXPORT_QUERIES.get(kind)
+    if query is None:
+        return error_response(f"Unknown export. Choose from: {', '.join(AdminService.EXPORT_QUERIES)}", 404)
+    fmt = request.args.get('format', 'json')
+    if fmt not in EXPORT_FORMATS:
+        return error_response(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+    return stream_query(query, fmt=fmt, filename=f'medsync-{kind}')
+
+
+@admin_bp.route('/analytics', methods=['GET'])
+@admin_required
+def get_analytics():
+    """Utilization and cancellation / no-show rates per day or week (default: the last 30 days)."""
+    end = request.args.get('end', date.today().isoformat())
+    start = request.args.get('start', (date.today() - timedelta(days=29)).isoformat())
+    doctor_id = request.args.get('doctor_id', type=int)
+    metrics, err = AnalyticsService.get_metrics(
+        start, end,
+        bucket=request.args.get('bucket', 'day'),
+        group_by=request.args.get('group_by', 'none'),
+        doctor_id=doctor_id,
+        specialization=request.args.get('specialization')
+    )
+    if err:
+        return error_response(err)
+    return success_response(metrics)
 
 
 @admin_bp.route('/me', methods=['GET'])
@@ -1,11 +1,15 @@
 from flask import Blueprint, request, session
 from backend.services.appointment_service import AppointmentService
 from backend.services.notification_service import NotificationService
+from backend.services.slot_hold_service import SlotHoldService
+from backend.services.waitlist_service import WaitlistService
 from backend.services.otp_service import OTPService
+from backend.utils.pagination import page_args
 from backend.utils.helpers import (
     success_response, error_response, login_required,
     patient_required, doctor_required, validate_required_fields
 )
+from backend.utils.idempotency import idempotent
 
 appointments_bp = Blueprint('appointments', __name__, url_prefix='/api/appointments')
 
@@ -87,14 +91,37 @@ def delete_slot(slot_id):
     return success_response(message='Slot deleted')
 
 
+@appointments_bp.route('/slots/block', methods=['POST'])
+@doctor_required
+def block_slot():
+    """Take a slot out of availability (works for rule-derived slots too)."""
+    data = request.get_json()
+    valid, msg = validate_required_fields(data, ['slot_date', 'start_time'])
+    if not valid:
+        return error_response(msg)
+
+    success, err = AppointmentService.block_slot(
+        session['doctor_id'], data['slot_date'], data['start_time']
+    )
+    if err:
+        return error_response(err)
+    return success_response(message='Slot blocked')
+
+
 @appointments_bp.route('/slots/doctor', methods=['GET'])
 @doctor_required
 def get_my_slots():
-    """Get current doctor's slots for a date or month."""
+    """Get current doctor's slots for a date, month or date range."""
     date = request.args.get('date')
     month = request.args.get('month')
-
-    if month:
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+
+    if date_from and date_to:
+        slots, err = AppointmentService.get_doctor_slots_in_range(session['doctor_id'], date_from, date_to)
+        if err:
+            return error_response(err)
+    elif month:
         slots = AppointmentService.get_doctor_slots_for_month(session['doctor_id'], month)
     else:
         slots = AppointmentService.get_doctor_slots(session['doctor_id'], date)
@@ -107,24 +134,52 @@ def get_doctor_slots(doctor_id):
     """Get available slots for a specific doctor."""
     date = request.args.get('date')
     month = request.args.get('month')
-
-    if month:
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+
+    if date_from and date_to:
+        slots, err = AppointmentService.get_doctor_slots_in_range(
+            doctor_id, date_from, date_to, available_only=True
+        )
+        if err:
+            return error_response(err)
+    elif month:
         slots = AppointmentService.get_doctor_slots_for_month(doctor_id, month, available_only=True)
     else:
         slots = AppointmentService.get_available_slots(doctor_id, date)
     return success_response(slots)
 
 
+@appointments_bp.route('/slots/next', methods=['GET'])
+@login_required
+def get_next_available_slots():
+    """Earliest open slots across a specialization or a comma-separated doctor_ids list."""
+    doctor_ids = [value for value in request.args.get('doctor_ids', '').split(',') if value.strip()]
+    slots, err = AppointmentService.get_next_available_slots(
+        specialization=request.args.get('specialization'),
+        doctor_ids=doctor_ids,
+        start_date=request.args.get('from'),
+        end_date=request.args.get('to'),
+        limit=request.args.get('limit', 5)
+    )
+    if err:
+        return error_response(err)
+    return success_response(slots)
+
+
 # ─── Appointment Booking ─────────────────────────────────────
 
 @appointments_bp.route('/book', methods=['POST'])
 @patient_required
+@idempotent
 def book_appointment():
     """Book an appointment."""
-    data = request.get_json()
-    valid, msg = validate_required_fields(data, ['slot_id'])
-    if not valid:
-        return error_response(msg)
+    data = request.get_json() or {}
+    if not data.get('slot_id') and not data.get('hold_token'):
+        # Rule-derived slots have no id yet and are booked by doctor/date/time
+        valid, msg = validate_required_fields(data, ['doctor_id', 'slot_date', 'start_time'])
+        if not valid:
+            return error_response('Missing required fields: slot_id')
 
     # doctor_id is optional — will be resolved from slot if not provided
     doctor_id = data.get('doctor_id')
@@ -132,8 +187,11 @@ def book_appointment():
     appointment, err = AppointmentService.book_appointment(
         patient_id=session['user_id'],
         doctor_id=doctor_id,
-        slot_id=data['slot_id'],
-        reason=data.get('reason')
+        slot_id=data.get('slot_id'),
+        reason=data.get('reason'),
+        slot_date=data.get('slot_date'),
+        start_time=data.get('start_time'),
+        hold_token=data.get('hold_token')
     )
 
     if err:
@@ -147,8 +205,74 @@ def book_appointment():
     return success_response(appointment, 'Appointment booked successfully', 201)
 
 
+@appointments_bp.route('/holds', methods=['POST'])
+@patient_required
+def create_slot_hold():
+    """Hold a slot for a few minutes while the patient completes the booking."""
+    data = request.get_json() or {}
+    if not data.get('slot_id'):
+        valid, msg = validate_required_fields(data, ['doctor_id', 'slot_date', 'start_time'])
+        if not valid:
+            return error_response(msg)
+
+    hold, err = SlotHoldService.create_hold(
+        session['user_id'], data.get('doctor_id'),
+        slot_id=data.get('slot_id'),
+        slot_date=data.get('slot_date'),
+        start_time=data.get('start_time')
+    )
+    if err:
+        return error_response(err, 409)
+    return success_response(hold, 'Slot held', 201)
+
+
+@appointments_bp.route('/holds/<hold_token>', methods=['DELETE'])
+@patient_required
+def release_slot_hold(hold_token):
+    """Release a hold before it expires."""
+    if not SlotHoldService.release_hold(hold_token, session['user_id']):
+        return error_response('Hold not found', 404)
+    return success_response(message='Hold released')
+
+
+@appointments_bp.route('/waitlist', methods=['POST'])
+@patient_required
+def join_waitlist():
+    """Wait for a slot with a doctor, or any doctor of a specialization, in a date window."""
+    data = request.get_json() or {}
+    entry, err = WaitlistService.join_waitlist(
+        session['user_id'],
+        doctor_id=data.get('doctor_id'),
+        specialization=data.get('specialization'),
+        start_date=data.get('start_date'),
+        end_date=data.get('end_date'),
+        earliest_time=data.get('earliest_time'),
+        latest_time=data.get('latest_time')
+    )
+    if err:
+        return error_response(err)
+    return success_response(entry, 'Added to waitlist', 201)
+
+
+@appointments_bp.route('/waitlist', methods=['GET'])
+@patient_required
+def get_waitlist():
+    """Active waitlist entries (waiting or with an open offer) for the patient."""
+    return success_response(WaitlistService.get_patient_waitlist(session['user_id']))
+
+
+@appointments_bp.route('/waitlist/<int:entry_id>', methods=['DELETE'])
+@patient_required
+def leave_waitlist(entry_id):
+    success, err = WaitlistService.leave_waitlist(entry_id, session['user_id'])
+    if err:
+        return error_response(err, 404)
+    return success_response(message='Removed from waitlist')
+
+
 @appointments_bp.route('/<int:appointment_id>/cancel', methods=['POST'])
 @login_required
+@idempotent
 def cancel_appointment(appointment_id):
     """Cancel an appointment."""
     role = session.get('role')
@@ -174,6 +298,7 @@ def cancel_appointment(appointment_id):
 
 @appointments_bp.route('/<int:appointment_id>/emergency-cancel', methods=['POST'])
 @doctor_required
+@idempotent
 def emergency_cancel(appointment_id):
     """Emergency cancel by doctor."""
     success, patient_id, err = AppointmentService.emergency_cancel(
@@ -187,17 +312,46 @@ def emergency_cancel(appointment_id):
     return success_response(message='Emergency cancellation processed')
 
 
+@appointments_bp.route('/emergency-cancel/bulk', methods=['POST'])
+@doctor_required
+@idempotent
+def bulk_emergency_cancel():
+    """Emergency cancel every upcoming appointment of the doctor in a date range."""
+    data = request.get_json() or {}
+    valid, msg = validate_required_fields(data, ['start_date'])
+    if not valid:
+        return error_response(msg)
+
+    result, err = AppointmentService.bulk_emergency_cancel(
+        session['doctor_id'], data['start_date'], data.get('end_date')
+    )
+    if err:
+        return error_response(err)
+    return success_response(result, f"{result['cancelled']} appointment(s) cancelled")
+
+
+@appointments_bp.route('/<int:appointment_id>/proposals', methods=['GET'])
+@patient_required
+def get_rebooking_proposals(appointment_id):
+    """Replacement slots held for the patient after an emergency cancellation."""
+    return success_response(SlotHoldService.get_proposals(appointment_id, session['user_id']))
+
+
 @appointments_bp.route('/<int:appointment_id>/reschedule', methods=['POST'])
 @patient_required
+@idempotent
 def reschedule_appointment(appointment_id):
     """Reschedule an appointment."""
-    data = request.get_json()
-    valid, msg = validate_required_fields(data, ['new_slot_id'])
-    if not valid:
-        return error_response(msg)
+    data = request.get_json() or {}
+    if not data.get('new_slot_id'):
+        valid, msg = validate_required_fields(data, ['new_slot_date', 'new_start_time'])
+        if not valid:
+            return error_response('Missing required fields: new_slot_id')
 
     appointment, err = AppointmentService.reschedule_appointment(
-        appointment_id, data['new_slot_id'], session['user_id']
+        appointment_id, data.get('new_slot_id'), session['user_id'],
+        new_slot_date=data.get('new_slot_date'),
+        new_start_time=data.get('new_start_time')
     )
 
     if err:
@@ -210,19 +364,35 @@ def reschedule_appointment(appointment_id):
 @appointments_bp.route('/patient', methods=['GET'])
 @patient_required
 def get_patient_appointments():
-    """Get current patient's appointments."""
+    """Get current patient's appointments, latest first."""
     status = request.args.get('status')
-    appointments = AppointmentService.get_patient_appointments(session['user_id'], status)
-    return success_response(appointments)
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        appointments, next_cursor = AppointmentService.get_patient_appointments(
+            session['user_id'], status, limit, cursor
+        )
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(appointments, next_cursor=next_cursor)
 
 
 @appointments_bp.route('/doctor', methods=['GET'])
 @doctor_required
 def get_doctor_appointments():
-    """Get current doctor's appointments."""
+    """Get current doctor's appointments, latest first."""
     status = request.args.get('status')
-    appointments = AppointmentService.get_doctor_appointments(session['doctor_id'], status)
-    return success_response(appointments)
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        appointments, next_cursor = AppointmentService.get_doctor_appointments(
+            session['doctor_id'], status, limit, cursor
+        )
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(appointments, next_cursor=next_cursor)
 
 
 @appointments_bp.route('/<int:appointment_id>', methods=['GET'])
@@ -298,15 +468,25 @@ def verify_otp(appointment_id):
 def get_notifications():
     """Get notifications for current user."""
     unread = request.args.get('unread', 'false').lower() == 'true'
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
 
-    if session.get('role') == 'patient':
-        notifs = NotificationService.get_patient_notifications(session['user_id'], unread)
-        count = NotificationService.get_unread_count(user_id=session['user_id'])
-    else:
-        notifs = NotificationService.get_doctor_notifications(session['doctor_id'], unread)
-        count = NotificationService.get_unread_count(doctor_id=session['doctor_id'])
-
-    return success_response({'notifications': notifs, 'unread_count': count})
+    try:
+        if session.get('role') == 'patient':
+            notifs, next_cursor = NotificationService.get_patient_notifications(
+                session['user_id'], unread, limit, cursor
+            )
+            count = NotificationService.get_unread_count(user_id=session['user_id'])
+        else:
+            notifs, next_cursor = NotificationService.get_doctor_notifications(
+                session['doctor_id'], unread, limit, cursor
+            )
+            count = NotificationService.get_unread_count(doctor_id=session['doctor_id'])
+    except ValueError as e:
+        return error_response(str(e))
+
+    return success_response({'notifications': notifs, 'unread_count': count}, next_cursor=next_cursor)
 
 
 @appointments_bp.route('/notifications/<int:notif_id>/read', methods=['POST'])
@@ -7,6 +7,8 @@ from backend.services.otp_service import OTPService
 from backend.utils.helpers import (
     success_response, error_response, patient_required
 )
+from backend.utils.idempotency import idempotent
+from backend.utils.streaming import sse_response
 
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/api/chatbot')
 
@@ -25,29 +27,48 @@ def send_message():
     response, parsed_data, ai_error = ChatbotService.process_message(
         user_id, session_id, data['message'].strip()
     )
+    return success_response(ChatbotService.build_result(session_id, response, parsed_data, ai_error))
 
-    result = {
-        'response': response,
-        'session_id': session_id
-    }
 
-    if parsed_data:
-        # Only include full analysis card if structured data (diseases/advice) is present
-        if 'possible_diseases' in parsed_data:
-            result['analysis'] = parsed_data
-
-        # Auto-recommend doctors based on specialization (works for both JSON and tag)
-        spec = parsed_data.get('recommended_specialization', '')
-        if spec:
-            doctors = DoctorService.get_doctors_by_specialization(spec)
-            if not doctors:
-                doctors = DoctorService.search_doctors(spec, 'specialization')
-            result['recommended_doctors'] = doctors
+@chatbot_bp.route('/message/stream', methods=['POST'])
+@patient_required
+def stream_message():
+    """Send a message to the AI chatbot and stream the reply as Server-Sent Events.
 
-    if ai_error:
-        result['ai_error'] = ai_error
+    Events: session, token (display text as it is generated), analysis and
+    doctors (as soon as the JSON block or [[RECOMMEND]] tag is complete),
+    then done with the same body /message returns, or error.
+    """
+    data = request.get_json()
+    if not data or not data.get('message', '').strip():
+        return error_response('Message required')
 
-    return success_response(result)
+    user_id = session['user_id']
+    session_id = data.get('session_id') or ChatbotService.get_or_create_session(user_id)
+    message = data['message'].strip()
+
+    def events():
+        yield 'session', {'session_id': session_id}
+        recommended = None
+        for event, payload in ChatbotService.stream_message(user_id, session_id, message):
+            if event == 'done':
+                yield 'done', ChatbotService.build_result(session_id, payload['response'],
+                                                          payload['parsed_data'], payload['ai_error'])
+                continue
+            if event == 'recommendation':
+                spec = payload['specialization']
+            elif event == 'analysis':
+                yield event, payload
+                spec = payload.get('recommended_specialization', '')
+            else:
+                yield event, payload
+                continue
+            if spec and spec != recommended:
+                recommended = spec
+                yield 'doctors', {'recommended_specialization': spec,
+                                  'recommended_doctors': ChatbotService.recommend_doctors(spec)}
+
+    return sse_response(events())
 
 
 @chatbot_bp.route('/history', methods=['GET'])
@@ -81,6 +102,7 @@ def new_session():
 
 @chatbot_bp.route('/book-from-chat', methods=['POST'])
 @patient_required
+@idempotent
 def book_from_chat():
     """Book an appointment directly from chatbot recommendation."""
     data = request.get_json()
@@ -91,14 +113,18 @@ def book_from_chat():
     slot_id = data.get('slot_id')
     reason = data.get('reason', 'AI-recommended consultation')
 
-    if not doctor_id or not slot_id:
+    hold_token = data.get('hold_token')
+    if not doctor_id or not (slot_id or hold_token or (data.get('slot_date') and data.get('start_time'))):
         return error_response('Doctor ID and slot ID required')
 
     appointment, err = AppointmentService.book_appointment(
         patient_id=session['user_id'],
         doctor_id=doctor_id,
         slot_id=slot_id,
-        reason=reason
+        reason=reason,
+        slot_date=data.get('slot_date'),
+        start_time=data.get('start_time'),
+        hold_token=hold_token
     )
 
     if err:
@@ -152,7 +178,4 @@ def get_doctors_by_spec_for_chat():
     spec = request.args.get('specialization', '')
     if not spec:
         return error_response('Specialization required')
-    doctors = DoctorService.get_doctors_by_specialization(spec)
-    if not doctors:
-        doctors = DoctorService.search_doctors(spec, 'specialization')
-    return success_response(doctors)
+    return success_response(ChatbotService.recommend_doctors(spec))
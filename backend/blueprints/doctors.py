@@ -1,5 +1,7 @@
 from flask import Blueprint, request, session
 from backend.services.doctor_service import DoctorService
+from backend.services.suggest_service import SuggestService
+from backend.utils.pagination import page_args
 from backend.utils.helpers import (
     success_response, error_response, login_required, doctor_required
 )
@@ -9,21 +11,33 @@ doctors_bp = Blueprint('doctors', __name__, url_prefix='/api/doctors')
 
 @doctors_bp.route('/', methods=['GET'])
 def get_doctors():
-    """Get all verified doctors."""
-    doctors = DoctorService.get_all_doctors(verified_only=True)
-    return success_response(doctors)
+    """Get verified doctors, one page at a time."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        doctors, next_cursor = DoctorService.get_all_doctors(verified_only=True, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(doctors, next_cursor=next_cursor)
 
 
 @doctors_bp.route('/all', methods=['GET'])
 def get_all_doctors():
-    """Get all doctors (including unverified)."""
-    doctors = DoctorService.get_all_doctors(verified_only=False)
-    return success_response(doctors)
+    """Get all doctors (including unverified), one page at a time."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        doctors, next_cursor = DoctorService.get_all_doctors(verified_only=False, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(doctors, next_cursor=next_cursor)
 
 
 @doctors_bp.route('/search', methods=['GET'])
 def search_doctors():
-    """Search doctors by name, specialization, or disease."""
+    """Search doctors by name, specialization, or disease, one page at a time."""
     query = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'all')
 
@@ -33,8 +47,22 @@ def search_doctors():
     if search_type not in ('name', 'specialization', 'disease', 'all'):
         return error_response('Invalid search type')
 
-    doctors = DoctorService.search_doctors(query, search_type)
-    return success_response(doctors)
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        doctors, next_cursor = DoctorService.search_doctors(query, search_type, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(doctors, next_cursor=next_cursor)
+
+
+@doctors_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Typeahead suggestions (specializations, diseases, doctors) for a search-box prefix."""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', SuggestService.DEFAULT_LIMIT, type=int)
+    return success_response(SuggestService.suggest(query, limit))
 
 
 @doctors_bp.route('/specializations', methods=['GET'])
@@ -46,9 +74,15 @@ def get_specializations():
 
 @doctors_bp.route('/by-specialization/<specialization>', methods=['GET'])
 def get_by_specialization(specialization):
-    """Get doctors by specialization."""
-    doctors = DoctorService.get_doctors_by_specialization(specialization)
-    return success_response(doctors)
+    """Get doctors by specialization, one page at a time."""
+    limit, cursor, err = page_args()
+    if err:
+        return error_response(err)
+    try:
+        doctors, next_cursor = DoctorService.get_doctors_by_specialization(specialization, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(doctors, next_cursor=next_cursor)
 
 
 @doctors_bp.route('/<int:doctor_id>', methods=['GET'])
@@ -97,11 +131,11 @@ def recommend_doctors():
     if not specialization:
         return error_response('Specialization required')
 
-    doctors = DoctorService.get_doctors_by_specialization(specialization)
+    doctors, _ = DoctorService.get_doctors_by_specialization(specialization)
 
     if not doctors:
         # Try fuzzy match
-        doctors = DoctorService.search_doctors(specialization, 'specialization')
+        doctors, _ = DoctorService.search_doctors(specialization, 'specialization')
 
     return success_response({
         'specialization': specialization,
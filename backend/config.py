@@ -10,10 +10,54 @@ load_dotenv(_project_root / ".env")
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'fallback-secret-key')
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'medsync.db')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    # SQLite storage profile applied to every connection
+    DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+    DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 64 * 1024 * 1024))
+    DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', -16000))
+    DB_TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_CHECKPOINT_INTERVAL = int(os.getenv('DB_CHECKPOINT_INTERVAL', 300))
+    AVAILABILITY_HORIZON_DAYS = int(os.getenv('AVAILABILITY_HORIZON_DAYS', 60))
+    AVAILABILITY_REFRESH_INTERVAL = int(os.getenv('AVAILABILITY_REFRESH_INTERVAL', 300))
+    SLOT_HOLD_TTL_SECONDS = int(os.getenv('SLOT_HOLD_TTL_SECONDS', 300))
+    WAITLIST_OFFER_TTL_SECONDS = int(os.getenv('WAITLIST_OFFER_TTL_SECONDS', 900))
+    EMERGENCY_PROPOSAL_TTL_SECONDS = int(os.getenv('EMERGENCY_PROPOSAL_TTL_SECONDS', 3600))
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 300))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
     OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'mistralai/mistral-7b-instruct')
     OPENROUTER_FALLBACK_MODEL = os.getenv('OPENROUTER_FALLBACK_MODEL', 'meta-llama/llama-3-8b-instruct')
-    OPENROUTER_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1/chat/completions')
+    OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
+    # Shared keep-alive pool for OpenRouter calls (connections per worker process)
+    LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', 10))
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 5))
+    LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 30))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+    LLM_RETRY_DELAY = float(os.getenv('LLM_RETRY_DELAY', 1))
+    # Per-model circuit breakers: a model whose recent calls mostly failed (or were slow) is skipped
+    # until a half-open probe succeeds; with every model open, chat goes straight to the local fallback
+    LLM_BREAKER_WINDOW_SECONDS = int(os.getenv('LLM_BREAKER_WINDOW_SECONDS', 60))
+    LLM_BREAKER_MIN_CALLS = int(os.getenv('LLM_BREAKER_MIN_CALLS', 5))
+    LLM_BREAKER_FAILURE_RATE = float(os.getenv('LLM_BREAKER_FAILURE_RATE', 0.5))
+    LLM_BREAKER_SLOW_CALL_MS = int(os.getenv('LLM_BREAKER_SLOW_CALL_MS', 15000))
+    LLM_BREAKER_SLOW_CALL_RATE = float(os.getenv('LLM_BREAKER_SLOW_CALL_RATE', 0.8))
+    LLM_BREAKER_OPEN_SECONDS = int(os.getenv('LLM_BREAKER_OPEN_SECONDS', 30))
+    LLM_BREAKER_MAX_OPEN_SECONDS = int(os.getenv('LLM_BREAKER_MAX_OPEN_SECONDS', 300))
+    # Hedged requests: if the primary model has not answered within the given percentile of its recent
+    # latency, the fallback model is asked too and the first answer wins (the other request is cancelled)
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', '').lower() in ('true', '1', 'yes')
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 0.9))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20))
+    LLM_HEDGE_INITIAL_DELAY_MS = int(os.getenv('LLM_HEDGE_INITIAL_DELAY_MS', 3000))
+    # Async chat server (chat_server.py): connections to OpenRouter and threads for its SQLite work
+    ASYNC_CHAT_PORT = int(os.getenv('ASYNC_CHAT_PORT', 5001))
+    ASYNC_LLM_POOL_SIZE = int(os.getenv('ASYNC_LLM_POOL_SIZE', 1000))
+    ASYNC_CHAT_DB_WORKERS = int(os.getenv('ASYNC_CHAT_DB_WORKERS', 4))
     SESSION_TYPE = 'filesystem'
     PERMANENT_SESSION_LIFETIME = 3600
     OTP_EXPIRY_MINUTES = 10
@@ -55,7 +55,8 @@ CREATE TABLE IF NOT EXISTS admins (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Slots table
+-- Slots table: only booked, manually added/edited or blocked slots are stored;
+-- open slots are derived from doctor_availability_rules at read time
 CREATE TABLE IF NOT EXISTS slots (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     doctor_id INTEGER NOT NULL,
@@ -63,6 +64,7 @@ CREATE TABLE IF NOT EXISTS slots (
     start_time TEXT NOT NULL,
     end_time TEXT NOT NULL,
     is_booked INTEGER DEFAULT 0,
+    is_blocked INTEGER DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
     UNIQUE(doctor_id, slot_date, start_time)
@@ -85,6 +87,92 @@ CREATE TABLE IF NOT EXISTS doctor_availability_rules (
 CREATE INDEX IF NOT EXISTS idx_doctor_availability_rules_doctor_weekday
     ON doctor_availability_rules(doctor_id, weekday);
 
+-- Rules version per doctor; bumped whenever the weekly availability is saved
+CREATE TABLE IF NOT EXISTS doctor_schedule_versions (
+    doctor_id INTEGER PRIMARY KEY,
+    rules_version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+);
+
+-- Short-lived checkout holds; a live hold hides the slot from availability
+CREATE TABLE IF NOT EXISTS slot_holds (
+    hold_token TEXT PRIMARY KEY,
+    doctor_id INTEGER NOT NULL,
+    patient_id INTEGER NOT NULL,
+    slot_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    appointment_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
+    FOREIGN KEY (patient_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(doctor_id, slot_date, start_time)
+);
+
+CREATE INDEX IF NOT EXISTS idx_slot_holds_expires ON slot_holds(expires_at);
+-- Rebooking proposals for an emergency-cancelled appointment
+CREATE INDEX IF NOT EXISTS idx_slot_holds_appointment ON slot_holds(appointment_id);
+
+-- Idempotency-Key responses, shared by every worker process; status is NULL
+-- while the first attempt is still running
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    caller TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    idem_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status INTEGER,
+    response BLOB,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (caller, method, path, idem_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys(expires_at);
+
+-- Waitlist: patients waiting for a slot with a doctor, or any doctor of a specialization
+CREATE TABLE IF NOT EXISTS waitlist_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id INTEGER NOT NULL,
+    doctor_id INTEGER,
+    specialization TEXT,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    earliest_time TEXT NOT NULL DEFAULT '00:00',
+    latest_time TEXT NOT NULL DEFAULT '23:59',
+    status TEXT DEFAULT 'waiting' CHECK(status IN ('waiting', 'offered', 'fulfilled', 'cancelled', 'expired')),
+    offer_hold_token TEXT,
+    offer_doctor_id INTEGER,
+    offer_slot_date TEXT,
+    offer_start_time TEXT,
+    offered_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (patient_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_entries_patient_status ON waitlist_entries(patient_id, status);
+CREATE INDEX IF NOT EXISTS idx_waitlist_entries_offer ON waitlist_entries(offer_hold_token);
+CREATE INDEX IF NOT EXISTS idx_waitlist_entries_status_end ON waitlist_entries(status, window_end);
+
+-- Matching index: one row per waiting entry and day of its window, keyed by
+-- target ('doctor:<id>' or 'spec:<specialization>') so a freed slot finds its
+-- first candidate with a single primary-key seek
+CREATE TABLE IF NOT EXISTS waitlist_index (
+    target TEXT NOT NULL,
+    wait_date TEXT NOT NULL,
+    entry_id INTEGER NOT NULL,
+    patient_id INTEGER NOT NULL,
+    earliest_time TEXT NOT NULL,
+    latest_time TEXT NOT NULL,
+    PRIMARY KEY (target, wait_date, entry_id),
+    FOREIGN KEY (entry_id) REFERENCES waitlist_entries(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_index_entry ON waitlist_index(entry_id);
+CREATE INDEX IF NOT EXISTS idx_waitlist_index_date ON waitlist_index(wait_date);
+
 -- Appointments table
 CREATE TABLE IF NOT EXISTS appointments (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,6 +183,7 @@ CREATE TABLE IF NOT EXISTS appointments (
     reason TEXT,
     status TEXT DEFAULT 'scheduled' CHECK(status IN ('scheduled', 'completed', 'cancelled', 'emergency_cancelled', 'rescheduled', 'otp_pending')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES users(id),
     FOREIGN KEY (doctor_id) REFERENCES doctors(id),
     FOREIGN KEY (slot_id) REFERENCES slots(id)
@@ -116,12 +205,13 @@ CREATE TABLE IF NOT EXISTS chat_history (
 CREATE TABLE IF NOT EXISTS notifications (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     recipient_type TEXT CHECK(recipient_type IN ('patient', 'doctor')),
-    user_id INTEGER NOT NULL,
+    user_id INTEGER,
+    doctor_id INTEGER,
     title TEXT NOT NULL,
     message TEXT NOT NULL,
     is_read INTEGER DEFAULT 0,
     notification_type TEXT DEFAULT 'general',
-    appointment_id INTEGER,
+    related_appointment_id INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -138,9 +228,240 @@ CREATE TABLE IF NOT EXISTS diseases (
 CREATE TABLE IF NOT EXISTS disease_specialization_mapping (
     disease TEXT NOT NULL,
     specialization TEXT NOT NULL,
+    description TEXT,
     PRIMARY KEY (disease, specialization)
 );
 
+-- Full-text index for doctor search: one row per doctor (rowid = doctors.id),
+-- including the diseases mapped to the doctor's specialization. Kept in sync by triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search USING fts5(
+    full_name, specialization, hospital, bio, diseases,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_ai AFTER INSERT ON doctors BEGIN
+    INSERT INTO doctor_search (rowid, full_name, specialization, hospital, bio, diseases)
+    VALUES (NEW.id, NEW.full_name, NEW.specialization, NEW.hospital, NEW.bio,
+            (SELECT group_concat(disease, ' ') FROM disease_specialization_mapping
+             WHERE specialization = NEW.specialization));
+END;
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_au
+AFTER UPDATE OF full_name, specialization, hospital, bio ON doctors BEGIN
+    DELETE FROM doctor_search WHERE rowid = OLD.id;
+    INSERT INTO doctor_search (rowid, full_name, specialization, hospital, bio, diseases)
+    VALUES (NEW.id, NEW.full_name, NEW.specialization, NEW.hospital, NEW.bio,
+            (SELECT group_concat(disease, ' ') FROM disease_specialization_mapping
+             WHERE specialization = NEW.specialization));
+END;
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_ad AFTER DELETE ON doctors BEGIN
+    DELETE FROM doctor_search WHERE rowid = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_mapping_ai AFTER INSERT ON disease_specialization_mapping BEGIN
+    UPDATE doctor_search
+    SET diseases = (SELECT group_concat(disease, ' ') FROM disease_specialization_mapping
+                    WHERE specialization = NEW.specialization)
+    WHERE rowid IN (SELECT id FROM doctors WHERE specialization = NEW.specialization);
+END;
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_mapping_ad AFTER DELETE ON disease_specialization_mapping BEGIN
+    UPDATE doctor_search
+    SET diseases = (SELECT group_concat(disease, ' ') FROM disease_specialization_mapping
+                    WHERE specialization = OLD.specialization)
+    WHERE rowid IN (SELECT id FROM doctors WHERE specialization = OLD.specialization);
+END;
+
+CREATE TRIGGER IF NOT EXISTS doctor_search_mapping_au
+AFTER UPDATE OF disease, specialization ON disease_specialization_mapping BEGIN
+    UPDATE doctor_search
+    SET diseases = (SELECT group_concat(disease, ' ') FROM disease_specialization_mapping
+                    WHERE specialization = doctor_search.specialization)
+    WHERE rowid IN (SELECT id FROM doctors WHERE specialization IN (OLD.specialization, NEW.specialization));
+END;
+
+-- Backfill doctors that predate the index (no-op once every doctor has a row)
+INSERT INTO doctor_search (rowid, full_name, specialization, hospital, bio, diseases)
+SELECT d.id, d.full_name, d.specialization, d.hospital, d.bio,
+       (SELECT group_concat(m.disease, ' ') FROM disease_specialization_mapping m
+        WHERE m.specialization = d.specialization)
+FROM doctors d
+WHERE NOT EXISTS (SELECT 1 FROM doctor_search s WHERE s.rowid = d.id);
+
+-- Materialized admin dashboard counters. Triggers keep them in step with every
+-- write to users, doctors and appointments, so /api/admin/stats reads one row
+-- plus two small breakdown tables instead of counting whole tables.
+-- "Active" appointments are the ones still to be seen: scheduled, rescheduled
+-- or waiting on the consultation OTP.
+CREATE TABLE IF NOT EXISTS dashboard_stats (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    total_patients INTEGER NOT NULL DEFAULT 0,
+    total_doctors INTEGER NOT NULL DEFAULT 0,
+    pending_verifications INTEGER NOT NULL DEFAULT 0,
+    total_appointments INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS appointment_status_counts (
+    status TEXT PRIMARY KEY,
+    appointments INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS specialization_load (
+    specialization TEXT PRIMARY KEY,
+    doctors INTEGER NOT NULL DEFAULT 0,
+    verified_doctors INTEGER NOT NULL DEFAULT 0,
+    appointments INTEGER NOT NULL DEFAULT 0,
+    active_appointments INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS dashboard_users_ai AFTER INSERT ON users WHEN NEW.role = 'patient' BEGIN
+    UPDATE dashboard_stats SET total_patients = total_patients + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_users_ad AFTER DELETE ON users WHEN OLD.role = 'patient' BEGIN
+    UPDATE dashboard_stats SET total_patients = total_patients - 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_users_au AFTER UPDATE OF role ON users
+WHEN (OLD.role = 'patient') IS NOT (NEW.role = 'patient') BEGIN
+    UPDATE dashboard_stats SET total_patients = total_patients + (NEW.role = 'patient') - (OLD.role = 'patient')
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_doctors_ai AFTER INSERT ON doctors BEGIN
+    UPDATE dashboard_stats
+    SET total_doctors = total_doctors + 1, pending_verifications = pending_verifications + (NEW.verified = 0)
+    WHERE id = 1;
+    INSERT INTO specialization_load (specialization, doctors, verified_doctors)
+    VALUES (NEW.specialization, 1, NEW.verified = 1)
+    ON CONFLICT(specialization) DO UPDATE
+    SET doctors = doctors + 1, verified_doctors = verified_doctors + excluded.verified_doctors;
+END;
+
+-- A doctor with appointments cannot be deleted (appointments.doctor_id has no cascade)
+CREATE TRIGGER IF NOT EXISTS dashboard_doctors_ad AFTER DELETE ON doctors BEGIN
+    UPDATE dashboard_stats
+    SET total_doctors = total_doctors - 1, pending_verifications = pending_verifications - (OLD.verified = 0)
+    WHERE id = 1;
+    UPDATE specialization_load
+    SET doctors = doctors - 1, verified_doctors = verified_doctors - (OLD.verified = 1)
+    WHERE specialization = OLD.specialization;
+END;
+
+-- Verification is counted against the old specialization and a specialization
+-- change moves the doctor with its new status, so an UPDATE that changes both
+-- comes out right whichever trigger fires first.
+CREATE TRIGGER IF NOT EXISTS dashboard_doctors_verified AFTER UPDATE OF verified ON doctors
+WHEN OLD.verified IS NOT NEW.verified BEGIN
+    UPDATE dashboard_stats
+    SET pending_verifications = pending_verifications + (NEW.verified = 0) - (OLD.verified = 0)
+    WHERE id = 1;
+    UPDATE specialization_load
+    SET verified_doctors = verified_doctors + (NEW.verified = 1) - (OLD.verified = 1)
+    WHERE specialization = OLD.specialization;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_doctors_specialization AFTER UPDATE OF specialization ON doctors
+WHEN OLD.specialization IS NOT NEW.specialization BEGIN
+    UPDATE specialization_load
+    SET doctors = doctors - 1,
+        verified_doctors = verified_doctors - (NEW.verified = 1),
+        appointments = appointments - (SELECT COUNT(*) FROM appointments WHERE doctor_id = NEW.id),
+        active_appointments = active_appointments - (
+            SELECT COUNT(*) FROM appointments
+            WHERE doctor_id = NEW.id AND status IN ('scheduled', 'rescheduled', 'otp_pending'))
+    WHERE specialization = OLD.specialization;
+    INSERT INTO specialization_load (specialization, doctors, verified_doctors, appointments, active_appointments)
+    VALUES (NEW.specialization, 1, NEW.verified = 1,
+            (SELECT COUNT(*) FROM appointments WHERE doctor_id = NEW.id),
+            (SELECT COUNT(*) FROM appointments
+             WHERE doctor_id = NEW.id AND status IN ('scheduled', 'rescheduled', 'otp_pending')))
+    ON CONFLICT(specialization) DO UPDATE
+    SET doctors = doctors + 1,
+        verified_doctors = verified_doctors + excluded.verified_doctors,
+        appointments = appointments + excluded.appointments,
+        active_appointments = active_appointments + excluded.active_appointments;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_appointments_ai AFTER INSERT ON appointments BEGIN
+    UPDATE dashboard_stats SET total_appointments = total_appointments + 1 WHERE id = 1;
+    INSERT INTO appointment_status_counts (status, appointments) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET appointments = appointments + 1;
+    UPDATE specialization_load
+    SET appointments = appointments + 1,
+        active_appointments = active_appointments + (NEW.status IN ('scheduled', 'rescheduled', 'otp_pending'))
+    WHERE specialization = (SELECT specialization FROM doctors WHERE id = NEW.doctor_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_appointments_ad AFTER DELETE ON appointments BEGIN
+    UPDATE dashboard_stats SET total_appointments = total_appointments - 1 WHERE id = 1;
+    UPDATE appointment_status_counts SET appointments = appointments - 1 WHERE status = OLD.status;
+    UPDATE specialization_load
+    SET appointments = appointments - 1,
+        active_appointments = active_appointments - (OLD.status IN ('scheduled', 'rescheduled', 'otp_pending'))
+    WHERE specialization = (SELECT specialization FROM doctors WHERE id = OLD.doctor_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_appointments_au AFTER UPDATE OF status, doctor_id ON appointments
+WHEN OLD.status IS NOT NEW.status OR OLD.doctor_id IS NOT NEW.doctor_id BEGIN
+    UPDATE appointment_status_counts SET appointments = appointments - 1 WHERE status = OLD.status;
+    INSERT INTO appointment_status_counts (status, appointments) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET appointments = appointments + 1;
+    UPDATE specialization_load
+    SET appointments = appointments - 1,
+        active_appointments = active_appointments - (OLD.status IN ('scheduled', 'rescheduled', 'otp_pending'))
+    WHERE specialization = (SELECT specialization FROM doctors WHERE id = OLD.doctor_id);
+    UPDATE specialization_load
+    SET appointments = appointments + 1,
+        active_appointments = active_appointments + (NEW.status IN ('scheduled', 'rescheduled', 'otp_pending'))
+    WHERE specialization = (SELECT specialization FROM doctors WHERE id = NEW.doctor_id);
+END;
+
+-- Backfill from existing rows the first time the counters are created (the
+-- breakdowns check for the dashboard_stats row, so they must run before it)
+INSERT INTO appointment_status_counts (status, appointments)
+SELECT status, COUNT(*) FROM appointments
+WHERE NOT EXISTS (SELECT 1 FROM dashboard_stats)
+GROUP BY status;
+
+INSERT INTO specialization_load (specialization, doctors, verified_doctors, appointments, active_appointments)
+SELECT d.specialization, COUNT(*), SUM(d.verified = 1), COALESCE(SUM(a.total), 0), COALESCE(SUM(a.active), 0)
+FROM doctors d
+LEFT JOIN (SELECT doctor_id, COUNT(*) AS total,
+                  SUM(status IN ('scheduled', 'rescheduled', 'otp_pending')) AS active
+           FROM appointments GROUP BY doctor_id) a ON a.doctor_id = d.id
+WHERE NOT EXISTS (SELECT 1 FROM dashboard_stats)
+GROUP BY d.specialization;
+
+INSERT OR IGNORE INTO dashboard_stats (id, total_patients, total_doctors, pending_verifications, total_appointments)
+SELECT 1,
+       (SELECT COUNT(*) FROM users WHERE role = 'patient'),
+       (SELECT COUNT(*) FROM doctors),
+       (SELECT COUNT(*) FROM doctors WHERE verified = 0),
+       (SELECT COUNT(*) FROM appointments);
+
+-- Appointment analytics rollups: one row per doctor and slot date with the
+-- day's capacity (non-blocked slots) and its appointments by outcome ("open"
+-- = still scheduled, rescheduled or waiting on the OTP). AnalyticsService
+-- recomputes the touched rows inside every appointment and slot write; days
+-- without a row take their capacity from the weekly rules.
+CREATE TABLE IF NOT EXISTS appointment_rollups (
+    doctor_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    capacity INTEGER NOT NULL DEFAULT 0,
+    booked INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    emergency_cancelled INTEGER NOT NULL DEFAULT 0,
+    open INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (doctor_id, day),
+    FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_appointment_rollups_day ON appointment_rollups(day);
+
 -- OTP Verification Table (for appointments)
 CREATE TABLE IF NOT EXISTS otp_verification (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -165,3 +486,45 @@ CREATE TABLE IF NOT EXISTS registration_otp (
 );
 CREATE INDEX IF NOT EXISTS idx_registration_otp_email ON registration_otp(email);
 CREATE INDEX IF NOT EXISTS idx_registration_otp_expires ON registration_otp(expires_at);
+
+-- Hot-path indexes (index set v1, tracked in PRAGMA user_version).
+-- Every dashboard, slot and history query filters/sorts on these columns;
+-- debug/check_query_plans.py fails if any of them falls back to a table scan.
+CREATE INDEX IF NOT EXISTS idx_appointments_patient
+    ON appointments(patient_id);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_status
+    ON appointments(doctor_id, status);
+CREATE INDEX IF NOT EXISTS idx_appointments_slot
+    ON appointments(slot_id);
+CREATE INDEX IF NOT EXISTS idx_appointments_created
+    ON appointments(created_at);
+CREATE INDEX IF NOT EXISTS idx_slots_doctor_date_booked
+    ON slots(doctor_id, slot_date, is_booked);
+CREATE INDEX IF NOT EXISTS idx_chat_history_user_session_created
+    ON chat_history(user_id, session_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_history_user_created
+    ON chat_history(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_history_created
+    ON chat_history(created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type_read
+    ON notifications(user_id, recipient_type, is_read);
+CREATE INDEX IF NOT EXISTS idx_notifications_doctor_type_read
+    ON notifications(doctor_id, recipient_type, is_read);
+
+-- Keyset pagination indexes (index set v2): each list endpoint pages on
+-- (sort column, id) DESC, and every index below ends in the rowid, so the
+-- cursor condition is a range seek rather than a sort of the whole list.
+CREATE INDEX IF NOT EXISTS idx_users_role_created
+    ON users(role, created_at);
+CREATE INDEX IF NOT EXISTS idx_doctors_created
+    ON doctors(created_at);
+CREATE INDEX IF NOT EXISTS idx_doctors_verified_rating
+    ON doctors(verified, rating);
+CREATE INDEX IF NOT EXISTS idx_doctors_specialization_rating
+    ON doctors(specialization, verified, rating);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_type_created
+    ON notifications(user_id, recipient_type, created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_doctor_type_created
+    ON notifications(doctor_id, recipient_type, created_at);
+
+PRAGMA user_version = 2;
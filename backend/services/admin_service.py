@@ -2,12 +2,38 @@ import uuid
 import logging
 from werkzeug.security import generate_password_hash
 from backend.utils.database import query_db, execute_db
+from backend.services.doctor_service import DoctorService
+from backend.utils.pagination import DEFAULT_PAGE_SIZE, keyset, order_by, paginate
 
 logger = logging.getLogger(__name__)
 
 class AdminService:
     """Service layer for administrative operations."""
 
+    # Full-table exports, streamed by backend.utils.streaming; ordered by id so a
+    # re-run lines up with the previous file
+    EXPORT_QUERIES = {
+        'patients': '''SELECT id, patient_id, full_name, email, phone, is_verified, created_at
+                       FROM users WHERE role = 'patient' ORDER BY id''',
+        'doctors': '''SELECT id, doctor_id, full_name, email, phone, specialization, experience_years,
+                      hospital, verified, rating, created_at
+                      FROM doctors ORDER BY id''',
+        'appointments': '''SELECT a.id, a.appointment_id, a.status, a.reason, a.created_at,
+                           u.patient_id AS patient_code, u.full_name AS patient_name,
+                           d.doctor_id AS doctor_code, d.full_name AS doctor_name, d.specialization,
+                           s.slot_date, s.start_time, s.end_time
+                           FROM appointments a
+                           JOIN users u ON a.patient_id = u.id
+                           JOIN doctors d ON a.doctor_id = d.id
+                           JOIN slots s ON a.slot_id = s.id
+                           ORDER BY a.id''',
+        'chat-logs': '''SELECT c.id, c.session_id, u.patient_id AS patient_code, u.full_name AS user_name,
+                        c.role, c.message, c.created_at
+                        FROM chat_history c
+                        JOIN users u ON c.user_id = u.id
+                        ORDER BY c.id''',
+    }
+
     @staticmethod
     def add_doctor(data):
         """Add a new doctor from admin panel."""
@@ -28,6 +54,7 @@ class AdminService:
                  password_hash, data['specialization'], data.get('experience_years', 0),
                  data.get('hospital', ''), data.get('bio', ''))
             )
+            DoctorService.doctors_changed()
             logger.info(f"Admin added doctor: {data['full_name']} ({doctor_id})")
             return {'doctor_id': doctor_id, 'full_name': data['full_name']}, None
         except Exception as e:
@@ -36,44 +63,61 @@ class AdminService:
 
     @staticmethod
     def get_dashboard_stats():
-        """Get system-wide statistics."""
+        """Get system-wide statistics from the trigger-maintained counter tables."""
         try:
-            patients = query_db('SELECT COUNT(*) as c FROM users WHERE role="patient"', one=True)['c']
-            doctors = query_db('SELECT COUNT(*) as c FROM doctors', one=True)['c']
-            pending_doctors = query_db('SELECT COUNT(*) as c FROM doctors WHERE verified=0', one=True)['c']
-            appointments = query_db('SELECT COUNT(*) as c FROM appointments', one=True)['c']
-            
+            stats = query_db(
+                '''SELECT total_patients, total_doctors, pending_verifications, total_appointments
+                   FROM dashboard_stats WHERE id = 1''',
+                one=True
+            )
+            by_status = query_db(
+                'SELECT status, appointments FROM appointment_status_counts WHERE appointments > 0 ORDER BY status'
+            )
+            load = query_db(
+                '''SELECT specialization, doctors, verified_doctors, appointments, active_appointments
+                   FROM specialization_load WHERE doctors > 0 OR appointments > 0
+                   ORDER BY active_appointments DESC, specialization'''
+            )
+
             return {
-                'total_patients': patients,
-                'total_doctors': doctors,
-                'pending_verifications': pending_doctors,
-                'total_appointments': appointments
+                **dict(stats),
+                'appointments_by_status': {row['status']: row['appointments'] for row in by_status},
+                'specialization_load': [dict(row) for row in load]
             }, None
         except Exception as e:
             return None, str(e)
 
     @staticmethod
-    def get_all_doctors():
-        """Get all doctors with verification status."""
-        return query_db(
-            '''SELECT id, doctor_id, full_name, email, phone, specialization, 
-               experience_years, hospital, bio, verified, rating, created_at 
-               FROM doctors ORDER BY created_at DESC'''
+    def get_all_doctors(limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get doctors with verification status, newest first: (doctors, next_cursor)."""
+        sort = ['created_at', 'id']
+        after, params = keyset(sort, cursor)
+        doctors = query_db(
+            f'''SELECT id, doctor_id, full_name, email, phone, specialization,
+                experience_years, hospital, bio, verified, rating, created_at
+                FROM doctors WHERE {after} {order_by(sort)} LIMIT ?''',
+            (*params, limit + 1)
         )
+        return paginate(doctors, limit, lambda d: (d['created_at'], d['id']))
 
     @staticmethod
-    def get_all_patients():
-        """Get all patients."""
-        return query_db(
-            '''SELECT id, patient_id, full_name, email, phone, created_at 
-               FROM users WHERE role="patient" ORDER BY created_at DESC'''
+    def get_all_patients(limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get patients, newest first: (patients, next_cursor)."""
+        sort = ['created_at', 'id']
+        after, params = keyset(sort, cursor)
+        patients = query_db(
+            f'''SELECT id, patient_id, full_name, email, phone, created_at
+                FROM users WHERE role = 'patient' AND {after} {order_by(sort)} LIMIT ?''',
+            (*params, limit + 1)
         )
+        return paginate(patients, limit, lambda p: (p['created_at'], p['id']))
 
     @staticmethod
     def verify_doctor(doctor_id):
         """Approve a newly registered doctor."""
         try:
             execute_db('UPDATE doctors SET verified = 1 WHERE id = ?', (doctor_id,))
+            DoctorService.doctors_changed()
             return True, 'Doctor verified successfully'
         except Exception as e:
             return False, f"Verification failed: {e}"
@@ -83,6 +127,7 @@ class AdminService:
         """Delete a doctor account."""
         try:
             execute_db('DELETE FROM doctors WHERE id = ?', (doctor_id,))
+            DoctorService.doctors_changed()
             return True, 'Doctor deleted successfully'
         except Exception as e:
             return False, f"Deletion failed: {e}"
@@ -97,26 +142,34 @@ class AdminService:
             return False, f"Deletion failed: {e}"
 
     @staticmethod
-    def get_all_appointments():
-        """Get all appointments with details."""
-        return query_db(
-            '''SELECT a.id, a.appointment_id, a.status, a.slot_id, 
-               u.full_name as patient_name, d.full_name as doctor_name, 
-               s.slot_date, s.start_time
-               FROM appointments a
-               JOIN users u ON a.patient_id = u.id
-               JOIN doctors d ON a.doctor_id = d.id
-               JOIN slots s ON a.slot_id = s.id
-               ORDER BY a.created_at DESC LIMIT 100'''
+    def get_all_appointments(limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get appointments with details, newest first: (appointments, next_cursor)."""
+        sort = ['a.created_at', 'a.id']
+        after, params = keyset(sort, cursor)
+        appointments = query_db(
+            f'''SELECT a.id, a.appointment_id, a.status, a.slot_id, a.created_at,
+                u.full_name as patient_name, d.full_name as doctor_name,
+                s.slot_date, s.start_time
+                FROM appointments a
+                JOIN users u ON a.patient_id = u.id
+                JOIN doctors d ON a.doctor_id = d.id
+                JOIN slots s ON a.slot_id = s.id
+                WHERE {after} {order_by(sort)} LIMIT ?''',
+            (*params, limit + 1)
         )
+        return paginate(appointments, limit, lambda a: (a['created_at'], a['id']))
 
     @staticmethod
-    def get_recent_chat_logs():
-        """Get system-wide chat logs."""
-        return query_db(
-            '''SELECT c.id, c.session_id, c.role, c.message, c.created_at, 
-               u.full_name as user_name
-               FROM chat_history c
-               JOIN users u ON c.user_id = u.id
-               ORDER BY c.created_at DESC LIMIT 50'''
+    def get_recent_chat_logs(limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get system-wide chat logs, newest first: (logs, next_cursor)."""
+        sort = ['c.created_at', 'c.id']
+        after, params = keyset(sort, cursor)
+        logs = query_db(
+            f'''SELECT c.id, c.session_id, c.role, c.message, c.created_at,
+                u.full_name as user_name
+                FROM chat_history c
+                JOIN users u ON c.user_id = u.id
+                WHERE {after} {order_by(sort)} LIMIT ?''',
+            (*params, limit + 1)
         )
+        return paginate(logs, limit, lambda c: (c['created_at'], c['id']))
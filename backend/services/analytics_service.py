@@ -0,0 +1,283 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from backend.utils.database import get_db, query_db
+from backend.services.availability_service import AvailabilityService
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsService:
+    """Appointment and utilization metrics served from per-doctor daily rollups.
+
+    appointment_rollups holds one row per (doctor, slot date) with that day's
+    capacity (non-blocked slots) and appointment counts by outcome. The write
+    paths in AppointmentService and OTPService call refresh*() inside their
+    own transaction, which recomputes just the affected rows from the base
+    tables, so a rollup is never more than one write behind and re-running a
+    refresh is always safe.
+
+    Reads never touch appointments: a date range costs one rollup scan plus
+    the weekly rules, whatever the appointment volume. Days without a rollup
+    row (no appointment, slot or block ever written) take their capacity from
+    the doctor's current weekly rules.
+    """
+
+    BUCKETS = ('day', 'week')
+    GROUPS = ('none', 'doctor', 'specialization')
+    MAX_RANGE_DAYS = 366
+    MAX_SERIES = 5000
+    OPEN_STATUSES = ('scheduled', 'rescheduled', 'otp_pending')
+    COUNTS = ('capacity', 'booked', 'completed', 'cancelled', 'emergency_cancelled', 'no_shows', 'past_completed')
+
+    # ─── Refresh (write paths) ───────────────────────────────
+
+    @staticmethod
+    def refresh(conn, doctor_id, days):
+        """Recompute one doctor's rollup rows for the given slot dates."""
+        days = sorted({str(day) for day in days if day})
+        if not days:
+            return 0
+        capacity = Counter(
+            slot['slot_date'] for slot in AvailabilityService.compute_slots(
+                doctor_id, days[0], days[-1], conn=conn, use_horizon=False, include_held=True
+            )
+        )
+        counts = {
+            row['day']: row for row in conn.execute(
+                f'''SELECT s.slot_date AS day, COUNT(*) AS booked,
+                           COALESCE(SUM(a.status = 'completed'), 0) AS completed,
+                           COALESCE(SUM(a.status = 'cancelled'), 0) AS cancelled,
+                           COALESCE(SUM(a.status = 'emergency_cancelled'), 0) AS emergency_cancelled,
+                           COALESCE(SUM(a.status IN {AnalyticsService.OPEN_STATUSES}), 0) AS open
+                    FROM slots s JOIN appointments a ON a.slot_id = s.id
+                    WHERE s.doctor_id = ? AND s.slot_date IN ({','.join('?' * len(days))})
+                    GROUP BY s.slot_date''',
+                (doctor_id, *days)
+            )
+        }
+        conn.executemany(
+            '''INSERT INTO appointment_rollups
+               (doctor_id, day, capacity, booked, completed, cancelled, emergency_cancelled, open)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(doctor_id, day) DO UPDATE SET
+                   capacity = excluded.capacity, booked = excluded.booked,
+                   completed = excluded.completed, cancelled = excluded.cancelled,
+                   emergency_cancelled = excluded.emergency_cancelled, open = excluded.open''',
+            [
+                (doctor_id, day, capacity[day],
+                 *((counts[day]['booked'], counts[day]['completed'], counts[day]['cancelled'],
+                    counts[day]['emergency_cancelled'], counts[day]['open']) if day in counts else (0,) * 5))
+                for day in days
+            ]
+        )
+        return len(days)
+
+    @staticmethod
+    def _refresh_pairs(conn, pairs):
+        by_doctor = defaultdict(set)
+        for row in pairs:
+            by_doctor[row['doctor_id']].add(row['slot_date'])
+        for doctor_id, days in by_doctor.items():
+            AnalyticsService.refresh(conn, doctor_id, days)
+
+    @staticmethod
+    def refresh_slots(conn, slot_ids):
+        """Refresh the rollup rows of the days these slots fall on."""
+        slot_ids = [slot_id for slot_id in slot_ids if slot_id is not None]
+        if slot_ids:
+            AnalyticsService._refresh_pairs(conn, conn.execute(
+                f"SELECT DISTINCT doctor_id, slot_date FROM slots WHERE id IN ({','.join('?' * len(slot_ids))})",
+                slot_ids
+            ).fetchall())
+
+    @staticmethod
+    def refresh_appointments(conn, appointment_ids):
+        """Refresh the rollup rows of the days these appointments are booked on."""
+        if appointment_ids:
+            AnalyticsService._refresh_pairs(conn, conn.execute(
+                f'''SELECT DISTINCT s.doctor_id, s.slot_date
+                    FROM appointments a JOIN slots s ON s.id = a.slot_id
+                    WHERE a.id IN ({','.join('?' * len(appointment_ids))})''',
+                list(appointment_ids)
+            ).fetchall())
+
+    @staticmethod
+    def refresh_upcoming(conn, doctor_id, from_date):
+        """Re-snapshot capacity for a doctor's rollup rows from from_date on (after a rules change)."""
+        days = [row['day'] for row in conn.execute(
+            'SELECT day FROM appointment_rollups WHERE doctor_id = ? AND day >= ?', (doctor_id, from_date)
+        )]
+        return AnalyticsService.refresh(conn, doctor_id, days)
+
+    @staticmethod
+    def backfill():
+        """Build rollups for existing appointments the first time the table is used."""
+        conn = get_db()
+        if conn.execute('SELECT 1 FROM appointment_rollups LIMIT 1').fetchone() \
+                or not conn.execute('SELECT 1 FROM appointments LIMIT 1').fetchone():
+            return 0
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            pairs = conn.execute(
+                'SELECT DISTINCT s.doctor_id, s.slot_date FROM appointments a JOIN slots s ON s.id = a.slot_id'
+            ).fetchall()
+            AnalyticsService._refresh_pairs(conn, pairs)
+            conn.commit()
+            logger.info(f"Analytics rollups backfilled for {len(pairs)} doctor-days")
+            return len(pairs)
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Analytics backfill error: {e}")
+            return 0
+
+    # ─── Reads ───────────────────────────────────────────────
+
+    @staticmethod
+    def _rates(totals):
+        def ratio(part, whole):
+            return round(part / whole, 4) if whole else None
+        occupied = totals['booked'] - totals['cancelled'] - totals['emergency_cancelled']
+        return {
+            **{key: totals[key] for key in AnalyticsService.COUNTS if key != 'past_completed'},
+            'occupied': occupied,
+            'utilization': ratio(occupied, totals['capacity']),
+            'cancellation_rate': ratio(totals['cancelled'], totals['booked']),
+            'emergency_cancel_rate': ratio(totals['emergency_cancelled'], totals['booked']),
+            'no_show_rate': ratio(totals['no_shows'], totals['no_shows'] + totals['past_completed']),
+        }
+
+    @staticmethod
+    def _weekday_capacity(rules):
+        """Slots per weekday under the weekly rules; the count weekday_intervals() would expand to."""
+        def minutes(value):
+            hours, mins = value.split(':')
+            return int(hours) * 60 + int(mins)
+        capacity = [0] * 7
+        for rule in rules:
+            duration = int(rule['slot_duration_minutes'] or 30)
+            capacity[rule['weekday']] += max(0, (minutes(rule['end_time']) - minutes(rule['start_time'])) // duration)
+        return capacity
+
+    @staticmethod
+    def get_metrics(start_date, end_date, bucket='day', group_by='none', doctor_id=None, specialization=None):
+        """Slot utilization and cancellation / emergency-cancel / no-show rates over a date range.
+
+        Returns per-bucket rows (per doctor or specialization when grouped)
+        and range totals. A no-show is an appointment on a past day that was
+        never completed or cancelled.
+        """
+        try:
+            first_day = date.fromisoformat(start_date)
+            last_day = date.fromisoformat(end_date)
+        except (TypeError, ValueError):
+            return None, 'Dates must be YYYY-MM-DD'
+        if last_day < first_day:
+            return None, 'End date must not be before start date'
+        if (last_day - first_day).days >= AnalyticsService.MAX_RANGE_DAYS:
+            return None, f'Date range cannot exceed {AnalyticsService.MAX_RANGE_DAYS} days'
+        if bucket not in AnalyticsService.BUCKETS:
+            return None, f"Bucket must be one of: {', '.join(AnalyticsService.BUCKETS)}"
+        if group_by not in AnalyticsService.GROUPS:
+            return None, f"Group must be one of: {', '.join(AnalyticsService.GROUPS)}"
+
+        filters, params = ['verified = 1'], []
+        if doctor_id is not None:
+            filters.append('id = ?')
+            params.append(doctor_id)
+        if specialization:
+            filters.append('specialization = ? COLLATE NOCASE')
+            params.append(specialization)
+        doctors = {
+            row['id']: row for row in query_db(
+                f"SELECT id, full_name, specialization FROM doctors WHERE {' AND '.join(filters)}", params
+            )
+        }
+
+        def group_key(doc_id):
+            if group_by == 'doctor':
+                return doc_id
+            if group_by == 'specialization':
+                return doctors[doc_id]['specialization']
+            return None
+
+        def bucket_of(day):
+            return day - timedelta(days=day.weekday()) if bucket == 'week' else day
+
+        # Weekday counts per bucket, so rule capacity is a dot product per group
+        weekdays = defaultdict(lambda: [0] * 7)
+        day = first_day
+        while day <= last_day:
+            weekdays[bucket_of(day)][day.weekday()] += 1
+            day += timedelta(days=1)
+        if len(weekdays) * (len(doctors) if group_by == 'doctor' else 1) > AnalyticsService.MAX_SERIES:
+            return None, 'Too many rows; use weekly buckets, a shorter range or a filter'
+
+        rules = defaultdict(list)
+        for row in query_db(
+            '''SELECT doctor_id, weekday, start_time, end_time, slot_duration_minutes
+               FROM doctor_availability_rules WHERE active = 1'''
+            + (' AND doctor_id = ?' if doctor_id is not None else ''),
+            (doctor_id,) if doctor_id is not None else ()
+        ):
+            rules[row['doctor_id']].append(row)
+        rule_capacity = {doc_id: AnalyticsService._weekday_capacity(rules.get(doc_id, ())) for doc_id in doctors}
+
+        # Rules estimate per group: summed weekday capacities times the weekday counts of each bucket
+        group_capacity = defaultdict(lambda: [0] * 7)
+        for doc_id, per_weekday in rule_capacity.items():
+            totals = group_capacity[group_key(doc_id)]
+            for weekday, slots in enumerate(per_weekday):
+                totals[weekday] += slots
+        series = defaultdict(lambda: dict.fromkeys(AnalyticsService.COUNTS, 0))
+        for key, per_weekday in group_capacity.items():
+            for bucket_start, counts in weekdays.items():
+                series[(bucket_start, key)]['capacity'] = sum(c * n for c, n in zip(per_weekday, counts))
+
+        # One row per doctor and bucket; weekdays lists the %w weekday of each rollup day
+        # so the rules estimate for those days can be swapped for their capacity snapshots
+        bucket_sql = "date(day, '-' || ((strftime('%w', day) + 6) % 7) || ' days')" if bucket == 'week' else 'day'
+        today = date.today().isoformat()
+        rows = query_db(
+            f'''SELECT doctor_id, {bucket_sql} AS bucket, GROUP_CONCAT(strftime('%w', day), '') AS weekdays,
+                       SUM(capacity) AS capacity, SUM(booked) AS booked, SUM(completed) AS completed,
+                       SUM(cancelled) AS cancelled, SUM(emergency_cancelled) AS emergency_cancelled,
+                       SUM(CASE WHEN day < ? THEN open ELSE 0 END) AS no_shows,
+                       SUM(CASE WHEN day < ? THEN completed ELSE 0 END) AS past_completed
+                FROM appointment_rollups
+                WHERE day BETWEEN ? AND ?{' AND doctor_id = ?' if doctor_id is not None else ''}
+                GROUP BY doctor_id, bucket''',
+            (today, today, first_day.isoformat(), last_day.isoformat(),
+             *((doctor_id,) if doctor_id is not None else ()))
+        )
+        for row in rows:
+            if row['doctor_id'] not in doctors:
+                continue
+            per_weekday = rule_capacity[row['doctor_id']]
+            totals = series[(date.fromisoformat(row['bucket']), group_key(row['doctor_id']))]
+            totals['capacity'] -= sum(per_weekday[(int(w) + 6) % 7] for w in row['weekdays'])
+            for column in AnalyticsService.COUNTS:
+                totals[column] += row[column]
+
+        overall = dict.fromkeys(AnalyticsService.COUNTS, 0)
+        result = []
+        for (bucket_start, key), totals in sorted(series.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            for column, value in totals.items():
+                overall[column] += value
+            entry = {'bucket': bucket_start.isoformat()}
+            if group_by == 'doctor':
+                entry.update(doctor_id=key, doctor_name=doctors[key]['full_name'],
+                             specialization=doctors[key]['specialization'])
+            elif group_by == 'specialization':
+                entry['specialization'] = key
+            result.append({**entry, **AnalyticsService._rates(totals)})
+
+        return {
+            'start': first_day.isoformat(),
+            'end': last_day.isoformat(),
+            'bucket': bucket,
+            'group_by': group_by,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'totals': AnalyticsService._rates(overall),
+            'series': result,
+        }, None
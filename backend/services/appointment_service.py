@@ -3,6 +3,13 @@ import logging
 from calendar import monthrange
 from datetime import datetime, timedelta
 from backend.utils.database import query_db, execute_db, get_db
+from backend.services.analytics_service import AnalyticsService
+from backend.services.availability_service import AvailabilityService
+from backend.services.availability_worker import AvailabilityWorker
+from backend.services.notification_service import NotificationService
+from backend.services.slot_hold_service import SlotHoldService
+from backend.services.waitlist_service import WaitlistService
+from backend.utils.pagination import DEFAULT_PAGE_SIZE, keyset, order_by, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +26,10 @@ class AppointmentService:
         5: 'saturday',
         6: 'sunday',
     }
+    NEXT_AVAILABLE_DAYS = 30
+    NEXT_AVAILABLE_MAX = 50
+    PROPOSALS_PER_APPOINTMENT = 2
+    PROPOSAL_TTL_SECONDS = 3600
 
     @staticmethod
     def generate_appointment_id():
@@ -45,86 +56,26 @@ class AppointmentService:
         return AppointmentService._month_bounds(reference)
 
     @staticmethod
-    def _get_weekly_rules(doctor_id):
-        rules = query_db(
-            '''SELECT id, doctor_id, weekday, start_time, end_time,
-                      slot_duration_minutes, active
-               FROM doctor_availability_rules
-               WHERE doctor_id = ? AND active = 1
-               ORDER BY weekday, start_time''',
+    def _bump_rules_version(conn, doctor_id):
+        conn.execute(
+            '''INSERT INTO doctor_schedule_versions (doctor_id, rules_version)
+               VALUES (?, 1)
+               ON CONFLICT(doctor_id) DO UPDATE SET
+                   rules_version = rules_version + 1,
+                   updated_at = CURRENT_TIMESTAMP''',
             (doctor_id,)
         )
-        return [dict(rule) for rule in rules]
-
-    @staticmethod
-    def _generate_month_slots(doctor_id, month_start, month_end):
-        rules = AppointmentService._get_weekly_rules(doctor_id)
-        if not rules:
-            return 0
-
-        execute_db(
-            '''DELETE FROM slots
-               WHERE doctor_id = ?
-                 AND slot_date BETWEEN ? AND ?
-                 AND is_booked = 0''',
-            (doctor_id, month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d'))
-        )
-
-        inserted = 0
-        current_day = month_start
-        while current_day <= month_end:
-            weekday = current_day.weekday()
-            day_rules = [rule for rule in rules if rule['weekday'] == weekday]
-
-            for rule in day_rules:
-                start_time = AppointmentService._parse_time(rule['start_time'])
-                end_time = AppointmentService._parse_time(rule['end_time'])
-                slot_duration = int(rule['slot_duration_minutes'] or 30)
-
-                slot_cursor = datetime.combine(current_day.date(), start_time)
-                slot_end_boundary = datetime.combine(current_day.date(), end_time)
-
-                while slot_cursor + timedelta(minutes=slot_duration) <= slot_end_boundary:
-                    slot_end = slot_cursor + timedelta(minutes=slot_duration)
-                    execute_db(
-                        '''INSERT OR IGNORE INTO slots
-                           (doctor_id, slot_date, start_time, end_time, is_booked)
-                           VALUES (?, ?, ?, ?, 0)''',
-                        (
-                            doctor_id,
-                            current_day.strftime('%Y-%m-%d'),
-                            slot_cursor.strftime('%H:%M'),
-                            slot_end.strftime('%H:%M')
-                        )
-                    )
-                    inserted += 1
-                    slot_cursor = slot_end
-
-            current_day += timedelta(days=1)
-
-        return inserted
-
-    @staticmethod
-    def ensure_month_slots(doctor_id, reference_date):
-        if isinstance(reference_date, str):
-            reference_date = AppointmentService._parse_date(reference_date)
-
-        month_start, month_end = AppointmentService._month_bounds(reference_date)
-        AppointmentService._generate_month_slots(doctor_id, month_start, month_end)
-        return month_start, month_end
 
     @staticmethod
     def get_weekly_availability(doctor_id):
-        return AppointmentService._get_weekly_rules(doctor_id)
+        return AvailabilityService.get_weekly_rules(doctor_id)
 
     @staticmethod
     def save_weekly_availability(doctor_id, weekly_availability, slot_duration_minutes=30):
         if not isinstance(weekly_availability, list):
             return None, 'Weekly availability must be a list'
 
-        execute_db('DELETE FROM doctor_availability_rules WHERE doctor_id = ?', (doctor_id,))
-
-        saved_rules = []
+        rule_rows = []
         for rule in weekly_availability:
             try:
                 weekday = int(rule['weekday'])
@@ -139,43 +90,63 @@ class AppointmentService:
                 return None, 'Start time must be earlier than end time'
 
             rule_duration = int(rule.get('slot_duration_minutes', slot_duration_minutes) or slot_duration_minutes)
-            rule_id = execute_db(
+            rule_rows.append((doctor_id, weekday, start_time, end_time, rule_duration))
+
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM doctor_availability_rules WHERE doctor_id = ?', (doctor_id,))
+            conn.executemany(
                 '''INSERT INTO doctor_availability_rules
                    (doctor_id, weekday, start_time, end_time, slot_duration_minutes, active)
                    VALUES (?, ?, ?, ?, ?, 1)''',
-                (doctor_id, weekday, start_time, end_time, rule_duration)
+                rule_rows
             )
-            saved_rules.append({
-                'id': rule_id,
-                'doctor_id': doctor_id,
-                'weekday': weekday,
-                'weekday_name': AppointmentService.WEEKDAY_MAP.get(weekday, str(weekday)),
-                'start_time': start_time,
-                'end_time': end_time,
-                'slot_duration_minutes': rule_duration,
-                'active': 1,
-            })
-
-        AppointmentService.ensure_month_slots(doctor_id, datetime.now())
+            AppointmentService._bump_rules_version(conn, doctor_id)
+            # Open slots are derived from the new rules; drop rows that carried no state
+            AvailabilityService.compact_slots(conn, doctor_id)
+            AnalyticsService.refresh_upcoming(conn, doctor_id, datetime.now().strftime('%Y-%m-%d'))
+            saved_rules = AvailabilityService.get_weekly_rules(doctor_id, conn)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Save availability error: {e}")
+            return None, 'Failed to save weekly availability'
+
+        # The precomputed horizon was built from the old rules
+        AvailabilityService.invalidate_horizon(doctor_id)
+        AvailabilityWorker.wake()
+        for rule in saved_rules:
+            rule['weekday_name'] = AppointmentService.WEEKDAY_MAP.get(rule['weekday'], str(rule['weekday']))
         return saved_rules, None
 
     # ─── Slot Management ─────────────────────────────────────
 
+    @staticmethod
+    def _refresh_capacity(doctor_id, *slot_dates):
+        """Re-snapshot analytics capacity after a slot edit that ran outside a service transaction."""
+        conn = get_db()
+        try:
+            AnalyticsService.refresh(conn, doctor_id, slot_dates)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Analytics refresh error: {e}")
+
+    @staticmethod
+    def _find_overlap(doctor_id, slot_date, start_time, end_time, exclude_slot_id=None):
+        """Return the first slot (rule-derived or persisted) overlapping the interval."""
+        for slot in AvailabilityService.compute_slots(doctor_id, slot_date, slot_date, include_held=True):
+            if exclude_slot_id is not None and slot['id'] == exclude_slot_id:
+                continue
+            if slot['start_time'] < end_time and slot['end_time'] > start_time:
+                return slot
+        return None
+
     @staticmethod
     def add_slot(doctor_id, slot_date, start_time, end_time):
         """Add a new availability slot for a doctor."""
-        # Check for overlapping slots
-        overlap = query_db(
-            '''SELECT id FROM slots 
-               WHERE doctor_id = ? AND slot_date = ?
-               AND ((start_time < ? AND end_time > ?) OR
-                    (start_time < ? AND end_time > ?) OR
-                    (start_time >= ? AND end_time <= ?))''',
-            (doctor_id, slot_date, end_time, start_time,
-             end_time, start_time, start_time, end_time),
-            one=True
-        )
-        if overlap:
+        if AppointmentService._find_overlap(doctor_id, slot_date, start_time, end_time):
             return None, 'Slot overlaps with existing slot'
 
         try:
@@ -185,6 +156,7 @@ class AppointmentService:
                 (doctor_id, slot_date, start_time, end_time)
             )
             slot = query_db('SELECT * FROM slots WHERE id = ?', (slot_id,), one=True)
+            AppointmentService._refresh_capacity(doctor_id, slot_date)
             return dict(slot), None
         except Exception as e:
             logger.error(f"Add slot error: {e}")
@@ -193,7 +165,7 @@ class AppointmentService:
     @staticmethod
     def update_slot(slot_id, doctor_id, slot_date=None, start_time=None, end_time=None):
         """Update an existing slot."""
-        slot = query_db('SELECT * FROM slots WHERE id = ? AND doctor_id = ?',
+        slot = query_db('SELECT * FROM slots WHERE id = ? AND doctor_id = ? AND is_blocked = 0',
                        (slot_id, doctor_id), one=True)
         if not slot:
             return None, 'Slot not found'
@@ -204,114 +176,216 @@ class AppointmentService:
         new_start = start_time or slot['start_time']
         new_end = end_time or slot['end_time']
 
-        # Check overlaps excluding current slot
-        overlap = query_db(
-            '''SELECT id FROM slots 
-               WHERE doctor_id = ? AND slot_date = ? AND id != ?
-               AND ((start_time < ? AND end_time > ?) OR
-                    (start_time < ? AND end_time > ?) OR
-                    (start_time >= ? AND end_time <= ?))''',
-            (doctor_id, new_date, slot_id, new_end, new_start,
-             new_end, new_start, new_start, new_end),
-            one=True
-        )
-        if overlap:
+        if AppointmentService._find_overlap(doctor_id, new_date, new_start, new_end, exclude_slot_id=slot_id):
             return None, 'Updated slot would overlap with existing slot'
 
-        execute_db(
-            'UPDATE slots SET slot_date = ?, start_time = ?, end_time = ? WHERE id = ?',
-            (new_date, new_start, new_end, slot_id)
-        )
+        conn = get_db()
+        try:
+            conn.execute(
+                'UPDATE slots SET slot_date = ?, start_time = ?, end_time = ? WHERE id = ?',
+                (new_date, new_start, new_end, slot_id)
+            )
+            # Keep the rule-derived slot it was moved away from out of availability
+            if AvailabilityService.is_rule_slot(doctor_id, slot['slot_date'], slot['start_time'],
+                                                slot['end_time'], conn):
+                conn.execute(
+                    '''INSERT OR IGNORE INTO slots
+                       (doctor_id, slot_date, start_time, end_time, is_booked, is_blocked)
+                       VALUES (?, ?, ?, ?, 0, 1)''',
+                    (doctor_id, slot['slot_date'], slot['start_time'], slot['end_time'])
+                )
+            AnalyticsService.refresh(conn, doctor_id, (slot['slot_date'], new_date))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Update slot error: {e}")
+            return None, 'Failed to update slot'
+
         updated = query_db('SELECT * FROM slots WHERE id = ?', (slot_id,), one=True)
         return dict(updated), None
 
     @staticmethod
     def delete_slot(slot_id, doctor_id):
         """Delete a slot."""
-        slot = query_db('SELECT * FROM slots WHERE id = ? AND doctor_id = ?',
+        slot = query_db('SELECT * FROM slots WHERE id = ? AND doctor_id = ? AND is_blocked = 0',
                        (slot_id, doctor_id), one=True)
         if not slot:
             return False, 'Slot not found'
         if slot['is_booked']:
             return False, 'Cannot delete a booked slot'
 
-        execute_db('DELETE FROM slots WHERE id = ?', (slot_id,))
+        referenced = query_db('SELECT 1 FROM appointments WHERE slot_id = ? LIMIT 1', (slot_id,), one=True)
+        if referenced or AvailabilityService.is_rule_slot(
+                doctor_id, slot['slot_date'], slot['start_time'], slot['end_time']):
+            # The weekly rules (or appointment history) would bring it back; block it instead
+            execute_db('UPDATE slots SET is_blocked = 1 WHERE id = ?', (slot_id,))
+        else:
+            execute_db('DELETE FROM slots WHERE id = ?', (slot_id,))
+        AppointmentService._refresh_capacity(doctor_id, slot['slot_date'])
         return True, None
 
     @staticmethod
-    def get_doctor_slots(doctor_id, date=None, available_only=False):
-        """Get slots for a doctor."""
-        if date:
-            reference_date = AppointmentService._parse_date(date)
-        else:
-            reference_date = datetime.now()
+    def block_slot(doctor_id, slot_date, start_time):
+        """Take a (possibly rule-derived) slot out of availability."""
+        blocked, err = AvailabilityService.block_slot(doctor_id, slot_date, start_time)
+        if blocked:
+            AppointmentService._refresh_capacity(doctor_id, slot_date)
+        return blocked, err
 
-        month_start, month_end = AppointmentService._month_bounds(reference_date)
-        AppointmentService._generate_month_slots(doctor_id, month_start, month_end)
+    @staticmethod
+    def get_doctor_slots_in_range(doctor_id, start_date, end_date, available_only=False):
+        """Get slots for a doctor between two dates (YYYY-MM-DD, inclusive)."""
+        try:
+            first_day = AppointmentService._parse_date(start_date)
+            last_day = AppointmentService._parse_date(end_date)
+        except (TypeError, ValueError):
+            return None, 'Dates must be in YYYY-MM-DD format'
 
-        query = 'SELECT * FROM slots WHERE doctor_id = ?'
-        params = [doctor_id]
+        if last_day < first_day:
+            return None, 'End date must not be before start date'
+        if (last_day - first_day).days >= AvailabilityService.MAX_RANGE_DAYS:
+            return None, f'Date range cannot exceed {AvailabilityService.MAX_RANGE_DAYS} days'
+
+        return AvailabilityService.compute_slots(doctor_id, first_day, last_day, available_only), None
 
+    @staticmethod
+    def get_doctor_slots(doctor_id, date=None, available_only=False):
+        """Get slots for a doctor for a date, or the current month."""
         if date:
-            query += ' AND slot_date = ?'
-            params.append(date)
+            first_day = last_day = AppointmentService._parse_date(date)
         else:
-            query += ' AND slot_date BETWEEN ? AND ?'
-            params.extend([month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d')])
-
-        if available_only:
-            query += ' AND is_booked = 0'
-        
-        query += ' ORDER BY slot_date, start_time'
-        
-        slots = query_db(query, tuple(params))
-        return [dict(s) for s in slots]
+            first_day, last_day = AppointmentService._month_bounds(datetime.now())
+        return AvailabilityService.compute_slots(doctor_id, first_day, last_day, available_only)
 
     @staticmethod
     def get_doctor_slots_for_month(doctor_id, month_key, available_only=False):
         """Get slots for a doctor for a specific month (YYYY-MM)."""
         month_start, month_end = AppointmentService._month_bounds_from_key(month_key)
-        AppointmentService._generate_month_slots(doctor_id, month_start, month_end)
-
-        query = '''SELECT * FROM slots
-                   WHERE doctor_id = ? AND slot_date BETWEEN ? AND ?'''
-        params = [doctor_id, month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d')]
-
-        if available_only:
-            query += ' AND is_booked = 0'
-
-        query += ' ORDER BY slot_date, start_time'
-        slots = query_db(query, tuple(params))
-        return [dict(s) for s in slots]
+        return AvailabilityService.compute_slots(doctor_id, month_start, month_end, available_only)
 
     @staticmethod
     def get_available_slots(doctor_id, date=None):
         """Get available (unbooked) slots for a doctor."""
         return AppointmentService.get_doctor_slots(doctor_id, date, available_only=True)
 
+    @staticmethod
+    def get_next_available_slots(specialization=None, doctor_ids=None, start_date=None,
+                                 end_date=None, limit=5):
+        """The N earliest open slots across verified doctors of a specialization and/or a doctor list."""
+        if not specialization and not doctor_ids:
+            return None, 'Specialization or doctor_ids is required'
+
+        try:
+            now = datetime.now()
+            first_day = AppointmentService._parse_date(start_date) if start_date else now
+            first_day = max(first_day.replace(hour=0, minute=0, second=0, microsecond=0),
+                            now.replace(hour=0, minute=0, second=0, microsecond=0))
+            last_day = (AppointmentService._parse_date(end_date) if end_date
+                        else first_day + timedelta(days=AppointmentService.NEXT_AVAILABLE_DAYS - 1))
+            doctor_ids = [int(doctor_id) for doctor_id in doctor_ids or []]
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return None, 'Invalid search parameters'
+
+        if last_day < first_day:
+            return None, 'End date must not be before start date'
+        if (last_day - first_day).days >= AvailabilityService.MAX_RANGE_DAYS:
+            return None, f'Date range cannot exceed {AvailabilityService.MAX_RANGE_DAYS} days'
+        if limit < 1 or limit > AppointmentService.NEXT_AVAILABLE_MAX:
+            return None, f'Limit must be between 1 and {AppointmentService.NEXT_AVAILABLE_MAX}'
+
+        conditions, params = ['verified = 1'], []
+        if specialization:
+            conditions.append('specialization = ? COLLATE NOCASE')
+            params.append(specialization)
+        if doctor_ids:
+            conditions.append(f"id IN ({','.join('?' * len(doctor_ids))})")
+            params.extend(doctor_ids)
+        doctors = {
+            row['id']: dict(row)
+            for row in query_db(
+                f'''SELECT id, full_name, specialization, hospital, experience_years, rating
+                    FROM doctors WHERE {' AND '.join(conditions)}''',
+                params
+            )
+        }
+
+        slots = AvailabilityService.next_open_slots(
+            list(doctors), first_day, last_day, limit,
+            not_before=(now.strftime('%Y-%m-%d'), now.strftime('%H:%M'))
+        )
+        for slot in slots:
+            doctor = doctors[slot['doctor_id']]
+            slot['doctor_name'] = doctor['full_name']
+            slot['specialization'] = doctor['specialization']
+            slot['hospital'] = doctor['hospital']
+            slot['experience_years'] = doctor['experience_years']
+            slot['rating'] = doctor['rating']
+        return slots, None
+
     # ─── Appointment Management ───────────────────────────────
 
     @staticmethod
-    def book_appointment(patient_id, doctor_id, slot_id, reason=None):
-        """Book an appointment."""
+    def _claim_slot(conn, slot_id):
+        """Atomically mark an open slot as booked; False if someone else got there first."""
+        return conn.execute(
+            'UPDATE slots SET is_booked = 1 WHERE id = ? AND is_booked = 0 AND is_blocked = 0',
+            (slot_id,)
+        ).rowcount == 1
+
+    @staticmethod
+    def book_appointment(patient_id, doctor_id, slot_id=None, reason=None, slot_date=None, start_time=None,
+                         hold_token=None):
+        """Book an appointment by slot id, by doctor/date/start time, or by converting a slot hold."""
+        if slot_id is None and not hold_token and (doctor_id is None or not slot_date or not start_time):
+            return None, 'Slot ID or doctor, date and start time required'
+
         conn = get_db()
         try:
-            # Check slot availability with row lock
-            slot = conn.execute('SELECT * FROM slots WHERE id = ? AND is_booked = 0',
-                              (slot_id,)).fetchone()
+            # Take the write lock up front so the claim below cannot interleave with another booking
+            conn.execute('BEGIN IMMEDIATE')
+            if hold_token:
+                hold = SlotHoldService.get_live_hold(conn, hold_token, patient_id)
+                if not hold:
+                    conn.rollback()
+                    return None, 'Slot hold has expired, please select the slot again'
+                if doctor_id is not None and int(doctor_id) != hold['doctor_id']:
+                    conn.rollback()
+                    return None, 'Slot does not belong to this doctor'
+                slot_id, slot_date, start_time = None, hold['slot_date'], hold['start_time']
+                doctor_id = hold['doctor_id']
+                if hold['appointment_id']:
+                    # Taking one rebooking proposal gives the others back
+                    SlotHoldService.release_proposals(conn, hold['appointment_id'], keep_token=hold_token)
+
+            if slot_id is None:
+                slot = AvailabilityService.resolve_slot(conn, doctor_id, slot_date, start_time)
+            else:
+                slot = conn.execute('SELECT * FROM slots WHERE id = ?', (slot_id,)).fetchone()
             if not slot:
+                conn.rollback()
                 return None, 'Slot is no longer available'
+            slot_id = slot['id']
 
             # Resolve doctor_id from slot if not provided
             if doctor_id is None:
                 doctor_id = slot['doctor_id']
             elif slot['doctor_id'] != doctor_id:
+                conn.rollback()
                 return None, 'Slot does not belong to this doctor'
 
-            appointment_id = AppointmentService.generate_appointment_id()
+            if not SlotHoldService.check_and_consume(conn, patient_id, doctor_id,
+                                                     slot['slot_date'], slot['start_time']):
+                conn.rollback()
+                return None, 'Slot is being booked by another patient'
+            WaitlistService.fulfil_offer(conn, patient_id, doctor_id, slot['slot_date'], slot['start_time'])
+
+            # Compare-and-set: exactly one concurrent booking can flip is_booked
+            if not AppointmentService._claim_slot(conn, slot_id):
+                conn.rollback()
+                return None, 'Slot is no longer available'
 
-            # Book the slot
-            conn.execute('UPDATE slots SET is_booked = 1 WHERE id = ?', (slot_id,))
+            appointment_id = AppointmentService.generate_appointment_id()
 
             # Create appointment
             conn.execute(
@@ -319,6 +393,7 @@ class AppointmentService:
                    VALUES (?, ?, ?, ?, 'scheduled', ?)''',
                 (appointment_id, patient_id, doctor_id, slot_id, reason)
             )
+            AnalyticsService.refresh(conn, doctor_id, (slot['slot_date'],))
 
             conn.commit()
 
@@ -339,96 +414,289 @@ class AppointmentService:
             conn.rollback()
             logger.error(f"Booking error: {e}")
             return None, 'Booking failed'
-        finally:
-            conn.close()
 
     @staticmethod
     def cancel_appointment(appointment_id, cancelled_by='patient'):
         """Cancel an appointment."""
         conn = get_db()
         try:
+            conn.execute('BEGIN IMMEDIATE')
             apt = conn.execute(
-                'SELECT * FROM appointments WHERE id = ? AND status = "scheduled"',
+                '''SELECT * FROM appointments WHERE id = ?
+                   AND status IN ('scheduled', 'rescheduled', 'otp_pending')''',
                 (appointment_id,)
             ).fetchone()
             if not apt:
+                conn.rollback()
                 return False, 'Appointment not found or cannot be cancelled'
 
-            status = 'cancelled'
-            conn.execute(
-                'UPDATE appointments SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-                (status, appointment_id)
-            )
-            # Free up the slot
+            # Cancel only if the appointment is still open, so a racing cancel or
+            # completion cannot free (and re-offer) the slot a second time
+            cancelled = conn.execute(
+                '''UPDATE appointments SET status = 'cancelled', updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status IN ('scheduled', 'rescheduled', 'otp_pending')''',
+                (appointment_id,)
+            ).rowcount
+            if cancelled != 1:
+                conn.rollback()
+                return False, 'Appointment not found or cannot be cancelled'
+
+            # Free up the slot and offer it to the waitlist before anyone else can see it
             conn.execute('UPDATE slots SET is_booked = 0 WHERE id = ?', (apt['slot_id'],))
+            offer = WaitlistService.offer_freed_slot(conn, apt['slot_id'], exclude_patient_id=apt['patient_id'])
+            AnalyticsService.refresh_slots(conn, (apt['slot_id'],))
             conn.commit()
+            if offer:
+                WaitlistService.notify_offer(offer)
             return True, None
         except Exception as e:
             conn.rollback()
             logger.error(f"Cancel error: {e}")
             return False, 'Cancellation failed'
-        finally:
-            conn.close()
 
     @staticmethod
     def emergency_cancel(appointment_id, doctor_id):
         """Emergency cancellation by doctor."""
         conn = get_db()
         try:
+            conn.execute('BEGIN IMMEDIATE')
             apt = conn.execute(
-                '''SELECT * FROM appointments 
-                   WHERE id = ? AND doctor_id = ? AND status = "scheduled"''',
+                '''SELECT * FROM appointments WHERE id = ? AND doctor_id = ?
+                   AND status IN ('scheduled', 'rescheduled', 'otp_pending')''',
                 (appointment_id, doctor_id)
             ).fetchone()
             if not apt:
+                conn.rollback()
                 return False, None, 'Appointment not found'
 
-            conn.execute(
-                '''UPDATE appointments SET status = "emergency_cancelled", 
-                   updated_at = CURRENT_TIMESTAMP WHERE id = ?''',
+            cancelled = conn.execute(
+                '''UPDATE appointments SET status = 'emergency_cancelled', updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ? AND status IN ('scheduled', 'rescheduled', 'otp_pending')''',
                 (appointment_id,)
-            )
+            ).rowcount
+            if cancelled != 1:
+                conn.rollback()
+                return False, None, 'Appointment not found'
+
             conn.execute('UPDATE slots SET is_booked = 0 WHERE id = ?', (apt['slot_id'],))
+            offer = WaitlistService.offer_freed_slot(conn, apt['slot_id'], exclude_patient_id=apt['patient_id'])
+            AnalyticsService.refresh_slots(conn, (apt['slot_id'],))
             conn.commit()
+            if offer:
+                WaitlistService.notify_offer(offer)
             return True, apt['patient_id'], None
         except Exception as e:
             conn.rollback()
             logger.error(f"Emergency cancel error: {e}")
             return False, None, 'Emergency cancellation failed'
-        finally:
-            conn.close()
 
     @staticmethod
-    def reschedule_appointment(appointment_id, new_slot_id, patient_id):
-        """Reschedule an appointment to a new slot."""
+    def bulk_emergency_cancel(doctor_id, start_date, end_date=None):
+        """Cancel all of a doctor's upcoming appointments in a date range and propose replacements.
+
+        Everything happens in one transaction: the appointments are cancelled,
+        their slots blocked (the doctor is unavailable), and each patient gets
+        up to PROPOSALS_PER_APPOINTMENT replacement slots held for them, taken
+        from one search over the doctor's own slots after the range followed by
+        one search over verified peers of the same specialization. Patients and
+        the doctor are notified with a single bulk insert.
+        """
+        try:
+            first_day = AppointmentService._parse_date(start_date)
+            last_day = AppointmentService._parse_date(end_date) if end_date else first_day
+        except (TypeError, ValueError):
+            return None, 'Dates must be YYYY-MM-DD'
+        if last_day < first_day:
+            return None, 'End date must not be before start date'
+        if (last_day - first_day).days >= AvailabilityService.MAX_RANGE_DAYS:
+            return None, f'Date range cannot exceed {AvailabilityService.MAX_RANGE_DAYS} days'
+
+        now = datetime.now()
+        not_before = (now.strftime('%Y-%m-%d'), now.strftime('%H:%M'))
         conn = get_db()
         try:
+            conn.execute('BEGIN IMMEDIATE')
+            doctor = conn.execute(
+                'SELECT id, full_name, specialization FROM doctors WHERE id = ?', (doctor_id,)
+            ).fetchone()
+            if not doctor:
+                conn.rollback()
+                return None, 'Doctor not found'
+
+            appointments = [
+                dict(row) for row in conn.execute(
+                    '''SELECT a.id, a.appointment_id, a.patient_id, a.slot_id,
+                              s.slot_date, s.start_time, s.end_time
+                       FROM appointments a JOIN slots s ON a.slot_id = s.id
+                       WHERE a.doctor_id = ? AND a.status = 'scheduled'
+                         AND s.slot_date BETWEEN ? AND ?
+                       ORDER BY s.slot_date, s.start_time''',
+                    (doctor_id, first_day.strftime('%Y-%m-%d'), last_day.strftime('%Y-%m-%d'))
+                )
+                if (row['slot_date'], row['start_time']) > not_before
+            ]
+            if not appointments:
+                conn.rollback()
+                return {'cancelled': 0, 'appointments': []}, None
+
+            conn.executemany(
+                '''UPDATE appointments SET status = 'emergency_cancelled',
+                   updated_at = CURRENT_TIMESTAMP WHERE id = ?''',
+                [(apt['id'],) for apt in appointments]
+            )
+            # The doctor is out: keep the freed slots closed instead of offering them to anyone
+            conn.executemany(
+                'UPDATE slots SET is_booked = 0, is_blocked = 1 WHERE id = ?',
+                [(apt['slot_id'],) for apt in appointments]
+            )
+
+            wanted = len(appointments) * AppointmentService.PROPOSALS_PER_APPOINTMENT
+            window_end = last_day + timedelta(days=AppointmentService.NEXT_AVAILABLE_DAYS)
+            candidates = AvailabilityService.next_open_slots(
+                [doctor['id']], last_day + timedelta(days=1), window_end, wanted,
+                not_before=not_before, conn=conn
+            )
+            peers = [
+                row['id'] for row in conn.execute(
+                    '''SELECT id FROM doctors
+                       WHERE specialization = ? COLLATE NOCASE AND verified = 1 AND id != ?''',
+                    (doctor['specialization'], doctor['id'])
+                )
+            ] if doctor['specialization'] else []
+            if peers:
+                candidates += AvailabilityService.next_open_slots(
+                    peers, max(first_day, now.replace(hour=0, minute=0, second=0, microsecond=0)),
+                    window_end, wanted, not_before=not_before, conn=conn
+                )
+            names = {
+                row['id']: row['full_name'] for row in conn.execute(
+                    f"SELECT id, full_name FROM doctors WHERE id IN ({','.join('?' * (len(peers) + 1))})",
+                    [doctor['id']] + peers
+                )
+            }
+
+            # Deal candidates out round-robin so every patient gets an early slot before anyone gets a second
+            candidates = iter(candidates)
+            for apt in appointments:
+                apt['proposals'] = []
+            for _ in range(AppointmentService.PROPOSALS_PER_APPOINTMENT):
+                for apt in appointments:
+                    for slot in candidates:
+                        hold = SlotHoldService.place_hold(
+                            conn, apt['patient_id'], slot,
+                            ttl_seconds=AppointmentService.PROPOSAL_TTL_SECONDS, appointment_id=apt['id']
+                        )
+                        if hold:
+                            hold['doctor_name'] = names.get(slot['doctor_id'])
+                            apt['proposals'].append(hold)
+                            break
+
+            notifications = []
+            for apt in appointments:
+                options = '; '.join(
+                    f"{p['doctor_name']} on {p['slot_date']} at {p['start_time']}" for p in apt['proposals']
+                )
+                notifications.append({
+                    'recipient_type': 'patient',
+                    'title': 'Emergency: Appointment Cancelled',
+                    'message': f"Your appointment on {apt['slot_date']} at {apt['start_time']} has been "
+                               f"cancelled due to an emergency. "
+                               + (f"We are holding these replacement slots for you: {options}."
+                                  if options else 'Please reschedule at your earliest convenience.'),
+                    'notification_type': 'emergency',
+                    'user_id': apt['patient_id'],
+                    'appointment_id': apt['id'],
+                })
+            notifications.append({
+                'recipient_type': 'doctor',
+                'title': 'Appointments Cancelled',
+                'message': f"{len(appointments)} appointment(s) between {first_day.strftime('%Y-%m-%d')} and "
+                           f"{last_day.strftime('%Y-%m-%d')} were cancelled and the patients notified.",
+                'notification_type': 'emergency',
+                'doctor_id': doctor['id'],
+            })
+            NotificationService.create_notifications(notifications, conn=conn)
+            AnalyticsService.refresh(conn, doctor['id'], (apt['slot_date'] for apt in appointments))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Bulk emergency cancel error: {e}")
+            return None, 'Emergency cancellation failed'
+
+        return {
+            'cancelled': len(appointments),
+            'appointments': [
+                {
+                    **{key: apt[key] for key in ('id', 'appointment_id', 'patient_id', 'slot_date', 'start_time')},
+                    # Hold tokens stay with the patient (GET /<id>/proposals)
+                    'proposals': [{k: v for k, v in p.items() if k != 'hold_token'} for p in apt['proposals']],
+                }
+                for apt in appointments
+            ],
+        }, None
+
+    @staticmethod
+    def reschedule_appointment(appointment_id, new_slot_id, patient_id, new_slot_date=None, new_start_time=None):
+        """Reschedule an appointment to a new slot (by id, or by date/start time with the same doctor)."""
+        if new_slot_id is None and (not new_slot_date or not new_start_time):
+            return None, 'New slot ID or date and start time required'
+
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
             apt = conn.execute(
                 '''SELECT * FROM appointments WHERE id = ? AND patient_id = ?
                    AND status IN ("scheduled", "emergency_cancelled")''',
                 (appointment_id, patient_id)
             ).fetchone()
             if not apt:
+                conn.rollback()
                 return None, 'Appointment not found or cannot be rescheduled'
 
-            new_slot = conn.execute(
-                'SELECT * FROM slots WHERE id = ? AND is_booked = 0',
-                (new_slot_id,)
-            ).fetchone()
-            if not new_slot:
+            if new_slot_id is None:
+                new_slot = AvailabilityService.resolve_slot(
+                    conn, apt['doctor_id'], new_slot_date, new_start_time
+                )
+            else:
+                new_slot = conn.execute('SELECT * FROM slots WHERE id = ?', (new_slot_id,)).fetchone()
+            if not new_slot or not AppointmentService._claim_slot(conn, new_slot['id']):
+                conn.rollback()
                 return None, 'New slot is not available'
-
-            # Free old slot
-            conn.execute('UPDATE slots SET is_booked = 0 WHERE id = ?', (apt['slot_id'],))
-            # Book new slot
-            conn.execute('UPDATE slots SET is_booked = 1 WHERE id = ?', (new_slot_id,))
-            # Update appointment
-            conn.execute(
+            if not SlotHoldService.check_and_consume(conn, patient_id, new_slot['doctor_id'],
+                                                     new_slot['slot_date'], new_slot['start_time']):
+                conn.rollback()
+                return None, 'New slot is being booked by another patient'
+            new_slot_id = new_slot['id']
+
+            # Move the appointment only if it still points at the slot we read
+            moved = conn.execute(
                 '''UPDATE appointments SET slot_id = ?, status = "rescheduled",
-                   updated_at = CURRENT_TIMESTAMP WHERE id = ?''',
-                (new_slot_id, appointment_id)
-            )
+                   updated_at = CURRENT_TIMESTAMP WHERE id = ? AND slot_id = ?''',
+                (new_slot_id, appointment_id, apt['slot_id'])
+            ).rowcount
+            if moved != 1:
+                conn.rollback()
+                return None, 'Appointment not found or cannot be rescheduled'
+
+            # Free the old slot only if this appointment still held it: an emergency
+            # cancel has already released it, and someone else may have booked it since
+            freed = 0
+            if apt['status'] == 'scheduled':
+                freed = conn.execute(
+                    '''UPDATE slots SET is_booked = 0 WHERE id = ? AND NOT EXISTS (
+                           SELECT 1 FROM appointments WHERE slot_id = ? AND id != ?
+                           AND status IN ('scheduled', 'rescheduled', 'otp_pending'))''',
+                    (apt['slot_id'], apt['slot_id'], appointment_id)
+                ).rowcount
+            # Offer the old slot to the waitlist only if this transaction actually released it
+            offer = None
+            if freed:
+                offer = WaitlistService.offer_freed_slot(conn, apt['slot_id'], exclude_patient_id=patient_id)
+            # The old day's rollup changes either way: the appointment has left it
+            AnalyticsService.refresh_slots(conn, (apt['slot_id'], new_slot_id))
             conn.commit()
+            if offer:
+                WaitlistService.notify_offer(offer)
 
             updated = conn.execute(
                 '''SELECT a.*, s.slot_date, s.start_time, s.end_time,
@@ -444,12 +712,12 @@ class AppointmentService:
             conn.rollback()
             logger.error(f"Reschedule error: {e}")
             return None, 'Rescheduling failed'
-        finally:
-            conn.close()
 
     @staticmethod
-    def get_patient_appointments(patient_id, status=None):
-        """Get appointments for a patient."""
+    def get_patient_appointments(patient_id, status=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get appointments for a patient, latest slot first: (appointments, next_cursor)."""
+        sort = ['s.slot_date', 's.start_time', 'a.id']
+        after, keyset_params = keyset(sort, cursor)
         query = '''SELECT a.*, s.slot_date, s.start_time, s.end_time,
                    d.full_name as doctor_name, d.specialization, d.hospital,
                    d.doctor_id as doctor_code
@@ -463,14 +731,17 @@ class AppointmentService:
             query += ' AND a.status = ?'
             params.append(status)
         
-        query += ' ORDER BY s.slot_date DESC, s.start_time DESC'
-        
+        query += f' AND {after} {order_by(sort)} LIMIT ?'
+        params += [*keyset_params, limit + 1]
+
         appointments = query_db(query, tuple(params))
-        return [dict(a) for a in appointments]
+        return paginate(appointments, limit, lambda a: (a['slot_date'], a['start_time'], a['id']))
 
     @staticmethod
-    def get_doctor_appointments(doctor_id, status=None):
-        """Get appointments for a doctor."""
+    def get_doctor_appointments(doctor_id, status=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get appointments for a doctor, latest slot first: (appointments, next_cursor)."""
+        sort = ['s.slot_date', 's.start_time', 'a.id']
+        after, keyset_params = keyset(sort, cursor)
         query = '''SELECT a.*, s.slot_date, s.start_time, s.end_time,
                    u.full_name as patient_name, u.patient_id as patient_code,
                    u.email as patient_email, u.phone as patient_phone
@@ -484,10 +755,11 @@ class AppointmentService:
             query += ' AND a.status = ?'
             params.append(status)
         
-        query += ' ORDER BY s.slot_date DESC, s.start_time DESC'
-        
+        query += f' AND {after} {order_by(sort)} LIMIT ?'
+        params += [*keyset_params, limit + 1]
+
         appointments = query_db(query, tuple(params))
-        return [dict(a) for a in appointments]
+        return paginate(appointments, limit, lambda a: (a['slot_date'], a['start_time'], a['id']))
 
     @staticmethod
     def update_appointment_status(appointment_id, status):
@@ -497,10 +769,13 @@ class AppointmentService:
         if status not in valid:
             return False, 'Invalid status'
         
-        execute_db(
+        conn = get_db()
+        conn.execute(
             'UPDATE appointments SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
             (status, appointment_id)
         )
+        AnalyticsService.refresh_appointments(conn, (appointment_id,))
+        conn.commit()
         return True, None
 
     @staticmethod
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from backend.services.chatbot_service import ChatbotService, ReplyStreamParser
+from backend.services.local_ai_fallback import generate_fallback_response
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncChatService:
+    """
+    The ChatbotService message pipeline on asyncio, for the async chat server.
+
+    The model call is awaited on an AsyncLLMClient, so a turn waiting on
+    OpenRouter costs a coroutine rather than a worker thread. Database
+    work (history, saving messages, doctor lookups) is the same
+    ChatbotService code, run on a small thread pool inside an app context:
+    SQLite has no async driver, and those queries take milliseconds, so a
+    few threads keep up with thousands of turns waiting on the model.
+    """
+
+    def __init__(self, app, client, db_workers=4):
+        self.app = app
+        self.client = client
+        self.db_workers = db_workers
+        self._executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='chat-db')
+        # Only touched from the event loop's thread, so no lock is needed
+        self._stats = {'turns': 0, 'in_flight': 0, 'peak_in_flight': 0, 'local_fallbacks': 0, 'interrupted': 0}
+
+    def _in_app_context(self, fn, args):
+        with self.app.app_context():
+            return fn(*args)
+
+    async def run_db(self, fn, *args):
+        """Run a blocking database call on the DB thread pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._in_app_context, fn, args)
+
+    def _begin(self):
+        self._stats['turns'] += 1
+        self._stats['in_flight'] += 1
+        self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._stats['in_flight'])
+
+    async def _local_fallback(self, user_id, session_id, user_message, error):
+        # OpenRouter failed — use local fallback symptom analyzer
+        logger.warning(f"OpenRouter unavailable ({error}), using local fallback")
+        self._stats['local_fallbacks'] += 1
+        fallback_response, parsed_data = generate_fallback_response(user_message)
+        await self.run_db(ChatbotService.save_message, user_id, session_id, 'assistant',
+                          fallback_response, parsed_data)
+        return fallback_response, parsed_data
+
+    async def process_message(self, user_id, session_id, user_message):
+        """As ChatbotService.process_message: (response, parsed_data, ai_error)."""
+        self._begin()
+        try:
+            messages = await self.run_db(ChatbotService.build_context, user_id, session_id, user_message)
+
+            ai_response, error = await self.client.complete(messages)
+            if error:
+                fallback_response, parsed_data = await self._local_fallback(user_id, session_id, user_message, error)
+                return fallback_response, parsed_data, None
+
+            clean_response, parsed_data = ChatbotService.finalize_reply(ai_response)
+            await self.run_db(ChatbotService.save_message, user_id, session_id, 'assistant',
+                              clean_response, parsed_data or None)
+            return clean_response, parsed_data, None
+        finally:
+            self._stats['in_flight'] -= 1
+
+    async def stream_message(self, user_id, session_id, user_message):
+        """As ChatbotService.stream_message, as an async generator of (event, data) pairs.
+
+        Call aclose() if the consumer stops early; the partial reply is then saved.
+        """
+        self._begin()
+        try:
+            messages = await self.run_db(ChatbotService.build_context, user_id, session_id, user_message)
+
+            deltas, error = await self.client.open_stream(messages)
+            if error:
+                fallback_response, parsed_data = await self._local_fallback(user_id, session_id, user_message, error)
+                yield 'token', {'text': fallback_response}
+                yield 'done', {'response': fallback_response, 'parsed_data': parsed_data, 'ai_error': None}
+                return
+
+            parser = ReplyStreamParser()
+            saved = False
+            try:
+                async for delta in deltas:
+                    for event in parser.feed(delta):
+                        yield event
+                for event in parser.finish():
+                    yield event
+                clean_response, parsed_data = ChatbotService.finalize_reply(parser.text)
+                await self.run_db(ChatbotService.save_message, user_id, session_id, 'assistant',
+                                  clean_response, parsed_data or None)
+                saved = True
+                yield 'done', {'response': clean_response, 'parsed_data': parsed_data, 'ai_error': None}
+            except Exception as e:
+                logger.warning(f"OpenRouter stream interrupted: {e}")
+                self._stats['interrupted'] += 1
+                yield 'error', {'message': 'AI response was interrupted'}
+            finally:
+                await deltas.aclose()
+                # Interrupted or abandoned: keep whatever the model had written so far
+                if not saved and parser.text.strip():
+                    clean_response, parsed_data = ChatbotService.finalize_reply(parser.text)
+                    await self.run_db(ChatbotService.save_message, user_id, session_id, 'assistant',
+                                      clean_response, parsed_data or None)
+        finally:
+            self._stats['in_flight'] -= 1
+
+    async def close(self):
+        await self.client.close()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {**self._stats, 'db_workers': self.db_workers, 'llm_client': self.client.stats()}
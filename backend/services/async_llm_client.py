@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import time
+import aiohttp
+from backend.services.llm_client import (
+    PLACEHOLDER_KEY, STREAM_DONE, RequestMetrics, build_payload, client_settings, model_breakers,
+    parse_stream_line, request_headers
+)
+from backend.utils.circuit_breaker import OPEN
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient, used by the async chat server.
+
+    Waiting on the API (and between retries) suspends the chat turn's
+    coroutine instead of holding a thread, so one process can keep
+    thousands of turns in flight. Retries, model fallback, circuit
+    breakers, hedging and error strings match LLMClient; a hedge's losing
+    request is cancelled outright. The aiohttp session is created on first use,
+    inside the event loop that serves the turns; pool_size caps the open
+    connections to the API host and turns beyond it wait for one.
+    """
+
+    def __init__(self, api_key, base_url, primary_model, fallback_model=None, pool_size=1000,
+                 connect_timeout=5.0, read_timeout=30.0, max_retries=2, retry_delay=1.0, breaker_settings=None,
+                 hedge=False, hedge_settings=None):
+        self.api_key = api_key or ''
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.primary_model = primary_model
+        self.models = [primary_model]
+        if fallback_model and fallback_model != primary_model:
+            self.models.append(fallback_model)
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.breakers = model_breakers(self.models, breaker_settings)
+        self.hedge = hedge
+        self.metrics = RequestMetrics(self.models, **(hedge_settings or {}))
+        self._session = None
+        # Only touched from the event loop's thread, so no lock is needed
+        self._stats = {'calls': 0, 'attempts': 0, 'successes': 0, 'fallback_successes': 0, 'failures': 0,
+                       'short_circuits': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**client_settings(config, 'ASYNC_LLM_POOL_SIZE', 1000))
+
+    @property
+    def configured(self):
+        return bool(self.api_key) and self.api_key != PLACEHOLDER_KEY
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                  headers=request_headers(self.api_key))
+        return self._session
+
+    async def _send(self, messages, max_retries, retry_delay, max_tokens, temperature, stream=False, hedge=None):
+        """POST with retries and model fallback until a 200 arrives: (response, model, error).
+
+        Same policy as LLMClient._send; the caller releases the response.
+        """
+        if not self.configured:
+            return None, None, 'OpenRouter API key not configured'
+        max_retries = self.max_retries if max_retries is None else max_retries
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+        hedge = self.hedge if hedge is None else hedge
+        self._stats['calls'] += 1
+
+        started = time.monotonic()
+        args = (messages, max_retries, retry_delay, max_tokens, temperature, stream)
+        if hedge and len(self.models) > 1:
+            response, model, err, hedged = await self._send_hedged(*args)
+        else:
+            (response, model, err), hedged = await self._send_in_order(*args), False
+
+        if response is None:
+            self._stats['failures'] += 1
+            return None, model, err
+        self.metrics.record_call(model, hedged, (time.monotonic() - started) * 1000)
+        if model != self.primary_model:
+            logger.info(f"Success with fallback model: {model}")
+            self._stats['fallback_successes'] += 1
+            if hedged:
+                self._stats['hedge_wins'] += 1
+        self._stats['successes'] += 1
+        return response, model, None
+
+    async def _send_in_order(self, messages, max_retries, retry_delay, max_tokens, temperature, stream):
+        """Each model in turn: (response, model, error)."""
+        last_error = None
+        attempted = False
+        for model in self.models:
+            response, error, final, tried = await self._try_model(model, messages, max_retries, retry_delay,
+                                                                  max_tokens, temperature, stream)
+            attempted = attempted or tried
+            if response is not None:
+                return response, model, None
+            if final:
+                return None, model, error
+            last_error = error
+
+        if not attempted:
+            # Every model's breaker is open: fail now so the caller can use the local fallback
+            self._stats['short_circuits'] += 1
+        return None, None, f'AI service unavailable ({last_error})'
+
+    async def _send_hedged(self, messages, max_retries, retry_delay, max_tokens, temperature, stream):
+        """As LLMClient._send_hedged: (response, model, error, hedged).
+
+        Each model's attempts run as a task; when one wins, the other task
+        is cancelled, which aborts its request mid-flight.
+        """
+        loop = asyncio.get_running_loop()
+        primary, fallback = self.models[0], self.models[1]
+        args = (messages, max_retries, retry_delay, max_tokens, temperature, stream)
+        legs = {asyncio.ensure_future(self._try_model(primary, *args)): primary}
+        pending = set(legs)
+        hedge_at = loop.time() + self.metrics.hedge_delay_ms(stream) / 1000
+        hedged = False
+        last_error = None
+        attempted = False
+        try:
+            while pending:
+                racing = len(legs) > 1 or hedge_at is None
+                timeout = None if racing else max(0.0, hedge_at - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    response, error, final, tried = task.result()
+                    attempted = attempted or tried
+                    if response is None:
+                        if final:
+                            return None, legs[task], error, hedged
+                        last_error = error
+                    elif winner is None:
+                        winner = response, legs[task]
+                    else:
+                        response.release()
+                if winner:
+                    return winner[0], winner[1], None, hedged
+
+                if len(legs) == 1:
+                    if pending and self.breakers[fallback].state == OPEN:
+                        # Nothing to race with: keep waiting on the primary
+                        hedge_at = None
+                        continue
+                    hedged = bool(pending)
+                    if hedged:
+                        logger.info(f"No answer from {primary} in time, hedging with {fallback}")
+                        self._stats['hedges'] += 1
+                    task = asyncio.ensure_future(self._try_model(fallback, *args))
+                    legs[task] = fallback
+                    pending.add(task)
+        finally:
+            # Also runs if this call is itself cancelled, so no task outlives it
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                # A loser that got its 200 just before the cancel
+                if isinstance(result, tuple) and result[0] is not None:
+                    result[0].release()
+
+        if not attempted:
+            self._stats['short_circuits'] += 1
+        return None, None, f'AI service unavailable ({last_error})', hedged
+
+    async def _try_model(self, model, messages, max_retries, retry_delay, max_tokens, temperature, stream):
+        """As LLMClient._try_model: (response, error, final, attempted)."""
+        session = self._get_session()
+        breaker = self.breakers[model]
+        payload = build_payload(model, messages, max_tokens, temperature, stream)
+        last_error = None
+        attempted = False
+        for attempt in range(max_retries):
+            if not breaker.allow():
+                logger.warning(f"Circuit open for {model}, skipping")
+                last_error = f'Circuit open for {model}'
+                break
+            attempted = True
+            self._stats['attempts'] += 1
+            started = time.monotonic()
+            ok = False
+            try:
+                logger.info(f"Calling OpenRouter (async) with model={model}, attempt={attempt + 1}")
+                response = await session.post(self.url, json=payload)
+
+                if response.status == 200:
+                    ok = True
+                    self.metrics.record_attempt(model, stream, (time.monotonic() - started) * 1000)
+                    return response, None, False, True
+
+                body = await response.text()
+                response.release()
+
+                # Auth errors - do not retry, do not fallback
+                if response.status in (401, 403):
+                    logger.error(f"OpenRouter Auth Error: {body}")
+                    return None, 'Invalid API Key or Permissions', True, True
+
+                # Rate limited (429) - skip to fallback model immediately
+                if response.status == 429:
+                    logger.warning(f"Model {model} rate-limited (429), switching to fallback...")
+                    last_error = f'Rate limited on {model}'
+                    break
+
+                last_error = f'HTTP {response.status}: {body[:200]}'
+                logger.warning(f"OpenRouter attempt {attempt + 1} with {model} failed: {last_error}")
+            except asyncio.CancelledError:
+                ok = None
+                raise
+            except asyncio.TimeoutError:
+                last_error = f'Timeout on {model}'
+                logger.warning(f"OpenRouter timeout (attempt {attempt + 1}) with {model}")
+            except aiohttp.ClientConnectionError:
+                last_error = 'Connection error'
+                logger.warning(f"OpenRouter connection error (attempt {attempt + 1})")
+            except Exception as e:
+                last_error = str(e)
+                logger.error(f"OpenRouter unexpected error: {e}")
+            finally:
+                if ok is None:
+                    # The chat turn (or a hedge's losing side) was abandoned, which says nothing about the model
+                    breaker.cancel()
+                else:
+                    breaker.record(ok, (time.monotonic() - started) * 1000)
+
+            # No point waiting to retry a model whose breaker just opened
+            if attempt < max_retries - 1 and breaker.state != OPEN:
+                await asyncio.sleep(retry_delay)
+        return None, last_error, False, attempted
+
+    async def complete(self, messages, max_retries=None, retry_delay=None, max_tokens=500, temperature=0.7,
+                       hedge=None):
+        """Chat completion with retries and model fallback: (content, error)."""
+        response, _, err = await self._send(messages, max_retries, retry_delay, max_tokens, temperature,
+                                            hedge=hedge)
+        if err:
+            return None, err
+        try:
+            async with response:
+                data = await response.json(content_type=None)
+            return data['choices'][0]['message']['content'], None
+        except (ValueError, KeyError, IndexError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"OpenRouter malformed response: {e}")
+            return None, 'AI service returned a malformed response'
+
+    async def open_stream(self, messages, max_retries=None, retry_delay=None, max_tokens=500, temperature=0.7,
+                          hedge=None):
+        """Start a streamed completion: (async iterator of text deltas, error).
+
+        As LLMClient.open_stream; call aclose() on the iterator if it is
+        abandoned before the end so the response is released.
+        """
+        response, _, err = await self._send(messages, max_retries, retry_delay, max_tokens, temperature,
+                                            stream=True, hedge=hedge)
+        if err:
+            return None, err
+        return self._deltas(response), None
+
+    @staticmethod
+    async def _deltas(response):
+        try:
+            # StreamReader iterates line by line as the body arrives
+            async for raw in response.content:
+                text = parse_stream_line(raw.decode('utf-8').rstrip('\r\n'))
+                if text is STREAM_DONE:
+                    # Read to the end of the body so the connection is reused, not closed
+                    async for _ in response.content:
+                        pass
+                    break
+                if text:
+                    yield text
+        finally:
+            response.release()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    def stats(self):
+        return {
+            **self._stats,
+            'configured': self.configured,
+            'models': list(self.models),
+            'pool_size': self.pool_size,
+            'timeout': list(self.timeout),
+            'breakers': {model: breaker.stats() for model, breaker in self.breakers.items()},
+            'hedge': self.hedge,
+            **self.metrics.stats(),
+        }
@@ -2,6 +2,7 @@ import uuid
 import logging
 from werkzeug.security import generate_password_hash, check_password_hash
 from backend.utils.database import query_db, execute_db
+from backend.services.doctor_service import DoctorService
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +110,8 @@ class AuthService:
                 (doctor_id, full_name, email, phone, password_hash,
                  specialization, experience_years, hospital, bio)
             )
+            # Unverified doctors show up in the /api/doctors/all listing
+            DoctorService.doctors_changed()
             doctor = query_db(
                 '''SELECT id, doctor_id, full_name, email, phone, specialization,
                    experience_years, hospital, bio, verified
@@ -0,0 +1,360 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import islice
+from backend.utils.database import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityService:
+    """Rule-derived availability engine.
+
+    Open slots are computed on the fly from doctor_availability_rules minus the
+    persisted slot rows. A row is only written to `slots` when a slot is booked,
+    manually added/edited, or blocked by the doctor.
+    """
+
+    MAX_RANGE_DAYS = 92
+
+    # Precomputed rolling horizon, maintained by AvailabilityWorker:
+    # {doctor_id: {'version': rules_version, 'days': {slot_date: [(start, end), ...]}}}
+    _horizon = {}
+    _horizon_lock = threading.Lock()
+
+    @staticmethod
+    def _as_date(value):
+        if isinstance(value, str):
+            return datetime.strptime(value, '%Y-%m-%d')
+        return datetime(value.year, value.month, value.day)
+
+    @staticmethod
+    def get_weekly_rules(doctor_id, conn=None):
+        rules = (conn or get_db()).execute(
+            '''SELECT id, doctor_id, weekday, start_time, end_time,
+                      slot_duration_minutes, active
+               FROM doctor_availability_rules
+               WHERE doctor_id = ? AND active = 1
+               ORDER BY weekday, start_time''',
+            (doctor_id,)
+        ).fetchall()
+        return [dict(rule) for rule in rules]
+
+    @staticmethod
+    def weekday_intervals(rules):
+        """Expand weekly rules into {weekday: [(start_time, end_time), ...]}."""
+        intervals = {}
+        for rule in rules:
+            start_time = datetime.strptime(rule['start_time'], '%H:%M')
+            end_time = datetime.strptime(rule['end_time'], '%H:%M')
+            slot_duration = timedelta(minutes=int(rule['slot_duration_minutes'] or 30))
+
+            day_intervals = intervals.setdefault(rule['weekday'], [])
+            slot_cursor = start_time
+            while slot_cursor + slot_duration <= end_time:
+                slot_end = slot_cursor + slot_duration
+                day_intervals.append((slot_cursor.strftime('%H:%M'), slot_end.strftime('%H:%M')))
+                slot_cursor = slot_end
+        return intervals
+
+    @staticmethod
+    def expand_days(intervals, first_day, days):
+        """Map each date in [first_day, first_day + days) to its rule-derived intervals."""
+        expanded = {}
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            expanded[day.strftime('%Y-%m-%d')] = intervals.get(day.weekday(), [])
+        return expanded
+
+    @staticmethod
+    def set_horizon(doctor_id, version, days):
+        with AvailabilityService._horizon_lock:
+            AvailabilityService._horizon[doctor_id] = {'version': version, 'days': days}
+
+    @staticmethod
+    def invalidate_horizon(doctor_id=None):
+        """Drop precomputed days for a doctor (or everyone) so reads fall back to the rules."""
+        with AvailabilityService._horizon_lock:
+            if doctor_id is None:
+                AvailabilityService._horizon.clear()
+            else:
+                AvailabilityService._horizon.pop(doctor_id, None)
+
+    @staticmethod
+    def horizon_versions():
+        with AvailabilityService._horizon_lock:
+            return {doctor_id: entry['version'] for doctor_id, entry in AvailabilityService._horizon.items()}
+
+    @staticmethod
+    def retain_horizon(doctor_ids):
+        with AvailabilityService._horizon_lock:
+            for doctor_id in set(AvailabilityService._horizon) - set(doctor_ids):
+                del AvailabilityService._horizon[doctor_id]
+
+    @staticmethod
+    def _horizon_days(doctor_id):
+        with AvailabilityService._horizon_lock:
+            entry = AvailabilityService._horizon.get(doctor_id)
+        return entry['days'] if entry else {}
+
+    @staticmethod
+    def _persisted_by_day(conn, doctor_id, start_date, end_date):
+        rows = conn.execute(
+            '''SELECT * FROM slots
+               WHERE doctor_id = ? AND slot_date BETWEEN ? AND ?
+               ORDER BY slot_date, start_time''',
+            (doctor_id, start_date, end_date)
+        ).fetchall()
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row['slot_date'], []).append(dict(row))
+        return by_day
+
+    @staticmethod
+    def _held_by_day(conn, doctor_ids, start_date, end_date):
+        """Start times under a live checkout hold, as {(doctor_id, slot_date): {start_time, ...}}."""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        held = {}
+        for row in conn.execute(
+            f'''SELECT doctor_id, slot_date, start_time FROM slot_holds
+                WHERE doctor_id IN ({','.join('?' * len(doctor_ids))})
+                  AND slot_date BETWEEN ? AND ? AND expires_at > ?''',
+            (*doctor_ids, start_date, end_date, now)
+        ).fetchall():
+            held.setdefault((row['doctor_id'], row['slot_date']), set()).add(row['start_time'])
+        return held
+
+    @staticmethod
+    def _build_day(doctor_id, slot_date, day_intervals, rows, held=()):
+        """Merge one day's rule intervals with its persisted rows, sorted by start time.
+
+        Open slots whose start time is in `held` are left out.
+        """
+        day_slots = []
+        for start_time, end_time in day_intervals:
+            if start_time in held:
+                continue
+            if any(row['start_time'] < end_time and row['end_time'] > start_time for row in rows):
+                continue
+            day_slots.append({
+                'id': None,
+                'doctor_id': doctor_id,
+                'slot_date': slot_date,
+                'start_time': start_time,
+                'end_time': end_time,
+                'is_booked': 0,
+                'is_virtual': 1,
+            })
+
+        for row in rows:
+            if row.get('is_blocked') or (not row['is_booked'] and row['start_time'] in held):
+                continue
+            row['is_virtual'] = 0
+            day_slots.append(row)
+
+        day_slots.sort(key=lambda slot: slot['start_time'])
+        return day_slots
+
+    @staticmethod
+    def compute_slots(doctor_id, start_date, end_date, available_only=False, conn=None, use_horizon=True,
+                      include_held=False):
+        """Slots for a doctor between two dates (inclusive), without writing anything.
+
+        Rule-derived slots that have no row are returned with id None and
+        is_virtual 1; they are materialized by resolve_slot at booking time.
+        Virtual slots overlapping a persisted row (booked, blocked or manual)
+        are suppressed, and blocked rows are never returned. Slots under a live
+        checkout hold are left out unless include_held is set. Days inside the
+        precomputed horizon skip the rules lookup entirely.
+        """
+        conn = conn or get_db()
+        first_day = AvailabilityService._as_date(start_date)
+        last_day = AvailabilityService._as_date(end_date)
+
+        horizon_days = AvailabilityService._horizon_days(doctor_id) if use_horizon else {}
+        intervals = None
+        first_key, last_key = first_day.strftime('%Y-%m-%d'), last_day.strftime('%Y-%m-%d')
+        persisted = AvailabilityService._persisted_by_day(conn, doctor_id, first_key, last_key)
+        held = {} if include_held else AvailabilityService._held_by_day(conn, [doctor_id], first_key, last_key)
+
+        slots = []
+        current_day = first_day
+        while current_day <= last_day:
+            slot_date = current_day.strftime('%Y-%m-%d')
+            rows = persisted.get(slot_date, [])
+
+            day_intervals = horizon_days.get(slot_date)
+            if day_intervals is None:
+                if intervals is None:
+                    intervals = AvailabilityService.weekday_intervals(
+                        AvailabilityService.get_weekly_rules(doctor_id, conn)
+                    )
+                day_intervals = intervals.get(current_day.weekday(), ())
+
+            slots.extend(AvailabilityService._build_day(
+                doctor_id, slot_date, day_intervals, rows, held.get((doctor_id, slot_date), ())
+            ))
+            current_day += timedelta(days=1)
+
+        if available_only:
+            slots = [slot for slot in slots if not slot['is_booked']]
+        return slots
+
+    @staticmethod
+    def next_open_slots(doctor_ids, start_date, end_date, limit, not_before=None, conn=None):
+        """The `limit` earliest open slots across several doctors, in time order.
+
+        Each doctor's slots are produced lazily day by day and combined with a
+        heap merge, so generation stops as soon as `limit` slots are found.
+        Persisted rows and any rules not covered by the horizon are fetched in
+        one query each. `not_before` is an optional (slot_date, start_time)
+        cut-off that excludes slots starting at or before it.
+        """
+        doctor_ids = list(dict.fromkeys(doctor_ids))
+        if not doctor_ids or limit <= 0:
+            return []
+
+        conn = conn or get_db()
+        first_day = AvailabilityService._as_date(start_date)
+        last_day = AvailabilityService._as_date(end_date)
+        first_key, last_key = first_day.strftime('%Y-%m-%d'), last_day.strftime('%Y-%m-%d')
+        placeholders = ','.join('?' * len(doctor_ids))
+
+        persisted = {}
+        for row in conn.execute(
+            f'''SELECT * FROM slots
+                WHERE doctor_id IN ({placeholders}) AND slot_date BETWEEN ? AND ?
+                ORDER BY slot_date, start_time''',
+            (*doctor_ids, first_key, last_key)
+        ).fetchall():
+            persisted.setdefault((row['doctor_id'], row['slot_date']), []).append(dict(row))
+        held = AvailabilityService._held_by_day(conn, doctor_ids, first_key, last_key)
+
+        horizons = {doctor_id: AvailabilityService._horizon_days(doctor_id) for doctor_id in doctor_ids}
+        uncovered = [doctor_id for doctor_id, days in horizons.items()
+                     if first_key not in days or last_key not in days]
+        intervals = {}
+        if uncovered:
+            rules = {}
+            for row in conn.execute(
+                f'''SELECT doctor_id, weekday, start_time, end_time, slot_duration_minutes
+                    FROM doctor_availability_rules
+                    WHERE doctor_id IN ({','.join('?' * len(uncovered))}) AND active = 1
+                    ORDER BY doctor_id, weekday, start_time''',
+                uncovered
+            ).fetchall():
+                rules.setdefault(row['doctor_id'], []).append(dict(row))
+            intervals = {doctor_id: AvailabilityService.weekday_intervals(rules.get(doctor_id, []))
+                         for doctor_id in uncovered}
+
+        def _stream(doctor_id):
+            horizon_days = horizons[doctor_id]
+            current_day = first_day
+            while current_day <= last_day:
+                slot_date = current_day.strftime('%Y-%m-%d')
+                day_intervals = horizon_days.get(slot_date)
+                if day_intervals is None:
+                    day_intervals = intervals[doctor_id].get(current_day.weekday(), ())
+                rows = persisted.get((doctor_id, slot_date), [])
+                day_held = held.get((doctor_id, slot_date), ())
+                for slot in AvailabilityService._build_day(doctor_id, slot_date, day_intervals, rows, day_held):
+                    if slot['is_booked']:
+                        continue
+                    if not_before and (slot_date, slot['start_time']) <= not_before:
+                        continue
+                    yield (slot_date, slot['start_time'], doctor_id), slot
+                current_day += timedelta(days=1)
+
+        merged = heapq.merge(*(_stream(doctor_id) for doctor_id in doctor_ids), key=lambda item: item[0])
+        return [slot for _, slot in islice(merged, limit)]
+
+    @staticmethod
+    def find_slot(doctor_id, slot_date, start_time, conn=None):
+        """Return the open-or-booked slot starting at start_time on slot_date, if any."""
+        # Always read the rules here: bookings must not trust a horizon built before a rules change
+        for slot in AvailabilityService.compute_slots(doctor_id, slot_date, slot_date, conn=conn,
+                                                      use_horizon=False, include_held=True):
+            if slot['start_time'] == start_time:
+                return slot
+        return None
+
+    @staticmethod
+    def is_rule_slot(doctor_id, slot_date, start_time, end_time, conn=None):
+        intervals = AvailabilityService.weekday_intervals(
+            AvailabilityService.get_weekly_rules(doctor_id, conn)
+        )
+        weekday = AvailabilityService._as_date(slot_date).weekday()
+        return (start_time, end_time) in intervals.get(weekday, ())
+
+    @staticmethod
+    def resolve_slot(conn, doctor_id, slot_date, start_time):
+        """Materialize a rule-derived slot inside the caller's transaction and return its row.
+
+        Returns None if no open slot starts at that time.
+        """
+        slot = AvailabilityService.find_slot(doctor_id, slot_date, start_time, conn=conn)
+        if not slot or slot['is_booked']:
+            return None
+
+        if slot['id'] is None:
+            conn.execute(
+                '''INSERT OR IGNORE INTO slots (doctor_id, slot_date, start_time, end_time, is_booked)
+                   VALUES (?, ?, ?, ?, 0)''',
+                (doctor_id, slot_date, start_time, slot['end_time'])
+            )
+        return conn.execute(
+            'SELECT * FROM slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+            (doctor_id, slot_date, start_time)
+        ).fetchone()
+
+    @staticmethod
+    def block_slot(doctor_id, slot_date, start_time):
+        """Remove an open slot from availability by persisting it as blocked."""
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            slot = AvailabilityService.find_slot(doctor_id, slot_date, start_time, conn=conn)
+            if not slot:
+                conn.rollback()
+                return False, 'Slot not found'
+            if slot['is_booked']:
+                conn.rollback()
+                return False, 'Cannot block a booked slot'
+
+            if slot['id'] is None:
+                conn.execute(
+                    '''INSERT INTO slots (doctor_id, slot_date, start_time, end_time, is_booked, is_blocked)
+                       VALUES (?, ?, ?, ?, 0, 1)''',
+                    (doctor_id, slot_date, start_time, slot['end_time'])
+                )
+            else:
+                conn.execute('UPDATE slots SET is_blocked = 1 WHERE id = ?', (slot['id'],))
+            conn.commit()
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Block slot error: {e}")
+            return False, 'Failed to block slot'
+
+    @staticmethod
+    def compact_slots(conn, doctor_id=None):
+        """Delete persisted rows that carry no state (unbooked, unblocked, unreferenced)."""
+        query = '''DELETE FROM slots
+                   WHERE is_booked = 0 AND is_blocked = 0
+                     AND NOT EXISTS (SELECT 1 FROM appointments a WHERE a.slot_id = slots.id)'''
+        params = ()
+        if doctor_id is not None:
+            query += ' AND doctor_id = ?'
+            params = (doctor_id,)
+        return conn.execute(query, params).rowcount
+
+    @staticmethod
+    def prune_expired_slots(conn, before_date):
+        """Delete unbooked rows dated before before_date that no appointment references."""
+        return conn.execute(
+            '''DELETE FROM slots
+               WHERE slot_date < ? AND is_booked = 0
+                 AND NOT EXISTS (SELECT 1 FROM appointments a WHERE a.slot_id = slots.id)''',
+            (before_date,)
+        ).rowcount
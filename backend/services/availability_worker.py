@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from backend.utils.database import get_db, close_db
+from backend.services.availability_service import AvailabilityService
+from backend.services.slot_hold_service import SlotHoldService
+from backend.services.waitlist_service import WaitlistService
+
+logger = logging.getLogger(__name__)
+
+
+class AvailabilityWorker:
+    """Background thread that keeps a rolling availability horizon precomputed.
+
+    Every cycle it expands the weekly rules of each verified doctor whose
+    rules_version changed (or whose horizon no longer starts today) into
+    AvailabilityService's in-memory horizon, then prunes unbooked slot rows
+    whose date has passed. Request handlers only ever read the horizon.
+    """
+
+    _thread = None
+    _wake = threading.Event()
+    _lock = threading.Lock()
+    _stats = {
+        'runs': 0,
+        'failures': 0,
+        'doctors_total': 0,
+        'doctors_refreshed': 0,
+        'doctors_done': 0,
+        'slots_pruned': 0,
+        'last_run_at': None,
+        'last_run_ms': None,
+        'last_error': None,
+        'running': False,
+    }
+    _horizon_start = None
+    horizon_days = 60
+    interval_seconds = 300
+
+    @staticmethod
+    def _update(**values):
+        with AvailabilityWorker._lock:
+            AvailabilityWorker._stats.update(values)
+
+    @staticmethod
+    def stats():
+        with AvailabilityWorker._lock:
+            return {
+                **AvailabilityWorker._stats,
+                'horizon_days': AvailabilityWorker.horizon_days,
+                'interval_seconds': AvailabilityWorker.interval_seconds,
+                'doctors_cached': len(AvailabilityService.horizon_versions()),
+            }
+
+    @staticmethod
+    def run_once(horizon_days=None):
+        """Refresh stale horizons and prune expired slots; returns the number of doctors refreshed."""
+        horizon_days = horizon_days or AvailabilityWorker.horizon_days
+        started = time.perf_counter()
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_key = today.strftime('%Y-%m-%d')
+        AvailabilityWorker._update(running=True, doctors_done=0)
+
+        try:
+            conn = get_db()
+            versions = {
+                row['id']: row['rules_version']
+                for row in conn.execute(
+                    '''SELECT d.id, COALESCE(v.rules_version, 0) AS rules_version
+                       FROM doctors d
+                       LEFT JOIN doctor_schedule_versions v ON v.doctor_id = d.id
+                       WHERE d.verified = 1'''
+                ).fetchall()
+            }
+
+            # A new day shifts every horizon by one, so rebuild them all
+            if AvailabilityWorker._horizon_start != today_key:
+                AvailabilityService.invalidate_horizon()
+                AvailabilityWorker._horizon_start = today_key
+
+            cached = AvailabilityService.horizon_versions()
+            stale = [doctor_id for doctor_id, version in versions.items() if cached.get(doctor_id) != version]
+            AvailabilityWorker._update(doctors_total=len(versions))
+
+            rules_by_doctor = {}
+            if stale:
+                for row in conn.execute(
+                    '''SELECT r.doctor_id, r.weekday, r.start_time, r.end_time, r.slot_duration_minutes
+                       FROM doctor_availability_rules r
+                       JOIN doctors d ON d.id = r.doctor_id
+                       WHERE r.active = 1 AND d.verified = 1
+                       ORDER BY r.doctor_id, r.weekday, r.start_time'''
+                ).fetchall():
+                    rules_by_doctor.setdefault(row['doctor_id'], []).append(dict(row))
+
+            for done, doctor_id in enumerate(stale, start=1):
+                intervals = AvailabilityService.weekday_intervals(rules_by_doctor.get(doctor_id, []))
+                AvailabilityService.set_horizon(
+                    doctor_id, versions[doctor_id],
+                    AvailabilityService.expand_days(intervals, today, horizon_days)
+                )
+                AvailabilityWorker._update(doctors_done=done)
+            AvailabilityService.retain_horizon(versions)
+
+            conn.execute('BEGIN IMMEDIATE')
+            pruned = AvailabilityService.prune_expired_slots(conn, today_key)
+            # Holds orphaned by another process, or by one that exited before its sweeper fired
+            expired_holds = SlotHoldService.purge_expired(conn)
+            WaitlistService.expire_past(conn, today_key)
+            conn.commit()
+            # Lapsed waitlist offers are closed and their slots offered to the next patient
+            SlotHoldService.notify_expired(expired_holds)
+
+            with AvailabilityWorker._lock:
+                AvailabilityWorker._stats['runs'] += 1
+                AvailabilityWorker._stats['slots_pruned'] += pruned
+                AvailabilityWorker._stats.update(
+                    doctors_refreshed=len(stale),
+                    last_run_at=datetime.now().isoformat(timespec='seconds'),
+                    last_run_ms=round((time.perf_counter() - started) * 1000, 1),
+                    last_error=None,
+                )
+            logger.debug(f"Availability horizon: refreshed {len(stale)}/{len(versions)} doctors, pruned {pruned} slots")
+            return len(stale)
+        except Exception as e:
+            logger.error(f"Availability worker error: {e}")
+            with AvailabilityWorker._lock:
+                AvailabilityWorker._stats['failures'] += 1
+                AvailabilityWorker._stats['last_error'] = str(e)
+            return 0
+        finally:
+            AvailabilityWorker._update(running=False)
+            close_db()
+
+    @staticmethod
+    def wake():
+        """Ask the worker to run its next cycle now instead of waiting out the interval."""
+        AvailabilityWorker._wake.set()
+
+    @staticmethod
+    def start(horizon_days=60, interval_seconds=300):
+        """Start the daemon thread (idempotent); interval_seconds <= 0 disables it."""
+        AvailabilityWorker.horizon_days = horizon_days
+        AvailabilityWorker.interval_seconds = interval_seconds
+        if interval_seconds <= 0:
+            return None
+        if AvailabilityWorker._thread is not None and AvailabilityWorker._thread.is_alive():
+            return AvailabilityWorker._thread
+
+        def _run():
+            while True:
+                AvailabilityWorker.run_once()
+                AvailabilityWorker._wake.wait(interval_seconds)
+                AvailabilityWorker._wake.clear()
+
+        AvailabilityWorker._thread = threading.Thread(target=_run, name='availability-horizon', daemon=True)
+        AvailabilityWorker._thread.start()
+        return AvailabilityWorker._thread
@@ -1,10 +1,10 @@
-import os
 import json
-import time
+import re
 import uuid
 import logging
-import requests
 from backend.utils.database import query_db, execute_db
+from backend.services.doctor_service import DoctorService
+from backend.services.llm_client import get_llm_client
 from backend.services.local_ai_fallback import generate_fallback_response
 
 logger = logging.getLogger(__name__)
@@ -123,105 +123,28 @@ FOR NON-HEALTH QUESTIONS:
         return [dict(s) for s in sessions]
 
     @staticmethod
-    def call_openrouter(messages, max_retries=2, retry_delay=1):
+    def call_openrouter(messages, max_retries=None, retry_delay=None, hedge=None):
         """
-        Call OpenRouter API with retry logic and automatic model fallback.
-        
+        Call OpenRouter through the shared pooled client (see llm_client.LLMClient).
+
         Strategy:
         - Primary model: OPENROUTER_MODEL from .env (mistralai/mistral-7b-instruct)
         - Fallback model: OPENROUTER_FALLBACK_MODEL from .env (meta-llama/llama-3-8b-instruct)
         - On 429 (rate limit) or failure → retry with fallback model
+        - A model whose circuit breaker is open is skipped; with both open the
+          call fails at once and the local fallback answers
         - On 401/403 (auth error) → fail immediately
+        - Hedging (hedge, default LLM_HEDGE_ENABLED): if the primary is slower
+          than LLM_HEDGE_PERCENTILE of its recent calls, the fallback is asked
+          too and the first answer wins
         - max_tokens: 500 (reduced for efficiency)
         - temperature: 0.7 (balanced creativity)
         """
-        api_key = os.getenv('OPENROUTER_API_KEY', '')
-        primary_model = os.getenv('OPENROUTER_MODEL', 'mistralai/mistral-7b-instruct')
-        fallback_model = os.getenv('OPENROUTER_FALLBACK_MODEL', 'meta-llama/llama-3-8b-instruct')
-        base_url = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1')
-        
-        if not api_key or api_key == 'your_openrouter_api_key_here':
-            return None, 'OpenRouter API key not configured'
-
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json',
-            'HTTP-Referer': 'https://medsync-ai.com',
-            'X-Title': 'MedSync AI Healthcare Platform'
-        }
-
-        url = f"{base_url.rstrip('/')}/chat/completions"
-
-        # Models to try in order: primary first, then fallback
-        models_to_try = [primary_model]
-        if fallback_model and fallback_model != primary_model:
-            models_to_try.append(fallback_model)
-
-        last_error = None
-
-        for model in models_to_try:
-            payload = {
-                'model': model,
-                'messages': messages,
-                'temperature': 0.7,
-                'max_tokens': 500
-            }
-
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Calling OpenRouter with model={model}, attempt={attempt + 1}")
-                    response = requests.post(
-                        url,
-                        headers=headers,
-                        json=payload,
-                        timeout=30
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        content = data['choices'][0]['message']['content']
-                        if model != primary_model:
-                            logger.info(f"Success with fallback model: {model}")
-                        return content, None
-                    
-                    # Auth errors - do not retry, do not fallback
-                    if response.status_code in (401, 403):
-                        logger.error(f"OpenRouter Auth Error: {response.text}")
-                        return None, 'Invalid API Key or Permissions'
-
-                    # Rate limited (429) - skip to fallback model immediately
-                    if response.status_code == 429:
-                        logger.warning(f"Model {model} rate-limited (429), switching to fallback...")
-                        last_error = f'Rate limited on {model}'
-                        break  # break retry loop, try next model
-
-                    # Other errors - retry
-                    last_error = f'HTTP {response.status_code}: {response.text[:200]}'
-                    logger.warning(f"OpenRouter attempt {attempt + 1} with {model} failed: {last_error}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-
-                except requests.exceptions.Timeout:
-                    last_error = f'Timeout on {model}'
-                    logger.warning(f"OpenRouter timeout (attempt {attempt + 1}) with {model}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                except requests.exceptions.ConnectionError:
-                    last_error = 'Connection error'
-                    logger.warning(f"OpenRouter connection error (attempt {attempt + 1})")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                except Exception as e:
-                    last_error = str(e)
-                    logger.error(f"OpenRouter unexpected error: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-
-        return None, f'AI service unavailable ({last_error})'
+        return get_llm_client().complete(messages, max_retries=max_retries, retry_delay=retry_delay, hedge=hedge)
 
     @staticmethod
-    def process_message(user_id, session_id, user_message):
-        """Process a user message and get AI response."""
+    def build_context(user_id, session_id, user_message):
+        """Save the user message and build the messages sent to the model."""
         # Save user message
         ChatbotService.save_message(user_id, session_id, 'user', user_message)
 
@@ -237,22 +160,11 @@ FOR NON-HEALTH QUESTIONS:
                 messages.append({'role': 'user', 'content': msg['message']})
             elif role == 'assistant':
                 messages.append({'role': 'assistant', 'content': msg['message']})
+        return messages
 
-        # Try OpenRouter AI first
-        ai_response, error = ChatbotService.call_openrouter(messages)
-        
-        if error:
-            # OpenRouter failed — use local fallback symptom analyzer
-            logger.warning(f"OpenRouter unavailable ({error}), using local fallback")
-            fallback_response, parsed_data = generate_fallback_response(user_message)
-            
-            # Save and return the local response
-            ChatbotService.save_message(
-                user_id, session_id, 'assistant', fallback_response,
-                parsed_data
-            )
-            return fallback_response, parsed_data, None
-
+    @staticmethod
+    def finalize_reply(ai_response):
+        """Turn a complete model reply into (display text, parsed data)."""
         # Parse for structured JSON response
         parsed_data = ChatbotService.parse_ai_response(ai_response)
         
@@ -263,7 +175,6 @@ FOR NON-HEALTH QUESTIONS:
             clean_response = clean_response + MEDICAL_DISCLAIMER
         else:
             # Check for [[RECOMMEND: ...]] tag
-            import re
             match = re.search(r'\[\[RECOMMEND:\s*(.*?)\]\]', ai_response)
             if match:
                 specialization = match.group(1).strip()
@@ -271,6 +182,29 @@ FOR NON-HEALTH QUESTIONS:
                 parsed_data = {'recommended_specialization': specialization}
                 # Remove the tag from the displayed response
                 clean_response = re.sub(r'\[\[RECOMMEND:\s*.*?\]\]', '', ai_response).strip()
+        return clean_response, parsed_data
+
+    @staticmethod
+    def process_message(user_id, session_id, user_message):
+        """Process a user message and get AI response."""
+        messages = ChatbotService.build_context(user_id, session_id, user_message)
+
+        # Try OpenRouter AI first
+        ai_response, error = ChatbotService.call_openrouter(messages)
+        
+        if error:
+            # OpenRouter failed — use local fallback symptom analyzer
+            logger.warning(f"OpenRouter unavailable ({error}), using local fallback")
+            fallback_response, parsed_data = generate_fallback_response(user_message)
+            
+            # Save and return the local response
+            ChatbotService.save_message(
+                user_id, session_id, 'assistant', fallback_response,
+                parsed_data
+            )
+            return fallback_response, parsed_data, None
+
+        clean_response, parsed_data = ChatbotService.finalize_reply(ai_response)
 
         # Save AI response
         metadata = parsed_data if parsed_data else None
@@ -278,6 +212,84 @@ FOR NON-HEALTH QUESTIONS:
         
         return clean_response, parsed_data, None
 
+    @staticmethod
+    def recommend_doctors(spec):
+        """Doctors for a recommended specialization, falling back to a fuzzy search."""
+        doctors, _ = DoctorService.get_doctors_by_specialization(spec)
+        if not doctors:
+            doctors, _ = DoctorService.search_doctors(spec, 'specialization')
+        return doctors
+
+    @staticmethod
+    def build_result(session_id, response, parsed_data, ai_error):
+        """Response body for a chatbot reply (/message, and the done event of a stream)."""
+        result = {
+            'response': response,
+            'session_id': session_id
+        }
+
+        if parsed_data:
+            # Only include full analysis card if structured data (diseases/advice) is present
+            if 'possible_diseases' in parsed_data:
+                result['analysis'] = parsed_data
+
+            # Auto-recommend doctors based on specialization (works for both JSON and tag)
+            spec = parsed_data.get('recommended_specialization', '')
+            if spec:
+                result['recommended_doctors'] = ChatbotService.recommend_doctors(spec)
+
+        if ai_error:
+            result['ai_error'] = ai_error
+
+        return result
+
+    @staticmethod
+    def stream_message(user_id, session_id, user_message):
+        """
+        Process a user message with a streamed AI response.
+
+        Generator of (event, data) pairs:
+        - ('token', {'text'}): display text, in order, as the model writes it
+        - ('analysis', {...}): a JSON analysis block, as soon as it is complete
+        - ('recommendation', {'specialization'}): a [[RECOMMEND: ...]] tag, as soon as it is complete
+        - ('done', {'response', 'parsed_data', 'ai_error'}): the final display text, as saved
+        - ('error', {'message'}): the stream broke off; the partial reply is still saved
+
+        The assistant message is saved once, when the stream ends (or the
+        client goes away), with the same post-processing as process_message.
+        """
+        messages = ChatbotService.build_context(user_id, session_id, user_message)
+
+        deltas, error = get_llm_client().open_stream(messages)
+        if error:
+            # OpenRouter failed — use local fallback symptom analyzer
+            logger.warning(f"OpenRouter unavailable ({error}), using local fallback")
+            fallback_response, parsed_data = generate_fallback_response(user_message)
+            ChatbotService.save_message(user_id, session_id, 'assistant', fallback_response, parsed_data)
+            yield 'token', {'text': fallback_response}
+            yield 'done', {'response': fallback_response, 'parsed_data': parsed_data, 'ai_error': None}
+            return
+
+        parser = ReplyStreamParser()
+        saved = False
+        try:
+            for delta in deltas:
+                yield from parser.feed(delta)
+            yield from parser.finish()
+            clean_response, parsed_data = ChatbotService.finalize_reply(parser.text)
+            ChatbotService.save_message(user_id, session_id, 'assistant', clean_response, parsed_data or None)
+            saved = True
+            yield 'done', {'response': clean_response, 'parsed_data': parsed_data, 'ai_error': None}
+        except Exception as e:
+            logger.warning(f"OpenRouter stream interrupted: {e}")
+            yield 'error', {'message': 'AI response was interrupted'}
+        finally:
+            deltas.close()
+            # Interrupted or abandoned: keep whatever the model had written so far
+            if not saved and parser.text.strip():
+                clean_response, parsed_data = ChatbotService.finalize_reply(parser.text)
+                ChatbotService.save_message(user_id, session_id, 'assistant', clean_response, parsed_data or None)
+
     @staticmethod
     def parse_ai_response(response):
         """Parse AI response for structured JSON data."""
@@ -311,7 +323,6 @@ FOR NON-HEALTH QUESTIONS:
     @staticmethod
     def strip_json_block(text):
         """Remove JSON code blocks and raw JSON from response text."""
-        import re
         # 1. Remove fenced ```json ... ``` blocks (greedy across newlines)
         cleaned = re.sub(r'```(?:json)?\s*\n?[\s\S]*?```', '', text)
         # 2. Remove any remaining raw JSON objects ({ ... } spanning multiple lines)
@@ -320,3 +331,116 @@ FOR NON-HEALTH QUESTIONS:
         # 3. Clean up extra blank lines left behind
         cleaned = re.sub(r'\n{3,}', '\n\n', cleaned).strip()
         return cleaned
+
+
+class ReplyStreamParser:
+    """
+    Incremental parser for a streamed AI reply.
+
+    feed() takes text deltas as they arrive and returns the events they
+    complete: ('token', {'text'}) for display text, ('analysis', {...}) for a
+    JSON analysis block and ('recommendation', {'specialization'}) for a
+    [[RECOMMEND: ...]] tag. Text that may still turn into a tag or a JSON
+    block is held back until it is decided, so neither reaches the display
+    raw. finish() flushes whatever is left once the stream ends; .text is the
+    full reply as the model wrote it.
+    """
+
+    TAG = '[[RECOMMEND:'
+    FENCE = '```'
+
+    def __init__(self):
+        self._parts = []
+        self._pending = ''
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+    def feed(self, delta):
+        self._parts.append(delta)
+        self._pending += delta
+        return list(self._drain(final=False))
+
+    def finish(self):
+        return list(self._drain(final=True))
+
+    def _drain(self, final):
+        while self._pending:
+            pending = self._pending
+            starts = [i for i in (pending.find(self.FENCE), pending.find('{'), pending.find('[[')) if i >= 0]
+            if not starts:
+                # Hold back a trailing '`', '``' or '[' that the next delta could complete
+                keep = 0 if final else len(pending) - len(pending.rstrip('`['))
+                keep = min(keep, 2)
+                if len(pending) > keep:
+                    yield 'token', {'text': pending[:len(pending) - keep]}
+                self._pending = pending[len(pending) - keep:]
+                return
+
+            start = min(starts)
+            if start:
+                yield 'token', {'text': pending[:start]}
+                pending = self._pending = pending[start:]
+
+            end, event = self._match(pending)
+            if end is None:
+                if final:
+                    # Never closed: show it as written
+                    yield 'token', {'text': pending}
+                    self._pending = ''
+                return
+            if event is None:
+                # Not a tag or an analysis block after all: it is ordinary text
+                yield 'token', {'text': pending[:end]}
+            else:
+                yield event
+            self._pending = pending[end:]
+
+    def _match(self, pending):
+        """(end, event) for the construct at the start of pending; end is None while undecided."""
+        if pending.startswith('[['):
+            if not pending.startswith(self.TAG):
+                if self.TAG.startswith(pending):
+                    return None, None
+                return 2, None
+            close = pending.find(']]', len(self.TAG))
+            if close < 0:
+                return None, None
+            specialization = pending[len(self.TAG):close].strip()
+            return close + 2, ('recommendation', {'specialization': specialization})
+
+        if pending.startswith(self.FENCE):
+            close = pending.find(self.FENCE, len(self.FENCE))
+            if close < 0:
+                return None, None
+            end = close + len(self.FENCE)
+        else:
+            end = self._object_end(pending)
+            if end is None:
+                return None, None
+
+        data = ChatbotService.parse_ai_response(pending[:end])
+        return end, ('analysis', data) if data else None
+
+    @staticmethod
+    def _object_end(text):
+        """Index just past the '{...}' object that text starts with, or None if it is still open."""
+        depth, in_string, escaped = 0, False, False
+        for i, ch in enumerate(text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+        return None
@@ -1,86 +1,103 @@
 import logging
+import re
 from backend.utils.database import query_db, execute_db
+from backend.utils.cache import cached, invalidate_cache
+from backend.utils.pagination import DEFAULT_PAGE_SIZE, keyset, order_by, paginate
+from backend.services.suggest_service import SuggestService
 
 logger = logging.getLogger(__name__)
 
 
 class DoctorService:
-    """Service layer for doctor operations."""
+    """Service layer for doctor operations.
+
+    Listing and lookup results are cached under CACHE_NAMESPACE and the
+    typeahead index is built from the same rows; every write to the doctors
+    table must call doctors_changed().
+    """
+
+    CACHE_NAMESPACE = 'doctors'
+    # search_type -> doctor_search column (None searches every column)
+    SEARCH_COLUMNS = {'name': 'full_name', 'specialization': 'specialization', 'disease': 'diseases', 'all': None}
 
     @staticmethod
-    def get_all_doctors(verified_only=True):
-        """Get all doctors, optionally filtered by verification status."""
-        if verified_only:
-            doctors = query_db(
-                '''SELECT id, doctor_id, full_name, email, phone, specialization,
-                   experience_years, hospital, bio, verified, rating
-                   FROM doctors WHERE verified = 1 ORDER BY rating DESC'''
-            )
-        else:
-            doctors = query_db(
-                '''SELECT id, doctor_id, full_name, email, phone, specialization,
-                   experience_years, hospital, bio, verified, rating
-                   FROM doctors ORDER BY rating DESC'''
-            )
-        return [dict(d) for d in doctors]
+    def doctors_changed():
+        """Drop cached doctor listings and rebuild the typeahead index."""
+        invalidate_cache(DoctorService.CACHE_NAMESPACE)
+        SuggestService.refresh()
 
     @staticmethod
-    def search_doctors(query_str, search_type='all'):
-        """Search doctors by name, specialization, or disease."""
-        query_str_like = f"%{query_str}%"
-        
-        if search_type == 'specialization':
-            doctors = query_db(
-                '''SELECT id, doctor_id, full_name, email, phone, specialization,
-                   experience_years, hospital, bio, verified, rating
-                   FROM doctors WHERE specialization LIKE ? AND verified = 1
-                   ORDER BY rating DESC''',
-                (query_str_like,)
-            )
-        elif search_type == 'disease':
-            doctors = query_db(
-                '''SELECT DISTINCT d.id, d.doctor_id, d.full_name, d.email, d.phone,
-                   d.specialization, d.experience_years, d.hospital, d.bio, d.verified, d.rating
-                   FROM doctors d
-                   JOIN disease_specialization_mapping dsm ON d.specialization = dsm.specialization
-                   WHERE dsm.disease LIKE ? AND d.verified = 1
-                   ORDER BY d.rating DESC''',
-                (query_str_like,)
-            )
-        elif search_type == 'name':
-            doctors = query_db(
-                '''SELECT id, doctor_id, full_name, email, phone, specialization,
-                   experience_years, hospital, bio, verified, rating
-                   FROM doctors WHERE full_name LIKE ? AND verified = 1
-                   ORDER BY rating DESC''',
-                (query_str_like,)
-            )
-        else:
-            # search_type == 'all': search across name, specialization, and diseases
-            doctors = query_db(
-                '''SELECT DISTINCT d.id, d.doctor_id, d.full_name, d.email, d.phone,
-                   d.specialization, d.experience_years, d.hospital, d.bio, d.verified, d.rating
-                   FROM doctors d
-                   LEFT JOIN disease_specialization_mapping dsm ON d.specialization = dsm.specialization
-                   WHERE (d.full_name LIKE ? OR d.specialization LIKE ? OR dsm.disease LIKE ?)
-                   AND d.verified = 1
-                   ORDER BY d.rating DESC''',
-                (query_str_like, query_str_like, query_str_like)
-            )
-        
-        return [dict(d) for d in doctors]
+    @cached('doctors')
+    def get_all_doctors(verified_only=True, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """One page of doctors, best rated first: (doctors, next_cursor)."""
+        sort = ['rating', 'id']
+        after, params = keyset(sort, cursor)
+        doctors = query_db(
+            f'''SELECT id, doctor_id, full_name, email, phone, specialization,
+                experience_years, hospital, bio, verified, rating
+                FROM doctors WHERE {'verified = 1 AND ' if verified_only else ''}{after}
+                {order_by(sort)} LIMIT ?''',
+            (*params, limit + 1)
+        )
+        return paginate(doctors, limit, lambda d: (d['rating'], d['id']))
+
+    @staticmethod
+    def _match_expression(query_str, search_type):
+        """FTS5 MATCH expression: every word as a prefix term, optionally limited to one column."""
+        terms = re.findall(r'\w+', query_str.lower())
+        if not terms:
+            return None
+        expression = ' AND '.join(f'"{term}"*' for term in terms)
+        column = DoctorService.SEARCH_COLUMNS.get(search_type)
+        return f'{{{column}}} : ({expression})' if column else expression
 
     @staticmethod
-    def get_doctors_by_specialization(specialization):
-        """Get verified doctors by specialization."""
+    @cached('doctors')
+    def search_doctors(query_str, search_type='all', limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """One page of doctors matching a name, specialization, or disease: (doctors, next_cursor).
+
+        Uses the doctor_search FTS5 index: each word of the query matches as a
+        prefix, results are ranked by BM25 (name > specialization > diseases >
+        hospital/bio) and then by rating. The cursor carries the last row's
+        score, so later pages are a keyset over the ranked matches.
+        """
+        match = DoctorService._match_expression(query_str, search_type)
+        if not match:
+            return [], None
+
+        sort = ['score', 'rating', 'id']
+        after, params = keyset(sort, cursor)
         doctors = query_db(
-            '''SELECT id, doctor_id, full_name, email, phone, specialization,
+            f'''SELECT * FROM (
+                   SELECT d.id, d.doctor_id, d.full_name, d.email, d.phone, d.specialization,
+                   d.experience_years, d.hospital, d.bio, d.verified, d.rating,
+                   -bm25(doctor_search, 10.0, 5.0, 1.0, 1.0, 3.0) AS score
+                   FROM doctor_search
+                   JOIN doctors d ON d.id = doctor_search.rowid
+                   WHERE doctor_search MATCH ? AND d.verified = 1
+               ) WHERE {after}
+               {order_by(sort)} LIMIT ?''',
+            (match, *params, limit + 1)
+        )
+        doctors, next_cursor = paginate(doctors, limit, lambda d: (d['score'], d['rating'], d['id']))
+        for doctor in doctors:
+            del doctor['score']
+        return doctors, next_cursor
+
+    @staticmethod
+    @cached('doctors')
+    def get_doctors_by_specialization(specialization, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """One page of verified doctors in a specialization, best rated first: (doctors, next_cursor)."""
+        sort = ['rating', 'id']
+        after, params = keyset(sort, cursor)
+        doctors = query_db(
+            f'''SELECT id, doctor_id, full_name, email, phone, specialization,
                experience_years, hospital, bio, verified, rating
-               FROM doctors WHERE specialization = ? AND verified = 1
-               ORDER BY rating DESC''',
-            (specialization,)
+               FROM doctors WHERE specialization = ? AND verified = 1 AND {after}
+               {order_by(sort)} LIMIT ?''',
+            (specialization, *params, limit + 1)
         )
-        return [dict(d) for d in doctors]
+        return paginate(doctors, limit, lambda d: (d['rating'], d['id']))
 
     @staticmethod
     def get_doctor_profile(doctor_id):
@@ -112,9 +129,11 @@ class DoctorService:
         values.append(doctor_id)
         query = f"UPDATE doctors SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
         execute_db(query, tuple(values))
+        DoctorService.doctors_changed()
         return True
 
     @staticmethod
+    @cached('doctors')
     def get_specializations():
         """Get all unique specializations."""
         specs = query_db('SELECT DISTINCT specialization FROM doctors WHERE verified = 1 ORDER BY specialization')
@@ -0,0 +1,492 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from backend.utils.circuit_breaker import CircuitBreaker, OPEN, percentile
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_KEY = 'your_openrouter_api_key_here'
+STREAM_DONE = object()
+
+
+class StreamError(Exception):
+    """The API reported an error in the middle of a streamed reply."""
+
+
+def client_settings(config, pool_size_key='LLM_POOL_SIZE', default_pool_size=10):
+    """Constructor arguments for an OpenRouter client from app config (or os.environ)."""
+    return {
+        'api_key': config.get('OPENROUTER_API_KEY', ''),
+        'base_url': config.get('OPENROUTER_BASE_URL', 'https://openrouter.ai/api/v1'),
+        'primary_model': config.get('OPENROUTER_MODEL', 'mistralai/mistral-7b-instruct'),
+        'fallback_model': config.get('OPENROUTER_FALLBACK_MODEL', 'meta-llama/llama-3-8b-instruct'),
+        'pool_size': int(config.get(pool_size_key, default_pool_size)),
+        'connect_timeout': float(config.get('LLM_CONNECT_TIMEOUT', 5)),
+        'read_timeout': float(config.get('LLM_READ_TIMEOUT', 30)),
+        'max_retries': int(config.get('LLM_MAX_RETRIES', 2)),
+        'retry_delay': float(config.get('LLM_RETRY_DELAY', 1)),
+        'breaker_settings': {
+            'window_seconds': int(config.get('LLM_BREAKER_WINDOW_SECONDS', 60)),
+            'min_calls': int(config.get('LLM_BREAKER_MIN_CALLS', 5)),
+            'failure_rate': float(config.get('LLM_BREAKER_FAILURE_RATE', 0.5)),
+            'slow_call_ms': int(config.get('LLM_BREAKER_SLOW_CALL_MS', 15000)),
+            'slow_call_rate': float(config.get('LLM_BREAKER_SLOW_CALL_RATE', 0.8)),
+            'open_seconds': int(config.get('LLM_BREAKER_OPEN_SECONDS', 30)),
+            'max_open_seconds': int(config.get('LLM_BREAKER_MAX_OPEN_SECONDS', 300)),
+        },
+        'hedge': str(config.get('LLM_HEDGE_ENABLED', '')).lower() in ('true', '1', 'yes'),
+        'hedge_settings': {
+            'percentile': float(config.get('LLM_HEDGE_PERCENTILE', 0.9)),
+            'min_samples': int(config.get('LLM_HEDGE_MIN_SAMPLES', 20)),
+            'initial_delay_ms': int(config.get('LLM_HEDGE_INITIAL_DELAY_MS', 3000)),
+        },
+    }
+
+
+def model_breakers(models, breaker_settings=None):
+    """One circuit breaker per model, keyed by model name."""
+    return {model: CircuitBreaker(model, **(breaker_settings or {})) for model in models}
+
+
+def build_payload(model, messages, max_tokens, temperature, stream=False):
+    payload = {
+        'model': model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }
+    if stream:
+        payload['stream'] = True
+    return payload
+
+
+class RequestMetrics:
+    """Recent request latencies per model, split by whether a hedge fired, and the hedge delay.
+
+    A call's latency runs from its start to the winning 200 (the headers,
+    for a stream). The hedge delay is the given percentile of the primary
+    model's own recent successful attempts of the same kind: streamed
+    attempts (time to headers) and blocking ones (time to the whole reply)
+    are kept apart. Until min_samples of a kind have been seen, its delay
+    is initial_delay_ms.
+    """
+
+    def __init__(self, models, percentile=0.9, min_samples=20, initial_delay_ms=3000, window=1000):
+        self.primary_model = models[0]
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay_ms = initial_delay_ms
+        self._primary = {False: deque(maxlen=window), True: deque(maxlen=window)}  # keyed by stream
+        self._calls = {(model, hedged): deque(maxlen=window) for model in models for hedged in (False, True)}
+        self._counts = dict.fromkeys(self._calls, 0)
+        self._lock = threading.Lock()
+
+    def record_attempt(self, model, stream, latency_ms):
+        """A successful attempt on one model; the primary's set the hedge delay for their kind."""
+        if model == self.primary_model:
+            with self._lock:
+                self._primary[bool(stream)].append(latency_ms)
+
+    def record_call(self, model, hedged, latency_ms):
+        """A call answered by model; hedged if the fallback was racing the primary."""
+        with self._lock:
+            self._calls[(model, hedged)].append(latency_ms)
+            self._counts[(model, hedged)] += 1
+
+    def hedge_delay_ms(self, stream=False):
+        with self._lock:
+            samples = self._primary[bool(stream)]
+            if len(samples) < self.min_samples:
+                return self.initial_delay_ms
+            return percentile(sorted(samples), self.percentile)
+
+    def stats(self):
+        delay_ms = {'complete': self.hedge_delay_ms(False), 'stream': self.hedge_delay_ms(True)}
+        latency = {}
+        with self._lock:
+            for (model, hedged), samples in self._calls.items():
+                latencies = sorted(samples)
+                latency.setdefault(model, {})['hedged' if hedged else 'direct'] = {
+                    'calls': self._counts[(model, hedged)],
+                    'p50_ms': percentile(latencies, 0.5),
+                    'p99_ms': percentile(latencies, 0.99),
+                }
+        return {'hedge_delay_ms': delay_ms, 'hedge_percentile': self.percentile, 'latency': latency}
+
+
+def request_headers(api_key):
+    return {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'HTTP-Referer': 'https://medsync-ai.com',
+        'X-Title': 'MedSync AI Healthcare Platform'
+    }
+
+
+def parse_stream_line(line):
+    """One line of an OpenAI-style SSE body: its text delta, STREAM_DONE after the last one, or None.
+
+    Raises StreamError if the API reports an error mid-stream.
+    """
+    # Blank lines separate events; lines starting with ':' are keep-alive comments
+    if not line or not line.startswith('data:'):
+        return None
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return STREAM_DONE
+    chunk = json.loads(data)
+    if 'error' in chunk:
+        raise StreamError(chunk['error'].get('message', 'Stream error'))
+    choices = chunk.get('choices') or [{}]
+    return (choices[0].get('delta') or {}).get('content')
+
+
+class LLMClient:
+    """OpenRouter chat-completions client shared by every request in the process.
+
+    One requests.Session holds a keep-alive connection pool (pool_size
+    connections to the API host), so chat turns, retries and fallback-model
+    attempts reuse an open TCP/TLS connection instead of handshaking each
+    time. Headers, URL and the model order are built once from the settings.
+    Each model has a circuit breaker: a model that keeps failing is skipped
+    without a request until a half-open probe gets through. With hedge on,
+    a slow primary is raced against the fallback model (see _send_hedged).
+    """
+
+    def __init__(self, api_key, base_url, primary_model, fallback_model=None, pool_size=10,
+                 connect_timeout=5.0, read_timeout=30.0, max_retries=2, retry_delay=1.0, breaker_settings=None,
+                 hedge=False, hedge_settings=None):
+        self.api_key = api_key or ''
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.primary_model = primary_model
+        self.models = [primary_model]
+        if fallback_model and fallback_model != primary_model:
+            self.models.append(fallback_model)
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.breakers = model_breakers(self.models, breaker_settings)
+        self.hedge = hedge
+        self.metrics = RequestMetrics(self.models, **(hedge_settings or {}))
+        # Hedged calls run each model's attempts on these threads while the caller waits
+        self._executor = ThreadPoolExecutor(max_workers=pool_size * 2, thread_name_prefix='llm-hedge')
+
+        self.session = requests.Session()
+        # Retries are ours (with model fallback), so the adapter never retries on its own
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(request_headers(self.api_key))
+
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'attempts': 0, 'successes': 0, 'fallback_successes': 0, 'failures': 0,
+                       'short_circuits': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**client_settings(config))
+
+    @property
+    def configured(self):
+        return bool(self.api_key) and self.api_key != PLACEHOLDER_KEY
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _send(self, messages, max_retries, retry_delay, max_tokens, temperature, stream=False, hedge=None):
+        """POST with retries and model fallback until a 200 arrives: (response, model, error).
+
+        - Models are tried in order: OPENROUTER_MODEL, then OPENROUTER_FALLBACK_MODEL
+        - A model whose circuit breaker is open is skipped without a request
+        - On 429 (rate limit) → move straight to the next model
+        - On 401/403 (auth error) → fail immediately
+        - Other errors, timeouts and connection errors → retry after retry_delay
+        - hedge (default: the client's setting) races a slow primary against the fallback
+        Every attempt's outcome and latency goes to the model's breaker.
+        """
+        if not self.configured:
+            return None, None, 'OpenRouter API key not configured'
+        max_retries = self.max_retries if max_retries is None else max_retries
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+        hedge = self.hedge if hedge is None else hedge
+        self._count('calls')
+
+        started = time.monotonic()
+        args = (messages, max_retries, retry_delay, max_tokens, temperature, stream)
+        if hedge and len(self.models) > 1:
+            response, model, err, hedged = self._send_hedged(*args)
+        else:
+            (response, model, err), hedged = self._send_in_order(*args), False
+
+        if response is None:
+            self._count('failures')
+            return None, model, err
+        self.metrics.record_call(model, hedged, (time.monotonic() - started) * 1000)
+        if model != self.primary_model:
+            logger.info(f"Success with fallback model: {model}")
+            self._count('fallback_successes')
+            if hedged:
+                self._count('hedge_wins')
+        self._count('successes')
+        return response, model, None
+
+    def _send_in_order(self, messages, max_retries, retry_delay, max_tokens, temperature, stream):
+        """Each model in turn on the calling thread: (response, model, error)."""
+        last_error = None
+        attempted = False
+        for model in self.models:
+            response, error, final, tried = self._try_model(model, messages, max_retries, retry_delay,
+                                                            max_tokens, temperature, stream)
+            attempted = attempted or tried
+            if response is not None:
+                return response, model, None
+            if final:
+                return None, model, error
+            last_error = error
+
+        if not attempted:
+            # Every model's breaker is open: fail now so the caller can use the local fallback
+            self._count('short_circuits')
+        return None, None, f'AI service unavailable ({last_error})'
+
+    def _send_hedged(self, messages, max_retries, retry_delay, max_tokens, temperature, stream):
+        """The primary, raced by the fallback once it is slow: (response, model, error, hedged).
+
+        The fallback starts when the primary has not answered within the
+        hedge delay (hedged), or straight away if the primary fails first
+        (as in _send_in_order). A fallback whose breaker is open is not
+        started while the primary is still running. The hedge delay counts
+        from when the primary's attempts start on a worker thread, not from
+        when they were queued: a primary that waited for a free thread has
+        not been slow. The first 200 wins; the other model makes no further
+        attempts, and a request of its already on the wire is closed when it
+        returns, since requests cannot abort it from another thread.
+        """
+        primary, fallback = self.models[0], self.models[1]
+        args = (messages, max_retries, retry_delay, max_tokens, temperature, stream)
+        abandoned = threading.Event()
+        primary_running = threading.Event()
+        legs = {self._executor.submit(self._try_model, primary, *args, abandoned, primary_running): primary}
+        pending = set(legs)
+        primary_running.wait()
+        hedge_at = time.monotonic() + self.metrics.hedge_delay_ms(stream) / 1000
+        hedged = False
+        last_error = None
+        attempted = False
+        try:
+            while pending:
+                racing = len(legs) > 1 or hedge_at is None
+                timeout = None if racing else max(0.0, hedge_at - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                winner = None
+                for future in done:
+                    response, error, final, tried = future.result()
+                    attempted = attempted or tried
+                    if response is None:
+                        if final:
+                            return None, legs[future], error, hedged
+                        last_error = error
+                    elif winner is None:
+                        winner = response, legs[future]
+                    else:
+                        response.close()
+                if winner:
+                    return winner[0], winner[1], None, hedged
+
+                if len(legs) == 1:
+                    if pending and self.breakers[fallback].state == OPEN:
+                        # Nothing to race with: keep waiting on the primary
+                        hedge_at = None
+                        continue
+                    hedged = bool(pending)
+                    if hedged:
+                        logger.info(f"No answer from {primary} in time, hedging with {fallback}")
+                        self._count('hedges')
+                    future = self._executor.submit(self._try_model, fallback, *args, abandoned)
+                    legs[future] = fallback
+                    pending.add(future)
+        finally:
+            abandoned.set()
+            for future in pending:
+                future.add_done_callback(_close_leg)
+
+        if not attempted:
+            self._count('short_circuits')
+        return None, None, f'AI service unavailable ({last_error})', hedged
+
+    def _try_model(self, model, messages, max_retries, retry_delay, max_tokens, temperature, stream,
+                   abandoned=None, running=None):
+        """Attempts on one model until a 200: (response, error, final, attempted).
+
+        final means no other model should be tried (auth error); attempted
+        is False if the breaker refused every attempt. Once abandoned (an
+        Event) is set, no further attempt starts; running (an Event) is set
+        as soon as this starts.
+        """
+        if running is not None:
+            running.set()
+        breaker = self.breakers[model]
+        payload = build_payload(model, messages, max_tokens, temperature, stream)
+        last_error = None
+        attempted = False
+        for attempt in range(max_retries):
+            if abandoned is not None and abandoned.is_set():
+                break
+            if not breaker.allow():
+                logger.warning(f"Circuit open for {model}, skipping")
+                last_error = f'Circuit open for {model}'
+                break
+            attempted = True
+            self._count('attempts')
+            started = time.monotonic()
+            ok = False
+            try:
+                logger.info(f"Calling OpenRouter with model={model}, attempt={attempt + 1}")
+                response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+
+                if response.status_code == 200:
+                    ok = True
+                    self.metrics.record_attempt(model, stream, (time.monotonic() - started) * 1000)
+                    return response, None, False, True
+
+                # Auth errors - do not retry, do not fallback
+                if response.status_code in (401, 403):
+                    logger.error(f"OpenRouter Auth Error: {response.text}")
+                    return None, 'Invalid API Key or Permissions', True, True
+
+                # Rate limited (429) - skip to fallback model immediately
+                if response.status_code == 429:
+                    logger.warning(f"Model {model} rate-limited (429), switching to fallback...")
+                    last_error = f'Rate limited on {model}'
+                    response.close()
+                    break
+
+                last_error = f'HTTP {response.status_code}: {response.text[:200]}'
+                logger.warning(f"OpenRouter attempt {attempt + 1} with {model} failed: {last_error}")
+            except requests.exceptions.Timeout:
+                last_error = f'Timeout on {model}'
+                logger.warning(f"OpenRouter timeout (attempt {attempt + 1}) with {model}")
+            except requests.exceptions.ConnectionError:
+                last_error = 'Connection error'
+                logger.warning(f"OpenRouter connection error (attempt {attempt + 1})")
+            except Exception as e:
+                last_error = str(e)
+                logger.error(f"OpenRouter unexpected error: {e}")
+            finally:
+                breaker.record(ok, (time.monotonic() - started) * 1000)
+
+            # No point waiting to retry a model whose breaker just opened
+            if attempt < max_retries - 1 and breaker.state != OPEN:
+                if abandoned is not None:
+                    abandoned.wait(retry_delay)
+                else:
+                    time.sleep(retry_delay)
+        return None, last_error, False, attempted
+
+    def complete(self, messages, max_retries=None, retry_delay=None, max_tokens=500, temperature=0.7, hedge=None):
+        """Chat completion with retries and model fallback: (content, error)."""
+        response, _, err = self._send(messages, max_retries, retry_delay, max_tokens, temperature, hedge=hedge)
+        if err:
+            return None, err
+        try:
+            return response.json()['choices'][0]['message']['content'], None
+        except (ValueError, KeyError, IndexError) as e:
+            logger.error(f"OpenRouter malformed response: {e}")
+            return None, 'AI service returned a malformed response'
+
+    def open_stream(self, messages, max_retries=None, retry_delay=None, max_tokens=500, temperature=0.7,
+                    hedge=None):
+        """Start a streamed completion: (iterator of text deltas, error).
+
+        Retries and fallback apply until the API accepts the request; once
+        tokens are flowing, a broken stream raises from the iterator. A
+        hedge races the two models to the first response headers. The
+        connection goes back to the pool when the iterator is exhausted or
+        closed.
+        """
+        response, _, err = self._send(messages, max_retries, retry_delay, max_tokens, temperature, stream=True,
+                                      hedge=hedge)
+        if err:
+            return None, err
+        return self._deltas(response), None
+
+    @staticmethod
+    def _deltas(response):
+        """Text deltas from an OpenAI-style SSE body (data: {...} lines, ending with data: [DONE])."""
+        # text/event-stream carries no charset; without this requests would decode as Latin-1
+        response.encoding = 'utf-8'
+        try:
+            # chunk_size=None hands over each chunk as it arrives instead of waiting to fill a buffer
+            lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+            for line in lines:
+                text = parse_stream_line(line)
+                if text is STREAM_DONE:
+                    # Read to the end of the body: a fully read response goes back to
+                    # the pool on close, a half-read one takes its connection with it
+                    for _ in lines:
+                        pass
+                    break
+                if text:
+                    yield text
+        finally:
+            response.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'configured': self.configured,
+                'models': list(self.models),
+                'pool_size': self.pool_size,
+                'timeout': list(self.timeout),
+                'breakers': {model: breaker.stats() for model, breaker in self.breakers.items()},
+                'hedge': self.hedge,
+                **self.metrics.stats(),
+            }
+
+
+def _close_leg(future):
+    """Done-callback for a hedged attempt that lost: close its response, if it got one."""
+    response = None if future.cancelled() or future.exception() else future.result()[0]
+    if response is not None:
+        response.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def configure_llm_client(config):
+    """Build the process-wide client from app config, replacing any previous one."""
+    global _client
+    client = LLMClient.from_config(config)
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None:
+        previous.close()
+    return client
+
+
+def get_llm_client():
+    """The process-wide client; built from the environment if the app never configured one."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient.from_config(os.environ)
+        return _client
+
+
+def get_llm_stats():
+    return get_llm_client().stats()
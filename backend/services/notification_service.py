@@ -1,6 +1,7 @@
 import logging
 from datetime import datetime, timedelta
-from backend.utils.database import query_db, execute_db
+from backend.utils.database import query_db, execute_db, get_db
+from backend.utils.pagination import DEFAULT_PAGE_SIZE, keyset, order_by, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -27,28 +28,55 @@ class NotificationService:
             return None
 
     @staticmethod
-    def get_patient_notifications(user_id, unread_only=False):
-        """Get notifications for a patient."""
-        query = '''SELECT * FROM notifications WHERE user_id = ? AND recipient_type = "patient"'''
-        params = [user_id]
+    def create_notifications(notifications, conn=None):
+        """Insert many notifications with one executemany.
+
+        Each item takes the create_notification keyword arguments. With `conn`
+        the rows join the caller's transaction and are committed with it.
+        """
+        rows = [
+            (n.get('user_id'), n.get('doctor_id'), n['recipient_type'], n['title'], n['message'],
+             n.get('notification_type', 'info'), n.get('appointment_id'))
+            for n in notifications
+        ]
+        if not rows:
+            return 0
+        own_conn = conn is None
+        conn = conn or get_db()
+        conn.executemany(
+            '''INSERT INTO notifications
+               (user_id, doctor_id, recipient_type, title, message,
+                notification_type, is_read, related_appointment_id)
+               VALUES (?, ?, ?, ?, ?, ?, 0, ?)''',
+            rows
+        )
+        if own_conn:
+            conn.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_patient_notifications(user_id, unread_only=False, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get notifications for a patient, newest first: (notifications, next_cursor)."""
+        sort = ['created_at', 'id']
+        after, params = keyset(sort, cursor)
+        query = f'''SELECT * FROM notifications
+                    WHERE user_id = ? AND recipient_type = "patient" AND {after}'''
         if unread_only:
             query += ' AND is_read = 0'
-        query += ' ORDER BY created_at DESC LIMIT 50'
-        
-        notifs = query_db(query, tuple(params))
-        return [dict(n) for n in notifs]
+        notifs = query_db(f'{query} {order_by(sort)} LIMIT ?', (user_id, *params, limit + 1))
+        return paginate(notifs, limit, lambda n: (n['created_at'], n['id']))
 
     @staticmethod
-    def get_doctor_notifications(doctor_id, unread_only=False):
-        """Get notifications for a doctor."""
-        query = '''SELECT * FROM notifications WHERE doctor_id = ? AND recipient_type = "doctor"'''
-        params = [doctor_id]
+    def get_doctor_notifications(doctor_id, unread_only=False, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Get notifications for a doctor, newest first: (notifications, next_cursor)."""
+        sort = ['created_at', 'id']
+        after, params = keyset(sort, cursor)
+        query = f'''SELECT * FROM notifications
+                    WHERE doctor_id = ? AND recipient_type = "doctor" AND {after}'''
         if unread_only:
             query += ' AND is_read = 0'
-        query += ' ORDER BY created_at DESC LIMIT 50'
-        
-        notifs = query_db(query, tuple(params))
-        return [dict(n) for n in notifs]
+        notifs = query_db(f'{query} {order_by(sort)} LIMIT ?', (doctor_id, *params, limit + 1))
+        return paginate(notifs, limit, lambda n: (n['created_at'], n['id']))
 
     @staticmethod
     def mark_as_read(notification_id):
@@ -2,7 +2,8 @@ import random
 import string
 import logging
 from datetime import datetime, timedelta
-from backend.utils.database import query_db, execute_db
+from backend.utils.database import query_db, execute_db, get_db
+from backend.services.analytics_service import AnalyticsService
 
 logger = logging.getLogger(__name__)
 
@@ -41,10 +42,13 @@ class OTPService:
 
         # Only update appointment status if requested (not for booking-time OTPs)
         if update_status:
-            execute_db(
+            conn = get_db()
+            conn.execute(
                 'UPDATE appointments SET status = "otp_pending" WHERE id = ?',
                 (appointment_id,)
             )
+            AnalyticsService.refresh_appointments(conn, (appointment_id,))
+            conn.commit()
 
         logger.info(f"OTP generated for appointment {appointment_id}")
         return otp_code
@@ -74,10 +78,13 @@ class OTPService:
         )
 
         # OTP verified → mark appointment as completed
-        execute_db(
+        conn = get_db()
+        conn.execute(
             'UPDATE appointments SET status = "completed" WHERE id = ?',
             (appointment_id,)
         )
+        AnalyticsService.refresh_appointments(conn, (appointment_id,))
+        conn.commit()
 
         return True, 'OTP verified — appointment marked as completed'
 
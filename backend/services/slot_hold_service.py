@@ -0,0 +1,264 @@
+import heapq
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from backend.utils.database import get_db, close_db
+from backend.services.availability_service import AvailabilityService
+
+logger = logging.getLogger(__name__)
+
+
+class SlotHoldService:
+    """Short-lived checkout holds on a slot.
+
+    A live hold hides the slot from availability responses and lets only its
+    patient book it. Holds are rows in slot_holds so every worker process sees
+    them; readers ignore rows past expires_at, and a sweeper thread deletes
+    each hold this process created when it expires, using a heap keyed on
+    expiry instead of scanning for stale rows.
+    """
+
+    TTL_SECONDS = 300
+
+    _heap = []
+    _cond = threading.Condition()
+    _sweeper = None
+    _expiry_listeners = []
+    _stats = {'created': 0, 'converted': 0, 'released': 0, 'expired': 0}
+
+    @staticmethod
+    def _now():
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def _count(name, amount=1):
+        with SlotHoldService._cond:
+            SlotHoldService._stats[name] += amount
+
+    @staticmethod
+    def stats():
+        with SlotHoldService._cond:
+            return {
+                **SlotHoldService._stats,
+                'pending_expiries': len(SlotHoldService._heap),
+                'ttl_seconds': SlotHoldService.TTL_SECONDS,
+            }
+
+    @staticmethod
+    def create_hold(patient_id, doctor_id, slot_id=None, slot_date=None, start_time=None):
+        """Hold an open slot for a patient; replaces any hold the patient already has."""
+        if slot_id is None and (doctor_id is None or not slot_date or not start_time):
+            return None, 'Slot ID or doctor, date and start time required'
+
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if slot_id is not None:
+                slot = conn.execute(
+                    'SELECT * FROM slots WHERE id = ? AND is_booked = 0 AND is_blocked = 0', (slot_id,)
+                ).fetchone()
+            else:
+                slot = AvailabilityService.find_slot(doctor_id, slot_date, start_time, conn=conn)
+            if not slot or slot['is_booked'] or (doctor_id is not None and slot['doctor_id'] != int(doctor_id)):
+                conn.rollback()
+                return None, 'Slot is no longer available'
+
+            conn.execute('DELETE FROM slot_holds WHERE patient_id = ?', (patient_id,))
+            hold = SlotHoldService.place_hold(conn, patient_id, slot)
+            if not hold:
+                conn.rollback()
+                return None, 'Slot is being booked by another patient'
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Create hold error: {e}")
+            return None, 'Failed to hold slot'
+        return hold, None
+
+    @staticmethod
+    def place_hold(conn, patient_id, slot, ttl_seconds=None, appointment_id=None):
+        """Insert a hold on an open slot inside the caller's transaction; None if already held.
+
+        `appointment_id` marks the hold as a rebooking proposal for that appointment.
+        """
+        ttl_seconds = ttl_seconds or SlotHoldService.TTL_SECONDS
+        conn.execute(
+            '''DELETE FROM slot_holds
+               WHERE doctor_id = ? AND slot_date = ? AND start_time = ? AND expires_at <= ?''',
+            (slot['doctor_id'], slot['slot_date'], slot['start_time'], SlotHoldService._now())
+        )
+
+        expires = datetime.now().replace(microsecond=0) + timedelta(seconds=ttl_seconds)
+        hold = {
+            'hold_token': secrets.token_urlsafe(16),
+            'doctor_id': slot['doctor_id'],
+            'slot_date': slot['slot_date'],
+            'start_time': slot['start_time'],
+            'end_time': slot['end_time'],
+            'expires_at': expires.strftime('%Y-%m-%d %H:%M:%S'),
+            'ttl_seconds': ttl_seconds,
+        }
+        try:
+            conn.execute(
+                '''INSERT INTO slot_holds
+                   (hold_token, doctor_id, patient_id, slot_date, start_time, end_time, expires_at, appointment_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (hold['hold_token'], hold['doctor_id'], patient_id, hold['slot_date'],
+                 hold['start_time'], hold['end_time'], hold['expires_at'], appointment_id)
+            )
+        except sqlite3.IntegrityError:
+            return None
+
+        SlotHoldService._count('created')
+        # Scheduling a hold that ends up rolled back is harmless: the sweeper deletes nothing
+        SlotHoldService._schedule(expires.timestamp(), hold['hold_token'])
+        return hold
+
+    @staticmethod
+    def release_hold(hold_token, patient_id):
+        conn = get_db()
+        released = conn.execute(
+            'DELETE FROM slot_holds WHERE hold_token = ? AND patient_id = ?', (hold_token, patient_id)
+        ).rowcount
+        conn.commit()
+        if released:
+            SlotHoldService._count('released')
+        return bool(released)
+
+    @staticmethod
+    def get_live_hold(conn, hold_token, patient_id):
+        return conn.execute(
+            'SELECT * FROM slot_holds WHERE hold_token = ? AND patient_id = ? AND expires_at > ?',
+            (hold_token, patient_id, SlotHoldService._now())
+        ).fetchone()
+
+    @staticmethod
+    def get_proposals(appointment_id, patient_id):
+        """Live rebooking proposals held for a patient's emergency-cancelled appointment."""
+        conn = get_db()
+        rows = conn.execute(
+            '''SELECT h.hold_token, h.doctor_id, h.slot_date, h.start_time, h.end_time, h.expires_at,
+                      d.full_name AS doctor_name, d.specialization
+               FROM slot_holds h JOIN doctors d ON h.doctor_id = d.id
+               WHERE h.appointment_id = ? AND h.patient_id = ? AND h.expires_at > ?
+               ORDER BY h.slot_date, h.start_time''',
+            (appointment_id, patient_id, SlotHoldService._now())
+        ).fetchall()
+        conn.commit()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def release_proposals(conn, appointment_id, keep_token=None):
+        """Drop the remaining proposals for an appointment once one of them is taken."""
+        return conn.execute(
+            'DELETE FROM slot_holds WHERE appointment_id = ? AND hold_token != ?',
+            (appointment_id, keep_token or '')
+        ).rowcount
+
+    @staticmethod
+    def check_and_consume(conn, patient_id, doctor_id, slot_date, start_time):
+        """Inside a booking transaction: False if another patient holds the slot, else drop any hold on it."""
+        hold = conn.execute(
+            '''SELECT patient_id FROM slot_holds
+               WHERE doctor_id = ? AND slot_date = ? AND start_time = ? AND expires_at > ?''',
+            (doctor_id, slot_date, start_time, SlotHoldService._now())
+        ).fetchone()
+        if hold and hold['patient_id'] != patient_id:
+            return False
+
+        consumed = conn.execute(
+            'DELETE FROM slot_holds WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+            (doctor_id, slot_date, start_time)
+        ).rowcount
+        if hold and consumed:
+            SlotHoldService._count('converted')
+        return True
+
+    @staticmethod
+    def purge_expired(conn):
+        """Delete every expired hold inside the caller's transaction and return their rows.
+
+        This catches holds the sweeper never saw: ones placed by another
+        process, or before a restart. Pass the rows to notify_expired once
+        the transaction commits, so listeners see them like any other lapse.
+        """
+        now = SlotHoldService._now()
+        expired = [dict(row) for row in conn.execute('SELECT * FROM slot_holds WHERE expires_at <= ?', (now,))]
+        if expired:
+            conn.execute('DELETE FROM slot_holds WHERE expires_at <= ?', (now,))
+        return expired
+
+    @staticmethod
+    def notify_expired(holds):
+        """Run the expiry listeners on holds that lapsed and have been deleted."""
+        SlotHoldService._count('expired', len(holds))
+        if holds:
+            for callback in SlotHoldService._expiry_listeners:
+                callback(holds)
+
+    @staticmethod
+    def add_expiry_listener(callback):
+        """Register callback(holds) to run with the rows of holds that lapsed (sweeper or purge_expired)."""
+        if callback not in SlotHoldService._expiry_listeners:
+            SlotHoldService._expiry_listeners.append(callback)
+
+    @staticmethod
+    def _schedule(expires_at, hold_token):
+        if SlotHoldService._sweeper is None:
+            return
+        with SlotHoldService._cond:
+            heapq.heappush(SlotHoldService._heap, (expires_at, hold_token))
+            SlotHoldService._cond.notify()
+
+    @staticmethod
+    def _sweep_due():
+        """Block until at least one hold is due, then pop and return every due token."""
+        with SlotHoldService._cond:
+            while True:
+                if not SlotHoldService._heap:
+                    SlotHoldService._cond.wait()
+                    continue
+                delay = SlotHoldService._heap[0][0] - time.time()
+                if delay > 0:
+                    SlotHoldService._cond.wait(delay)
+                    continue
+                due = []
+                while SlotHoldService._heap and SlotHoldService._heap[0][0] <= time.time():
+                    due.append(heapq.heappop(SlotHoldService._heap)[1])
+                return due
+
+    @staticmethod
+    def start_sweeper(ttl_seconds=None):
+        """Start the expiry sweeper thread (idempotent)."""
+        if ttl_seconds:
+            SlotHoldService.TTL_SECONDS = ttl_seconds
+        if SlotHoldService._sweeper is not None and SlotHoldService._sweeper.is_alive():
+            return SlotHoldService._sweeper
+
+        def _run():
+            while True:
+                due = SlotHoldService._sweep_due()
+                try:
+                    conn = get_db()
+                    now = SlotHoldService._now()
+                    expired = []
+                    for hold_token in due:
+                        hold = conn.execute(
+                            'SELECT * FROM slot_holds WHERE hold_token = ? AND expires_at <= ?', (hold_token, now)
+                        ).fetchone()
+                        if hold:
+                            conn.execute('DELETE FROM slot_holds WHERE hold_token = ?', (hold_token,))
+                            expired.append(dict(hold))
+                    conn.commit()
+                    SlotHoldService.notify_expired(expired)
+                except Exception as e:
+                    logger.warning(f"Slot hold sweep failed: {e}")
+                finally:
+                    close_db()
+
+        SlotHoldService._sweeper = threading.Thread(target=_run, name='slot-hold-sweeper', daemon=True)
+        SlotHoldService._sweeper.start()
+        return SlotHoldService._sweeper
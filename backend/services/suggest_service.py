@@ -0,0 +1,162 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from backend.utils.database import get_db, close_db
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestService:
+    """In-memory prefix index for search-box typeahead.
+
+    Every suggestion (specialization, disease, verified doctor) is indexed
+    under each word-suffix of its normalized label ("dr sarah mitchell",
+    "sarah mitchell", "mitchell"), so a query matches from the start of any word and multi-word
+    queries work too. Keys live in one sorted array: a prefix lookup is two
+    bisects. Suggestions carry a global rank (specializations by doctor count,
+    then diseases, then doctors by rating); prefixes whose range is too wide
+    to rank on the fly get their top MAX_LIMIT precomputed at build time, so
+    every lookup touches at most SCAN_MAX entries.
+
+    The index is rebuilt from the database at startup and after doctor
+    changes, on a background thread; readers keep using the previous index
+    until the new one is swapped in.
+    """
+
+    DEFAULT_LIMIT = 8
+    MAX_LIMIT = 20
+    SCAN_MAX = 64
+    SKIP_WORDS = {'dr'}
+
+    _index = None  # (keys, ranks, items, top)
+    _lock = threading.Lock()
+    _rebuild_pending = False
+    _builder = None
+    _stats = {'builds': 0, 'last_build_ms': None, 'keys': 0, 'suggestions': 0, 'queries': 0}
+
+    @staticmethod
+    def _normalize(text):
+        return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+    @staticmethod
+    def _load():
+        conn = get_db()
+        specializations = conn.execute(
+            '''SELECT specialization, COUNT(*) AS doctors FROM doctors
+               WHERE verified = 1 GROUP BY specialization ORDER BY doctors DESC, specialization'''
+        ).fetchall()
+        diseases = conn.execute(
+            'SELECT disease, specialization FROM disease_specialization_mapping ORDER BY disease'
+        ).fetchall()
+        doctors = conn.execute(
+            '''SELECT id, full_name, specialization FROM doctors
+               WHERE verified = 1 ORDER BY rating DESC, full_name'''
+        ).fetchall()
+        conn.commit()
+
+        # List order is rank order
+        items = [{'type': 'specialization', 'label': row['specialization']} for row in specializations]
+        items += [{'type': 'disease', 'label': row['disease'], 'specialization': row['specialization']}
+                  for row in diseases]
+        items += [{'type': 'doctor', 'label': row['full_name'], 'id': row['id'],
+                   'specialization': row['specialization']} for row in doctors]
+        return items
+
+    @staticmethod
+    def _top(ranks, lo, hi, limit):
+        """The `limit` best distinct suggestions among ranks[lo:hi]."""
+        span = ranks[lo:hi]
+        best = sorted(set(heapq.nsmallest(limit * 4, span))) if len(span) > limit * 4 else sorted(set(span))
+        if len(best) < limit and len(span) > limit * 4:
+            best = sorted(set(span))
+        return best[:limit]
+
+    @staticmethod
+    def build():
+        """Build a new index from the database and swap it in."""
+        started = time.perf_counter()
+        items = SuggestService._load()
+
+        pairs = []
+        for rank, item in enumerate(items):
+            words = SuggestService._normalize(item['label']).split()
+            for start in range(len(words)):
+                if start == 0 or words[start] not in SuggestService.SKIP_WORDS:
+                    pairs.append((' '.join(words[start:]), rank))
+        pairs.sort()
+        keys = [key for key, _ in pairs]
+        ranks = [rank for _, rank in pairs]
+
+        top = {}
+        seen = set()
+        for key in keys:
+            for length in range(1, len(key) + 1):
+                prefix = key[:length]
+                if prefix in seen:
+                    continue
+                seen.add(prefix)
+                lo = bisect.bisect_left(keys, prefix)
+                hi = bisect.bisect_right(keys, prefix + '\uffff')
+                if hi - lo <= SuggestService.SCAN_MAX:
+                    break  # longer prefixes of this key are narrower still
+                top[prefix] = SuggestService._top(ranks, lo, hi, SuggestService.MAX_LIMIT)
+
+        with SuggestService._lock:
+            SuggestService._index = (keys, ranks, items, top)
+            SuggestService._stats['builds'] += 1
+            SuggestService._stats['last_build_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            SuggestService._stats['keys'] = len(keys)
+            SuggestService._stats['suggestions'] = len(items)
+        return len(items)
+
+    @staticmethod
+    def refresh():
+        """Rebuild in the background; calls made while a rebuild is running coalesce into one more."""
+        with SuggestService._lock:
+            SuggestService._rebuild_pending = True
+            if SuggestService._builder is not None and SuggestService._builder.is_alive():
+                return
+
+            def _run():
+                while True:
+                    with SuggestService._lock:
+                        if not SuggestService._rebuild_pending:
+                            SuggestService._builder = None
+                            return
+                        SuggestService._rebuild_pending = False
+                    try:
+                        SuggestService.build()
+                    except Exception as e:
+                        logger.warning(f"Suggest index rebuild failed: {e}")
+                    finally:
+                        close_db()
+
+            SuggestService._builder = threading.Thread(target=_run, name='suggest-index', daemon=True)
+            SuggestService._builder.start()
+
+    @staticmethod
+    def suggest(query, limit=None):
+        """Top suggestions whose label has a word starting with the query."""
+        limit = min(max(int(limit or SuggestService.DEFAULT_LIMIT), 1), SuggestService.MAX_LIMIT)
+        prefix = SuggestService._normalize(query)
+        index = SuggestService._index
+        with SuggestService._lock:
+            SuggestService._stats['queries'] += 1
+        if not prefix or index is None:
+            return []
+
+        keys, ranks, items, top = index
+        best = top.get(prefix)
+        if best is None:
+            lo = bisect.bisect_left(keys, prefix)
+            hi = bisect.bisect_right(keys, prefix + '\uffff')
+            best = SuggestService._top(ranks, lo, hi, limit)
+        return [items[rank] for rank in best[:limit]]
+
+    @staticmethod
+    def stats():
+        with SuggestService._lock:
+            return {**SuggestService._stats, 'ready': SuggestService._index is not None}
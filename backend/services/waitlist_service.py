@@ -0,0 +1,336 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from backend.utils.database import get_db, query_db
+from backend.services.availability_service import AvailabilityService
+from backend.services.notification_service import NotificationService
+from backend.services.slot_hold_service import SlotHoldService
+
+logger = logging.getLogger(__name__)
+
+
+class WaitlistService:
+    """Waitlist for patients who want a slot with a doctor or any doctor of a specialization.
+
+    Every waiting entry is expanded into waitlist_index rows, one per day of
+    its window, keyed by target ('doctor:<id>' / 'spec:<name>') and date. When
+    a slot is freed, the first matching row for each target is found with a
+    primary-key seek, and the winner is offered the slot as a hold inside the
+    same transaction that freed it, so nobody else sees the slot in between.
+    """
+
+    OFFER_TTL_SECONDS = 900
+    MAX_ACTIVE_ENTRIES = 10
+
+    _lock = threading.Lock()
+    _stats = {'joined': 0, 'offers': 0, 'fulfilled': 0, 'lapsed': 0, 'unmatched': 0, 'last_match_ms': None}
+
+    @staticmethod
+    def stats():
+        with WaitlistService._lock:
+            return dict(WaitlistService._stats)
+
+    @staticmethod
+    def _count(name, amount=1):
+        with WaitlistService._lock:
+            WaitlistService._stats[name] += amount
+
+    @staticmethod
+    def _doctor_target(doctor_id):
+        return f'doctor:{int(doctor_id)}'
+
+    @staticmethod
+    def _spec_target(specialization):
+        return f'spec:{specialization.strip().lower()}'
+
+    @staticmethod
+    def _index_rows(entry, from_date):
+        """waitlist_index rows for an entry, from max(from_date, window_start) to window_end."""
+        target = (WaitlistService._doctor_target(entry['doctor_id']) if entry['doctor_id']
+                  else WaitlistService._spec_target(entry['specialization']))
+        day = max(datetime.strptime(entry['window_start'], '%Y-%m-%d'), from_date)
+        last_day = datetime.strptime(entry['window_end'], '%Y-%m-%d')
+        rows = []
+        while day <= last_day:
+            rows.append((target, day.strftime('%Y-%m-%d'), entry['id'], entry['patient_id'],
+                         entry['earliest_time'], entry['latest_time']))
+            day += timedelta(days=1)
+        return rows
+
+    @staticmethod
+    def _insert_index(conn, entry):
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        conn.executemany(
+            '''INSERT OR IGNORE INTO waitlist_index
+               (target, wait_date, entry_id, patient_id, earliest_time, latest_time)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            WaitlistService._index_rows(entry, today)
+        )
+
+    # ─── Patient API ─────────────────────────────────────────
+
+    @staticmethod
+    def join_waitlist(patient_id, doctor_id=None, specialization=None, start_date=None, end_date=None,
+                      earliest_time=None, latest_time=None):
+        """Register interest in a doctor (or a specialization) for a date window and optional time of day."""
+        if not doctor_id and not specialization:
+            return None, 'Doctor or specialization is required'
+
+        try:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            first_day = max(datetime.strptime(start_date, '%Y-%m-%d'), today) if start_date else today
+            last_day = datetime.strptime(end_date, '%Y-%m-%d') if end_date else first_day + timedelta(days=13)
+            earliest_time = earliest_time or '00:00'
+            latest_time = latest_time or '23:59'
+            datetime.strptime(earliest_time, '%H:%M')
+            datetime.strptime(latest_time, '%H:%M')
+        except (TypeError, ValueError):
+            return None, 'Dates must be YYYY-MM-DD and times HH:MM'
+
+        if last_day < first_day:
+            return None, 'End date must not be before start date'
+        if (last_day - first_day).days >= AvailabilityService.MAX_RANGE_DAYS:
+            return None, f'Date range cannot exceed {AvailabilityService.MAX_RANGE_DAYS} days'
+        if earliest_time >= latest_time:
+            return None, 'Earliest time must be before latest time'
+
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if doctor_id:
+                doctor = conn.execute(
+                    'SELECT id FROM doctors WHERE id = ? AND verified = 1', (doctor_id,)
+                ).fetchone()
+                if not doctor:
+                    conn.rollback()
+                    return None, 'Doctor not found'
+                specialization = None
+
+            active = conn.execute(
+                '''SELECT COUNT(*) FROM waitlist_entries
+                   WHERE patient_id = ? AND status IN ('waiting', 'offered')''',
+                (patient_id,)
+            ).fetchone()[0]
+            if active >= WaitlistService.MAX_ACTIVE_ENTRIES:
+                conn.rollback()
+                return None, f'You can have at most {WaitlistService.MAX_ACTIVE_ENTRIES} active waitlist entries'
+
+            entry_id = conn.execute(
+                '''INSERT INTO waitlist_entries
+                   (patient_id, doctor_id, specialization, window_start, window_end, earliest_time, latest_time)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                (patient_id, doctor_id, specialization, first_day.strftime('%Y-%m-%d'),
+                 last_day.strftime('%Y-%m-%d'), earliest_time, latest_time)
+            ).lastrowid
+            entry = dict(conn.execute('SELECT * FROM waitlist_entries WHERE id = ?', (entry_id,)).fetchone())
+            WaitlistService._insert_index(conn, entry)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Join waitlist error: {e}")
+            return None, 'Failed to join waitlist'
+
+        WaitlistService._count('joined')
+        return entry, None
+
+    @staticmethod
+    def get_patient_waitlist(patient_id):
+        return query_db(
+            '''SELECT w.*, d.full_name AS doctor_name, od.full_name AS offer_doctor_name
+               FROM waitlist_entries w
+               LEFT JOIN doctors d ON w.doctor_id = d.id
+               LEFT JOIN doctors od ON w.offer_doctor_id = od.id
+               WHERE w.patient_id = ? AND w.status IN ('waiting', 'offered')
+               ORDER BY w.created_at DESC''',
+            (patient_id,)
+        )
+
+    @staticmethod
+    def leave_waitlist(entry_id, patient_id):
+        conn = get_db()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            entry = conn.execute(
+                '''SELECT * FROM waitlist_entries
+                   WHERE id = ? AND patient_id = ? AND status IN ('waiting', 'offered')''',
+                (entry_id, patient_id)
+            ).fetchone()
+            if not entry:
+                conn.rollback()
+                return False, 'Waitlist entry not found'
+
+            conn.execute("UPDATE waitlist_entries SET status = 'cancelled' WHERE id = ?", (entry_id,))
+            conn.execute('DELETE FROM waitlist_index WHERE entry_id = ?', (entry_id,))
+            offer = None
+            if entry['status'] == 'offered':
+                hold = conn.execute(
+                    'SELECT * FROM slot_holds WHERE hold_token = ?', (entry['offer_hold_token'],)
+                ).fetchone()
+                if hold:
+                    conn.execute('DELETE FROM slot_holds WHERE hold_token = ?', (hold['hold_token'],))
+                    # Declining an offer passes the slot straight to the next patient
+                    offer = WaitlistService.offer_slot(
+                        conn, hold['doctor_id'], hold['slot_date'], hold['start_time'], hold['end_time'],
+                        exclude_patient_id=patient_id
+                    )
+            conn.commit()
+            if offer:
+                WaitlistService.notify_offer(offer)
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Leave waitlist error: {e}")
+            return False, 'Failed to leave waitlist'
+
+    # ─── Matching ─────────────────────────────────────────────
+
+    @staticmethod
+    def offer_slot(conn, doctor_id, slot_date, start_time, end_time, exclude_patient_id=None, specialization=None):
+        """Offer an open slot to the first matching waitlist entry, inside the caller's transaction.
+
+        Returns the offer (entry_id, patient_id and the hold) or None if nobody matches.
+        """
+        started = time.perf_counter()
+        if specialization is None:
+            doctor = conn.execute('SELECT specialization FROM doctors WHERE id = ?', (doctor_id,)).fetchone()
+            specialization = doctor['specialization'] if doctor else None
+        targets = [WaitlistService._doctor_target(doctor_id)]
+        if specialization:
+            targets.append(WaitlistService._spec_target(specialization))
+
+        best = None
+        for target in targets:
+            candidate = conn.execute(
+                '''SELECT entry_id, patient_id FROM waitlist_index
+                   WHERE target = ? AND wait_date = ? AND earliest_time <= ? AND latest_time >= ?
+                     AND patient_id != ?
+                   ORDER BY entry_id LIMIT 1''',
+                (target, slot_date, start_time, end_time, exclude_patient_id or 0)
+            ).fetchone()
+            if candidate and (best is None or candidate['entry_id'] < best['entry_id']):
+                best = candidate
+        if best is None:
+            WaitlistService._count('unmatched')
+            return None
+
+        hold = SlotHoldService.place_hold(
+            conn, best['patient_id'],
+            {'doctor_id': doctor_id, 'slot_date': slot_date, 'start_time': start_time, 'end_time': end_time},
+            ttl_seconds=WaitlistService.OFFER_TTL_SECONDS
+        )
+        if not hold:
+            return None
+
+        conn.execute(
+            '''UPDATE waitlist_entries
+               SET status = 'offered', offer_hold_token = ?, offer_doctor_id = ?,
+                   offer_slot_date = ?, offer_start_time = ?, offered_at = CURRENT_TIMESTAMP
+               WHERE id = ?''',
+            (hold['hold_token'], doctor_id, slot_date, start_time, best['entry_id'])
+        )
+        conn.execute('DELETE FROM waitlist_index WHERE entry_id = ?', (best['entry_id'],))
+
+        with WaitlistService._lock:
+            WaitlistService._stats['offers'] += 1
+            WaitlistService._stats['last_match_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return {'entry_id': best['entry_id'], 'patient_id': best['patient_id'], **hold}
+
+    @staticmethod
+    def offer_freed_slot(conn, slot_id, exclude_patient_id=None):
+        """Offer a slot that was just freed; never lets a waitlist problem fail the caller.
+
+        The offer runs under a savepoint, so a failure part way through (hold
+        placed, entry not yet marked offered) is undone without touching the
+        caller's own writes.
+        """
+        conn.execute('SAVEPOINT waitlist_offer')
+        try:
+            slot = conn.execute('SELECT * FROM slots WHERE id = ?', (slot_id,)).fetchone()
+            offer = None
+            now = datetime.now()
+            if (slot and not slot['is_booked'] and not slot['is_blocked']
+                    and (slot['slot_date'], slot['start_time']) > (now.strftime('%Y-%m-%d'), now.strftime('%H:%M'))):
+                offer = WaitlistService.offer_slot(
+                    conn, slot['doctor_id'], slot['slot_date'], slot['start_time'], slot['end_time'],
+                    exclude_patient_id=exclude_patient_id
+                )
+            conn.execute('RELEASE waitlist_offer')
+            return offer
+        except Exception as e:
+            logger.error(f"Waitlist offer error: {e}")
+            conn.execute('ROLLBACK TO waitlist_offer')
+            conn.execute('RELEASE waitlist_offer')
+            return None
+
+    @staticmethod
+    def notify_offer(offer):
+        NotificationService.create_notification(
+            recipient_type='patient',
+            title='A slot opened up',
+            message=f"A slot on {offer['slot_date']} at {offer['start_time']} matches your waitlist request. "
+                    f"It is held for you until {offer['expires_at'][11:16]}.",
+            notification_type='waitlist',
+            user_id=offer['patient_id']
+        )
+
+    @staticmethod
+    def fulfil_offer(conn, patient_id, doctor_id, slot_date, start_time):
+        """Mark the patient's offer for this slot as fulfilled (called inside the booking transaction)."""
+        fulfilled = conn.execute(
+            '''UPDATE waitlist_entries SET status = 'fulfilled'
+               WHERE patient_id = ? AND status = 'offered'
+                 AND offer_doctor_id = ? AND offer_slot_date = ? AND offer_start_time = ?''',
+            (patient_id, doctor_id, slot_date, start_time)
+        ).rowcount
+        if fulfilled:
+            WaitlistService._count('fulfilled', fulfilled)
+
+    @staticmethod
+    def handle_expired_holds(holds):
+        """Slot hold expiry listener: close lapsed offers and pass the slot to the next patient.
+
+        A patient who lets an offer lapse leaves the waitlist; otherwise two idle
+        patients would keep trading the same slot every OFFER_TTL_SECONDS.
+        """
+        conn = get_db()
+        offers = []
+        for hold in holds:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                entry = conn.execute(
+                    "SELECT * FROM waitlist_entries WHERE offer_hold_token = ? AND status = 'offered'",
+                    (hold['hold_token'],)
+                ).fetchone()
+                if not entry:
+                    conn.rollback()
+                    continue
+
+                conn.execute("UPDATE waitlist_entries SET status = 'expired' WHERE id = ?", (entry['id'],))
+                WaitlistService._count('lapsed')
+
+                slot = AvailabilityService.find_slot(hold['doctor_id'], hold['slot_date'], hold['start_time'], conn=conn)
+                offer = None
+                if slot and not slot['is_booked']:
+                    offer = WaitlistService.offer_slot(
+                        conn, hold['doctor_id'], hold['slot_date'], hold['start_time'], hold['end_time'],
+                        exclude_patient_id=entry['patient_id']
+                    )
+                conn.commit()
+                if offer:
+                    offers.append(offer)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Waitlist requeue error: {e}")
+
+        for offer in offers:
+            WaitlistService.notify_offer(offer)
+
+    @staticmethod
+    def expire_past(conn, today):
+        """Close entries whose window has ended and drop index rows for past days."""
+        conn.execute(
+            "UPDATE waitlist_entries SET status = 'expired' WHERE status = 'waiting' AND window_end < ?",
+            (today,)
+        )
+        return conn.execute('DELETE FROM waitlist_index WHERE wait_date < ?', (today,)).rowcount
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after a fixed TTL.
+
+    Keys are (namespace, *arguments). Lookups move the entry to the back of
+    an OrderedDict, so the front is always the least recently used entry and
+    eviction past max_entries is O(1). Writers call invalidate(namespace)
+    after changing the underlying rows; the TTL bounds staleness for changes
+    made by other processes, which this cache cannot see. Each invalidation
+    bumps the namespace's generation, and a value computed under an older
+    generation is not stored, so a query that raced an invalidation cannot
+    put pre-change rows back.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}  # namespace -> invalidation count
+        self._epoch = 0  # bumped by invalidate() of everything
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                       'stale_writes': 0}
+
+    def get(self, key):
+        """Return (True, value) for a live entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, entry[1]
+
+    def generation(self, namespace):
+        """Token to pass to set(): it changes whenever the namespace is invalidated."""
+        with self._lock:
+            return self._epoch, self._generations.get(namespace, 0)
+
+    def set(self, key, value, generation=None):
+        """Store a value; skipped if key's namespace was invalidated since generation was read."""
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key[0], 0)):
+                self._stats['stale_writes'] += 1
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+            return True
+
+    def invalidate(self, namespace=None):
+        """Drop every entry of a namespace, or everything."""
+        with self._lock:
+            if namespace is None:
+                self._epoch += 1
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                stale = [key for key in self._entries if key[0] == namespace]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self._stats['invalidations'] += 1
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None,
+                'ttl_seconds': self.ttl_seconds,
+                'max_entries': self.max_entries,
+            }
+
+
+def _cache_from_config(config):
+    return TTLCache(
+        ttl_seconds=int(config.get('RESPONSE_CACHE_TTL_SECONDS', 300)),
+        max_entries=int(config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    )
+
+
+# Built from the environment until the app calls configure_cache
+_cache = _cache_from_config(os.environ)
+
+
+def configure_cache(config):
+    """Replace the process-wide cache with an empty one sized from app config."""
+    global _cache
+    _cache = _cache_from_config(config)
+    return _cache
+
+
+def get_cache_stats():
+    return _cache.stats()
+
+
+def invalidate_cache(namespace=None):
+    return _cache.invalidate(namespace)
+
+
+def cached(namespace):
+    """Cache a service function's return value by namespace and call arguments.
+
+    Callers must treat the returned value as read-only: every hit returns the
+    same object.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (namespace, f.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = _cache.get(key)
+            if hit:
+                return value
+            # Read before the query: an invalidation while it runs makes the result unstorable
+            generation = _cache.generation(namespace)
+            value = f(*args, **kwargs)
+            _cache.set(key, value, generation)
+            return value
+        return decorated_function
+    return decorator
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def percentile(sorted_values, fraction):
+    """The value at fraction (0-1) of an ascending list, rounded to 0.1; None if empty."""
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))], 1)
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker for one upstream dependency (one LLM model).
+
+    Every call is recorded with its outcome and latency. A call is slow
+    if it took slow_call_ms or longer. The breaker trips open when the
+    last window_seconds hold at least min_calls calls and either share
+    reaches its limit:
+    - failures reach failure_rate;
+    - slow calls reach slow_call_rate.
+    While open, allow() refuses calls, so callers skip the dependency at no
+    cost. After open_seconds, the breaker goes half-open and lets
+    half_open_probes trial calls through:
+    - if they all succeed in time, it closes with a fresh window;
+    - if any fails or is slow, it opens again for twice as long, up to
+      max_open_seconds.
+    """
+
+    def __init__(self, name, window_seconds=60, min_calls=5, failure_rate=0.5, slow_call_ms=15000,
+                 slow_call_rate=0.8, open_seconds=30, max_open_seconds=300, half_open_probes=1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._calls = deque()  # (finished_at, ok, slow, latency_ms)
+        self._state = CLOSED
+        self._open_for = open_seconds
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self._stats = {'allowed': 0, 'rejected': 0, 'successes': 0, 'failures': 0, 'slow_calls': 0, 'trips': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Whether a call may go ahead now; a half-open breaker counts it as a probe."""
+        now = time.monotonic()
+        with self._lock:
+            if self._state == OPEN:
+                if now - self._opened_at < self._open_for:
+                    self._stats['rejected'] += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+            if self._state == HALF_OPEN:
+                # A probe that never reported back (its caller died) stops blocking after open_for
+                if self._probes_in_flight >= self.half_open_probes and now - self._probe_started < self._open_for:
+                    self._stats['rejected'] += 1
+                    return False
+                if self._probes_in_flight >= self.half_open_probes:
+                    self._probes_in_flight = 0
+                self._probes_in_flight += 1
+                self._probe_started = now
+            self._stats['allowed'] += 1
+            return True
+
+    def record(self, ok, latency_ms):
+        """Report the outcome of a call that allow() let through."""
+        now = time.monotonic()
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            self._stats['successes' if ok else 'failures'] += 1
+            self._stats['slow_calls'] += slow
+            self._calls.append((now, ok, slow, latency_ms))
+            self._prune(now)
+
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not ok or slow:
+                    self._trip(now, self._open_for * 2)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._state = CLOSED
+                    self._open_for = self.open_seconds
+                    self._calls.clear()
+            elif self._state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(not call[1] for call in self._calls)
+                slow_calls = sum(call[2] for call in self._calls)
+                if failures >= self.failure_rate * len(self._calls) or \
+                        slow_calls >= self.slow_call_rate * len(self._calls):
+                    self._trip(now, self.open_seconds)
+
+    def cancel(self):
+        """Report that a call allow() let through was abandoned; it says nothing about the dependency."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _trip(self, now, open_for):
+        self._state = OPEN
+        self._opened_at = now
+        self._open_for = min(open_for, self.max_open_seconds)
+        self._stats['trips'] += 1
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            calls = len(self._calls)
+            latencies = sorted(call[3] for call in self._calls)
+            return {
+                **self._stats,
+                'state': self._state,
+                'window_calls': calls,
+                'error_rate': round(sum(not call[1] for call in self._calls) / calls, 3) if calls else 0.0,
+                'slow_rate': round(sum(call[2] for call in self._calls) / calls, 3) if calls else 0.0,
+                'p50_ms': percentile(latencies, 0.5),
+                'p99_ms': percentile(latencies, 0.99),
+                'retry_in_seconds': round(max(0.0, self._open_for - (now - self._opened_at)), 1)
+                if self._state == OPEN else None,
+            }
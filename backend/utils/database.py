@@ -1,38 +1,327 @@
 import sqlite3
 import os
 import logging
+import threading
+import time
+from flask import g, has_app_context
 
 logger = logging.getLogger(__name__)
 
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+_checkpoint_thread = None
+# DB_* settings come from the Flask app's config once init_app has run, else the environment
+_config = os.environ
+
 
 def get_db_path():
-    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)),
                         os.getenv('DATABASE_PATH', 'medsync.db'))
 
 
-def get_db():
-    """Get a database connection with foreign keys enabled."""
-    db_path = get_db_path()
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
+def get_storage_profile():
+    """PRAGMA settings applied to every new connection (DB_* in app config or the environment)."""
+    return {
+        'journal_mode': _config.get('DB_JOURNAL_MODE', 'WAL'),
+        'synchronous': _config.get('DB_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(_config.get('DB_MMAP_SIZE', 64 * 1024 * 1024)),
+        'cache_size': int(_config.get('DB_CACHE_SIZE', -16000)),
+        'temp_store': _config.get('DB_TEMP_STORE', 'MEMORY'),
+        'busy_timeout': int(_config.get('DB_BUSY_TIMEOUT_MS', 5000)),
+    }
+
+
+def apply_storage_profile(conn, profile=None):
+    """Apply the storage profile to a freshly opened connection."""
+    profile = profile or get_storage_profile()
+    # busy_timeout first so the journal_mode switch itself waits out other writers
+    conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+    conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
     return conn
 
 
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared across requests and threads."""
+
+    def __init__(self, db_path, max_size=10, timeout=5.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0}
+
+    def _connect(self):
+        profile = get_storage_profile()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               timeout=profile['busy_timeout'] / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        apply_storage_profile(conn, profile)
+        return conn
+
+    def acquire(self):
+        """Check out a connection, opening one if below max_size or waiting otherwise."""
+        with self._cond:
+            waited = False
+            while not self._idle and self._open >= self.max_size:
+                if not waited:
+                    self._stats['waits'] += 1
+                    waited = True
+                if not self._cond.wait(self.timeout):
+                    self._stats['timeouts'] += 1
+                    raise sqlite3.OperationalError('Database connection pool exhausted')
+
+            self._in_use += 1
+            if self._idle:
+                self._stats['hits'] += 1
+                return self._idle.pop()
+
+            self._stats['misses'] += 1
+            self._open += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close idle connections (checked-out ones are closed on release)."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                **self._stats,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+            }
+
+
+def get_pool():
+    """Return the process-wide pool, recreating it if DATABASE_PATH changed."""
+    global _pool
+    db_path = get_db_path()
+    with _pool_lock:
+        if _pool is None or _pool.db_path != db_path:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(
+                db_path,
+                max_size=int(_config.get('DB_POOL_SIZE', 10)),
+                timeout=float(_config.get('DB_POOL_TIMEOUT', 5))
+            )
+        return _pool
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def get_db():
+    """Get the connection bound to the current request (or thread) with foreign keys enabled."""
+    if has_app_context():
+        if 'db_conn' not in g:
+            pool = get_pool()
+            g.db_conn = (pool, pool.acquire())
+        return g.db_conn[1]
+
+    if getattr(_local, 'db_conn', None) is None:
+        pool = get_pool()
+        _local.db_conn = (pool, pool.acquire())
+    return _local.db_conn[1]
+
+
+def close_db(e=None):
+    """Return the request's (or thread's) connection to the pool."""
+    if has_app_context():
+        held = g.pop('db_conn', None)
+    else:
+        held = getattr(_local, 'db_conn', None)
+        _local.db_conn = None
+
+    if held is not None:
+        pool, conn = held
+        pool.release(conn)
+
+
+def describe_storage_profile():
+    """Read back the PRAGMA values actually in effect on a pooled connection."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        return {
+            name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ('journal_mode', 'synchronous', 'mmap_size',
+                         'cache_size', 'temp_store', 'busy_timeout')
+        }
+    finally:
+        pool.release(conn)
+
+
+def checkpoint_wal(mode='PASSIVE'):
+    """Fold the WAL back into the main database file; returns (busy, log, checkpointed)."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+    finally:
+        pool.release(conn)
+
+
+def start_checkpoint_worker(interval_seconds):
+    """Run a passive WAL checkpoint every interval_seconds on a daemon thread."""
+    global _checkpoint_thread
+    if interval_seconds <= 0 or get_storage_profile()['journal_mode'].upper() != 'WAL':
+        return None
+    if _checkpoint_thread is not None and _checkpoint_thread.is_alive():
+        return _checkpoint_thread
+
+    def _run():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                busy, log_frames, checkpointed = checkpoint_wal()
+                logger.debug(f"WAL checkpoint: busy={busy} log={log_frames} checkpointed={checkpointed}")
+            except Exception as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+
+    _checkpoint_thread = threading.Thread(target=_run, name='wal-checkpoint', daemon=True)
+    _checkpoint_thread.start()
+    return _checkpoint_thread
+
+
+def init_app(app):
+    """Read DB_* settings from app.config, register per-request connection teardown and the periodic WAL checkpoint."""
+    global _config, _pool
+    with _pool_lock:
+        _config = app.config
+        # A pool opened before this point was sized and tuned from the environment
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+    app.teardown_appcontext(close_db)
+    logger.info(f"SQLite storage profile: {describe_storage_profile()}")
+    start_checkpoint_worker(int(_config.get('DB_CHECKPOINT_INTERVAL', 300)))
+
+
+# PRAGMA user_version that schema.sql stamps; an older database gets migrate_columns first
+SCHEMA_VERSION = 2
+# Columns added to existing tables since the first release: (table, column, declaration)
+ADDED_COLUMNS = (
+    ('slots', 'is_blocked', 'INTEGER DEFAULT 0'),
+    ('appointments', 'updated_at', 'TIMESTAMP'),
+    ('notifications', 'doctor_id', 'INTEGER'),
+    ('notifications', 'related_appointment_id', 'INTEGER'),
+    ('slot_holds', 'appointment_id', 'INTEGER'),
+    ('disease_specialization_mapping', 'description', 'TEXT'),
+)
+
+
+def migrate_columns(conn):
+    """Add the columns an older database lacks, so schema.sql can index them; returns what changed.
+
+    Tables that do not exist yet are skipped (schema.sql creates them whole).
+    Notifications also lose the NOT NULL on user_id, since doctor
+    notifications have none.
+    """
+    changes = []
+    for table, column, declaration in ADDED_COLUMNS:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if columns and column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+            changes.append(f"Added {column} column to {table} table.")
+            if (table, column) == ('appointments', 'updated_at'):
+                conn.execute("UPDATE appointments SET updated_at = created_at WHERE updated_at IS NULL")
+
+    notification_columns = {row[1]: row for row in conn.execute("PRAGMA table_info(notifications)")}
+    if 'appointment_id' in notification_columns:
+        conn.execute(
+            "UPDATE notifications SET related_appointment_id = appointment_id WHERE related_appointment_id IS NULL"
+        )
+    if notification_columns and notification_columns['user_id'][3]:
+        conn.execute("ALTER TABLE notifications RENAME TO notifications_old")
+        conn.execute("""
+            CREATE TABLE notifications (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient_type TEXT CHECK(recipient_type IN ('patient', 'doctor')),
+                user_id INTEGER,
+                doctor_id INTEGER,
+                title TEXT NOT NULL,
+                message TEXT NOT NULL,
+                is_read INTEGER DEFAULT 0,
+                notification_type TEXT DEFAULT 'general',
+                related_appointment_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            INSERT INTO notifications
+            (id, recipient_type, user_id, doctor_id, title, message, is_read,
+             notification_type, related_appointment_id, created_at)
+            SELECT id, recipient_type, user_id, doctor_id, title, message, is_read,
+                   notification_type, related_appointment_id, created_at
+            FROM notifications_old
+        """)
+        conn.execute("DROP TABLE notifications_old")
+        changes.append("Rebuilt notifications table with nullable user_id.")
+    return changes
+
+
 def init_db():
-    """Initialize database from schema file."""
+    """Initialize database from schema file, migrating an older database's columns first."""
     db_path = get_db_path()
     schema_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend', 'schema.sql')
-    
+
     if not os.path.exists(schema_path):
         schema_path = os.path.join(os.path.dirname(__file__), '..', 'schema.sql')
-    
+
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA foreign_keys = ON")
-    
+    apply_storage_profile(conn)
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        for change in migrate_columns(conn):
+            logger.info(change)
+        conn.commit()
+
     with open(schema_path, 'r') as f:
         conn.executescript(f.read())
-    
+
     conn.commit()
     conn.close()
     logger.info(f"Database initialized at {db_path}")
@@ -41,13 +330,10 @@ def init_db():
 def query_db(query, args=(), one=False):
     """Execute a query and return results."""
     conn = get_db()
-    try:
-        cur = conn.execute(query, args)
-        rv = cur.fetchall()
-        conn.commit()
-        return (rv[0] if rv else None) if one else rv
-    finally:
-        conn.close()
+    cur = conn.execute(query, args)
+    rv = cur.fetchall()
+    conn.commit()
+    return (rv[0] if rv else None) if one else rv
 
 
 def execute_db(query, args=()):
@@ -57,5 +343,6 @@ def execute_db(query, args=()):
         cur = conn.execute(query, args)
         conn.commit()
         return cur.lastrowid
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
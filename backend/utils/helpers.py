@@ -32,14 +32,22 @@ def error_response(message, status_code=400, errors=None):
     return jsonify(response), status_code
 
 
-def success_response(data=None, message='Success', status_code=200):
-    """Standardized success response."""
+_NOT_PAGINATED = object()
+
+
+def success_response(data=None, message='Success', status_code=200, next_cursor=_NOT_PAGINATED):
+    """Standardized success response.
+
+    Paginated lists pass next_cursor; it is null on the last page.
+    """
     response = {
         'success': True,
         'message': message
     }
     if data is not None:
         response['data'] = _serialize(data)
+    if next_cursor is not _NOT_PAGINATED:
+        response['next_cursor'] = next_cursor
     return jsonify(response), status_code
 
 
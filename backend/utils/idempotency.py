@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from flask import request, session, make_response
+from backend.utils.database import get_db, get_pool
+from backend.utils.helpers import error_response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+WAIT_SECONDS = 30
+
+
+class IdempotencyStore:
+    """Completed responses keyed by (caller, method, route, Idempotency-Key), in SQLite.
+
+    Rows live in the idempotency_keys table, so a retry routed to another
+    worker process still finds the first attempt. A claim is an INSERT ...
+    ON CONFLICT DO NOTHING, so exactly one process runs the request. The
+    claimed row has no status while the request runs, and concurrent
+    retries poll it until the response is stored. An unfinished claim
+    expires after in_flight_seconds, so a worker that died mid-request does
+    not lock the key for good. Expired rows are purged at most every
+    purge_interval seconds (by the expires_at index), and the oldest go
+    first once the table passes max_entries.
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=10000, in_flight_seconds=60, purge_interval=60):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.in_flight_seconds = in_flight_seconds
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+        self._stats = {'stored': 0, 'replayed': 0, 'conflicts': 0, 'evicted': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def _execute(fn):
+        """Run fn(conn) on a pooled connection of its own, outside the handler's transaction."""
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            result = fn(conn)
+            conn.commit()
+            return result
+        finally:
+            pool.release(conn)
+
+    def _purge(self, conn, now):
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        evicted = conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM idempotency_keys').fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted += conn.execute(
+                '''DELETE FROM idempotency_keys WHERE rowid IN (
+                       SELECT rowid FROM idempotency_keys ORDER BY expires_at LIMIT ?)''',
+                (excess,)
+            ).rowcount
+        if evicted:
+            self._count('evicted', evicted)
+
+    def claim(self, scope, fingerprint):
+        """Return ('replay', (status, body)), ('conflict', None), ('wait', None) or ('run', None)."""
+        def _claim(conn):
+            now = time.time()
+            self._purge(conn, now)
+            conn.execute(
+                '''DELETE FROM idempotency_keys
+                   WHERE caller = ? AND method = ? AND path = ? AND idem_key = ? AND expires_at <= ?''',
+                (*scope, now)
+            )
+            claimed = conn.execute(
+                '''INSERT INTO idempotency_keys (caller, method, path, idem_key, fingerprint, expires_at)
+                   VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING''',
+                (*scope, fingerprint, now + self.in_flight_seconds)
+            ).rowcount
+            if claimed:
+                return 'run', None
+            return 'existing', conn.execute(
+                '''SELECT fingerprint, status, response FROM idempotency_keys
+                   WHERE caller = ? AND method = ? AND path = ? AND idem_key = ?''',
+                scope
+            ).fetchone()
+
+        outcome, row = self._execute(_claim)
+        if outcome == 'run':
+            return 'run', None
+        if row is None:
+            # Released between our insert and our read: treat as still running and poll again
+            return 'wait', None
+        if row['fingerprint'] != fingerprint:
+            self._count('conflicts')
+            return 'conflict', None
+        if row['status'] is None:
+            return 'wait', None
+        self._count('replayed')
+        return 'replay', (row['status'], row['response'])
+
+    def complete(self, scope, fingerprint, status, body):
+        self._execute(lambda conn: conn.execute(
+            '''UPDATE idempotency_keys SET status = ?, response = ?, expires_at = ?
+               WHERE caller = ? AND method = ? AND path = ? AND idem_key = ? AND fingerprint = ?''',
+            (status, body, time.time() + self.ttl_seconds, *scope, fingerprint)
+        ))
+        self._count('stored')
+
+    def abandon(self, scope):
+        """Forget an attempt that failed with a server error so the client may retry it."""
+        self._execute(lambda conn: conn.execute(
+            '''DELETE FROM idempotency_keys
+               WHERE caller = ? AND method = ? AND path = ? AND idem_key = ? AND status IS NULL''',
+            scope
+        ))
+
+    def stats(self):
+        entries, in_flight = self._execute(lambda conn: conn.execute(
+            'SELECT COUNT(*), COUNT(*) - COUNT(status) FROM idempotency_keys WHERE expires_at > ?', (time.time(),)
+        ).fetchone())
+        with self._lock:
+            return {**self._stats, 'entries': entries, 'in_flight': in_flight}
+
+
+def _store_from_config(config):
+    return IdempotencyStore(
+        ttl_seconds=int(config.get('IDEMPOTENCY_TTL_SECONDS', 86400)),
+        max_entries=int(config.get('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    )
+
+
+# Built from the environment until the app calls configure_idempotency
+_store = _store_from_config(os.environ)
+
+
+def configure_idempotency(config):
+    """Rebuild the process-wide store from app config; stored responses live in SQLite and carry over."""
+    global _store
+    _store = _store_from_config(config)
+    return _store
+
+
+def get_idempotency_stats():
+    return _store.stats()
+
+
+def _replay(entry):
+    status, body = entry
+    response = make_response(body, status)
+    response.mimetype = 'application/json'
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(f):
+    """Decorator honouring the Idempotency-Key header on a state-changing route.
+
+    Apply it below the auth decorator. A retry with the same key, caller and
+    body gets the first response back without the handler running again; the
+    same key with a different body is rejected with 422.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return error_response(f'{IDEMPOTENCY_HEADER} must be at most 255 characters')
+
+        caller_id = session.get('user_id') or session.get('doctor_id') or session.get('admin_id')
+        scope = (f"{session.get('role')}:{caller_id}", request.method, request.path, key)
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        # A retry of a request still running (in any worker) waits for its response
+        outcome, value = _store.claim(scope, fingerprint)
+        deadline = time.monotonic() + WAIT_SECONDS
+        while outcome == 'wait' and time.monotonic() < deadline:
+            time.sleep(0.1)
+            outcome, value = _store.claim(scope, fingerprint)
+        if outcome == 'wait':
+            return error_response('A request with this Idempotency-Key is still in progress', 409)
+        if outcome == 'replay':
+            return _replay(value)
+        if outcome == 'conflict':
+            return error_response(f'{IDEMPOTENCY_HEADER} was already used with a different request', 422)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            # Drop any write lock the failed handler still holds before the store writes
+            get_db().rollback()
+            _store.abandon(scope)
+            raise
+
+        if response.status_code >= 500:
+            get_db().rollback()
+            _store.abandon(scope)
+        else:
+            _store.complete(scope, fingerprint, response.status_code, response.get_data())
+        return response
+    return decorated_function
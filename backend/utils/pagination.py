@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Opaque cursor for the sort key of the last row on a page."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or not all(isinstance(v, (str, int, float)) for v in values):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_args():
+    """Read ?limit=&cursor= from the request: (limit, cursor values or None, error message or None)."""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1 or limit > MAX_PAGE_SIZE:
+        return None, None, f'Limit must be between 1 and {MAX_PAGE_SIZE}'
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return limit, None, None
+    try:
+        return limit, tuple(decode_cursor(cursor)), None
+    except ValueError as e:
+        return None, None, str(e)
+
+
+def keyset(columns, cursor):
+    """SQL condition and params selecting rows after `cursor` in ORDER BY <columns> DESC.
+
+    Every list sorts descending on its key, with a unique column last, so the
+    keyset is one row-value comparison that SQLite can answer from an index.
+    """
+    if cursor is None:
+        return '1 = 1', []
+    if len(cursor) != len(columns):
+        raise ValueError('Invalid cursor')
+    placeholders = ', '.join('?' * len(columns))
+    return f"({', '.join(columns)}) < ({placeholders})", list(cursor)
+
+
+def order_by(columns):
+    return 'ORDER BY ' + ', '.join(f'{column} DESC' for column in columns)
+
+
+def paginate(rows, limit, key):
+    """Split limit + 1 fetched rows into (page, next_cursor); next_cursor is None on the last page."""
+    rows = [dict(row) for row in rows]
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
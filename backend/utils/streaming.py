@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+from datetime import date
+from flask import Response, stream_with_context
+from backend.utils.database import get_db
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+BATCH_SIZE = 500
+
+
+def _json_chunks(cursor, columns):
+    """The success_response envelope, with data written one fetchmany() batch at a time."""
+    yield '{"success":true,"message":"Success","data":['
+    first = True
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        chunk = ','.join(json.dumps(dict(zip(columns, row)), separators=(',', ':')) for row in rows)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']}'
+
+
+def _ndjson_chunks(cursor, columns):
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield ''.join(json.dumps(dict(zip(columns, row)), separators=(',', ':')) + '\n' for row in rows)
+
+
+def _csv_chunks(cursor, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    while True:
+        rows = cursor.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+_CHUNKERS = {'json': _json_chunks, 'ndjson': _ndjson_chunks, 'csv': _csv_chunks}
+
+
+def stream_query(query, args=(), fmt='json', filename=None):
+    """Stream a query's rows as a JSON envelope, NDJSON or CSV.
+
+    The query runs on the request's pooled connection once the response
+    starts, and rows are encoded BATCH_SIZE at a time, so memory stays flat
+    however many rows there are. Errors after the first chunk cannot change
+    the status code; they end the stream early.
+    """
+    if fmt not in _CHUNKERS:
+        raise ValueError(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    def generate():
+        cursor = get_db().execute(query, args)
+        try:
+            columns = [column[0] for column in cursor.description]
+            yield from _CHUNKERS[fmt](cursor, columns)
+        finally:
+            cursor.close()
+            get_db().commit()
+
+    headers = {'X-Accel-Buffering': 'no'}
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename="{filename}-{date.today():%Y%m%d}.{fmt}"'
+    return Response(stream_with_context(generate()), content_type=EXPORT_FORMATS[fmt], headers=headers)
+
+
+def sse_event(event, data):
+    """One Server-Sent Events frame with JSON-encoded data."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_response(events):
+    """Stream (event, data) pairs as Server-Sent Events, data JSON-encoded.
+
+    Each event is flushed as soon as the generator yields it; the
+    generator runs inside the request context and is closed if the client
+    disconnects.
+    """
+    def generate():
+        for event, data in events:
+            yield sse_event(event, data)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), content_type='text/event-stream', headers=headers)
@@ -0,0 +1,192 @@
+"""
+MedSync AI – async chat server.
+
+Serves the chatbot's message endpoints on asyncio, beside the Flask app:
+  POST /api/chatbot/message          same request/response as the blueprint
+  POST /api/chatbot/message/stream   same Server-Sent Events as the blueprint
+  GET  /api/health                   in-flight turns, DB thread pool, LLM client
+
+A chat turn spends seconds waiting on OpenRouter; here that wait is a
+suspended coroutine instead of a Flask worker thread, so one process holds
+thousands of turns and the Flask workers stay free for everything else.
+It shares app.py's config, database and login cookie; app.py still owns
+the schema and the background workers, so run both and route the two
+message paths to this server from the reverse proxy.
+
+Usage: python chat_server.py [--host 127.0.0.1] [--port 5001]
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import timedelta
+
+from aiohttp import web
+from flask import Flask
+from itsdangerous import BadSignature
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.config import get_config
+from backend.utils.cache import configure_cache
+from backend.utils.database import init_app as init_db_app, get_pool_stats
+from backend.utils.streaming import sse_event
+from backend.services.async_chat_service import AsyncChatService
+from backend.services.async_llm_client import AsyncLLMClient
+from backend.services.chatbot_service import ChatbotService
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SERVICE_KEY = web.AppKey('chat_service', AsyncChatService)
+
+
+def create_flask_app():
+    """The Flask app the chat server borrows config, DB teardown and session signing from."""
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    # Must match create_app so login cookies validate the same way
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
+    init_db_app(app)
+    configure_cache(app.config)
+    return app
+
+
+def _json(data, status=200):
+    return web.json_response(data, status=status)
+
+
+def _error(message, status=400):
+    return _json({'success': False, 'message': message}, status)
+
+
+def _patient_id(request, flask_app):
+    """The logged-in patient's user id from the Flask session cookie, or None (as patient_required)."""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return None
+    try:
+        session = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    if 'user_id' not in session or session.get('role') != 'patient':
+        return None
+    return session['user_id']
+
+
+async def _chat_request(request):
+    """(user_id, session_id, message, error response) for a chat message request."""
+    flask_app = request.app[SERVICE_KEY].app
+    user_id = _patient_id(request, flask_app)
+    if user_id is None:
+        return None, None, None, _error('Patient access required', 403)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not str(data.get('message', '')).strip():
+        return None, None, None, _error('Message required')
+
+    session_id = data.get('session_id') or \
+        await request.app[SERVICE_KEY].run_db(ChatbotService.get_or_create_session, user_id)
+    return user_id, session_id, data['message'].strip(), None
+
+
+async def send_message(request):
+    """Send a message to the AI chatbot."""
+    service = request.app[SERVICE_KEY]
+    user_id, session_id, message, error = await _chat_request(request)
+    if error:
+        return error
+
+    response, parsed_data, ai_error = await service.process_message(user_id, session_id, message)
+    result = await service.run_db(ChatbotService.build_result, session_id, response, parsed_data, ai_error)
+    return _json({'success': True, 'message': 'Success', 'data': result})
+
+
+async def stream_message(request):
+    """Send a message to the AI chatbot and stream the reply as Server-Sent Events."""
+    service = request.app[SERVICE_KEY]
+    user_id, session_id, message, error = await _chat_request(request)
+    if error:
+        return error
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+
+    async def send(event, data):
+        await response.write(sse_event(event, data).encode())
+
+    events = service.stream_message(user_id, session_id, message)
+    try:
+        await send('session', {'session_id': session_id})
+        recommended = None
+        async for event, payload in events:
+            if event == 'done':
+                result = await service.run_db(ChatbotService.build_result, session_id, payload['response'],
+                                              payload['parsed_data'], payload['ai_error'])
+                await send('done', result)
+                continue
+            if event == 'recommendation':
+                spec = payload['specialization']
+            elif event == 'analysis':
+                await send(event, payload)
+                spec = payload.get('recommended_specialization', '')
+            else:
+                await send(event, payload)
+                continue
+            if spec and spec != recommended:
+                recommended = spec
+                doctors = await service.run_db(ChatbotService.recommend_doctors, spec)
+                await send('doctors', {'recommended_specialization': spec, 'recommended_doctors': doctors})
+    except ConnectionResetError:
+        logger.info("Chat stream client disconnected")
+    finally:
+        # Saves the partial reply if the client left early
+        await events.aclose()
+    return response
+
+
+async def health(request):
+    return _json({
+        'status': 'healthy',
+        'app': 'MedSync AI chat server',
+        'db_pool': get_pool_stats(),
+        'async_chat': request.app[SERVICE_KEY].stats()
+    })
+
+
+def create_chat_server(flask_app=None, client=None):
+    """aiohttp application serving the chat endpoints."""
+    flask_app = flask_app or create_flask_app()
+    client = client or AsyncLLMClient.from_config(flask_app.config)
+    service = AsyncChatService(flask_app, client, db_workers=flask_app.config['ASYNC_CHAT_DB_WORKERS'])
+
+    server = web.Application()
+    server[SERVICE_KEY] = service
+    server.router.add_post('/api/chatbot/message', send_message)
+    server.router.add_post('/api/chatbot/message/stream', stream_message)
+    server.router.add_get('/api/health', health)
+
+    async def close_service(_):
+        await service.close()
+
+    server.on_cleanup.append(close_service)
+    return server
+
+
+if __name__ == '__main__':
+    flask_app = create_flask_app()
+    parser = argparse.ArgumentParser(description='MedSync AI async chat server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=flask_app.config['ASYNC_CHAT_PORT'])
+    args = parser.parse_args()
+    web.run_app(create_chat_server(flask_app), host=args.host, port=args.port)
@@ -0,0 +1,111 @@
+"""
+Admin export benchmark: buffered jsonify vs. streamed JSON/NDJSON/CSV.
+
+Builds a scratch database with many patients and chat messages, then
+exports them through the Flask app:
+  - buffered: the list-endpoint path (query_db -> dict(row) -> _serialize ->
+              jsonify), which holds every row and the whole body in memory
+  - streamed: GET /api/admin/export/<kind>?format=..., consumed chunk by chunk
+
+For each it reports wall time, time to first byte, body size and the peak
+Python heap (tracemalloc) while producing the response.
+
+Usage: python debug/benchmark_admin_export.py [--patients 100000] [--messages 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _seed(conn, patients, messages):
+    conn.executemany(
+        '''INSERT INTO users (patient_id, full_name, email, phone, password_hash, is_verified)
+           VALUES (?, ?, ?, ?, 'x', 1)''',
+        ((f'PAT-E{i:07d}', f'Export Patient {i}', f'export{i}@medsync.com', f'+1-555-{i % 10000:04d}')
+         for i in range(patients))
+    )
+    conn.executemany(
+        '''INSERT INTO chat_history (user_id, session_id, role, message)
+           VALUES (?, ?, ?, ?)''',
+        ((i % patients + 1, f'sess-{i // 20}', 'user' if i % 2 == 0 else 'assistant',
+          f'Message {i}: I have had a mild headache and some dizziness since yesterday evening.')
+         for i in range(messages))
+    )
+    conn.commit()
+
+
+def _measure(produce):
+    """(seconds, first-byte seconds, bytes, peak MiB) for a callable yielding body chunks."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in produce():
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, first_byte or elapsed, size, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--messages', type=int, default=200000)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-export-'), 'export.db')
+    from app import create_app
+    from backend.services.admin_service import AdminService
+    from backend.utils.database import get_db, query_db
+    from backend.utils.helpers import success_response
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        _seed(get_db(), args.patients, args.messages)
+        print(f"Seeded {args.patients:,} patients and {args.messages:,} chat messages "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['admin_id'] = 1
+        sess['role'] = 'admin'
+
+    def buffered(kind):
+        def produce():
+            with app.test_request_context():
+                rows = query_db(AdminService.EXPORT_QUERIES[kind])
+                response, _ = success_response([dict(row) for row in rows])
+                yield response.get_data()
+        return produce
+
+    def streamed(kind, fmt):
+        def produce():
+            response = client.get(f'/api/admin/export/{kind}?format={fmt}', buffered=False)
+            try:
+                yield from response.response
+            finally:
+                response.close()
+        return produce
+
+    print(f"\n{'export':<26}{'total s':>9}{'TTFB ms':>10}{'MiB out':>9}{'peak MiB':>10}")
+    for kind in ('patients', 'chat-logs'):
+        runs = [('buffered json', buffered(kind))]
+        runs += [(f'streamed {fmt}', streamed(kind, fmt)) for fmt in ('json', 'ndjson', 'csv')]
+        for label, produce in runs:
+            elapsed, first_byte, size, peak = _measure(produce)
+            print(f"{kind + ' ' + label:<26}{elapsed:>9.2f}{first_byte * 1000:>10.1f}"
+                  f"{size / 2 ** 20:>9.1f}{peak:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
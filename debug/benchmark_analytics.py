@@ -0,0 +1,207 @@
+"""
+Appointment analytics benchmark and rollup consistency check.
+
+Builds a scratch database with doctors on a weekday schedule and a year of
+appointments in every status, backfills appointment_rollups, then:
+  - compares an ad-hoc GROUP BY over appointments JOIN slots (counts only,
+    no capacity) with AnalyticsService.get_metrics over the same ranges
+  - measures the cost of one rollup refresh, the work added to each write
+  - drives random bookings, cancellations, emergency cancels, status changes
+    and slot blocks through the services, rebuilds every rollup row from
+    scratch and fails (exit code 1) unless the incremental rows match
+
+Usage: python debug/benchmark_analytics.py [--doctors 200] [--fill 0.6]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SPECIALIZATIONS = ['Cardiology', 'Neurology', 'Dermatology', 'Orthopedics', 'Pediatrics',
+                   'Psychiatry', 'Oncology', 'Gastroenterology', 'Pulmonology', 'Endocrinology']
+STATUSES = ['completed'] * 6 + ['cancelled'] * 2 + ['emergency_cancelled', 'scheduled', 'rescheduled', 'otp_pending']
+TIMES = [f'{9 + i // 2:02d}:{i % 2 * 30:02d}' for i in range(17)]   # 09:00 .. 17:00
+
+ADHOC_QUERY = '''
+    SELECT d.specialization, s.slot_date, COUNT(*) AS booked,
+           SUM(a.status = 'completed'), SUM(a.status = 'cancelled'), SUM(a.status = 'emergency_cancelled')
+    FROM appointments a
+    JOIN slots s ON s.id = a.slot_id
+    JOIN doctors d ON d.id = a.doctor_id
+    WHERE s.slot_date BETWEEN ? AND ?
+    GROUP BY d.specialization, s.slot_date'''
+
+
+def _seed(conn, rng, doctors, patients, first_day, days, fill):
+    conn.executemany(
+        '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+           VALUES (?, ?, ?, 'x', 1)''',
+        ((f'PAT-A{i:07d}', f'Analytics Patient {i}', f'analytics{i}@medsync.com') for i in range(patients))
+    )
+    conn.executemany(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+           VALUES (?, ?, ?, 'x', ?, 1)''',
+        ((f'DOC-A{i:05d}', f'Dr. Analytics {i}', f'analytics.doc{i}@medsync.com', SPECIALIZATIONS[i % 10])
+         for i in range(doctors))
+    )
+    conn.executemany(
+        '''INSERT INTO doctor_availability_rules (doctor_id, weekday, start_time, end_time, slot_duration_minutes)
+           VALUES (?, ?, '09:00', '17:00', 30)''',
+        ((doctor_id, weekday) for doctor_id in range(1, doctors + 1) for weekday in range(5))
+    )
+    slot_rows, appointment_rows = [], []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        for doctor_id in range(1, doctors + 1):
+            for start, end in zip(TIMES, TIMES[1:]):
+                if rng.random() < fill:
+                    status = rng.choice(STATUSES)
+                    slot_rows.append((doctor_id, day.isoformat(), start, end,
+                                      int(status not in ('cancelled', 'emergency_cancelled'))))
+                    appointment_rows.append((f'APT-A{len(appointment_rows):08d}', rng.randrange(patients) + 1,
+                                             doctor_id, len(appointment_rows) + 1, status))
+    conn.executemany(
+        'INSERT INTO slots (doctor_id, slot_date, start_time, end_time, is_booked) VALUES (?, ?, ?, ?, ?)',
+        slot_rows
+    )
+    conn.executemany(
+        '''INSERT INTO appointments (appointment_id, patient_id, doctor_id, slot_id, status)
+           VALUES (?, ?, ?, ?, ?)''',
+        appointment_rows
+    )
+    conn.commit()
+    return len(appointment_rows)
+
+
+def _churn(rng, operations, doctors, patients):
+    """Random writes through every service path that refreshes the rollups."""
+    from backend.services.appointment_service import AppointmentService
+    from backend.utils.database import query_db
+
+    today = date.today()
+    counts = {}
+    for _ in range(operations):
+        op = rng.random()
+        doctor_id = rng.randrange(doctors) + 1
+        day = (today + timedelta(days=rng.randrange(-20, 40))).isoformat()
+        if op < 0.35:
+            _, err = AppointmentService.book_appointment(
+                rng.randrange(patients) + 1, doctor_id, slot_date=day, start_time=rng.choice(TIMES[:-1])
+            )
+            name = 'book'
+        elif op < 0.9:
+            apt = query_db(
+                f'''SELECT a.id, a.doctor_id FROM appointments a JOIN slots s ON s.id = a.slot_id
+                    WHERE a.doctor_id = ? AND s.slot_date = ?
+                    {"AND a.status = 'scheduled'" if op < 0.65 else ''} LIMIT 1''',
+                (doctor_id, day), one=True
+            )
+            if not apt:
+                continue
+            if op < 0.55:
+                _, err = AppointmentService.cancel_appointment(apt['id'])
+                name = 'cancel'
+            elif op < 0.65:
+                _, _, err = AppointmentService.emergency_cancel(apt['id'], apt['doctor_id'])
+                name = 'emergency cancel'
+            else:
+                _, err = AppointmentService.update_appointment_status(apt['id'], rng.choice(STATUSES))
+                name = 'status change'
+        else:
+            _, err = AppointmentService.block_slot(doctor_id, day, rng.choice(TIMES[:-1]))
+            name = 'block'
+        counts[name] = counts.get(name, 0) + (err is None)
+    return counts
+
+
+def _time(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--fill', type=float, default=0.6, help='share of rule slots that got an appointment')
+    parser.add_argument('--churn', type=int, default=3000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-analytics-'), 'analytics.db')
+    from app import create_app
+    from backend.services.analytics_service import AnalyticsService
+    from backend.utils.database import get_db, query_db
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    first_day = today - timedelta(days=300)
+    app = create_app()
+    with app.app_context():
+        conn = get_db()
+        started = time.perf_counter()
+        appointments = _seed(conn, rng, args.doctors, args.patients, first_day, 365, args.fill)
+        print(f"Seeded {args.doctors:,} doctors and {appointments:,} appointments over 365 days "
+              f"in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        cells = AnalyticsService.backfill()
+        print(f"Backfilled {cells:,} doctor-day rollups in {time.perf_counter() - started:.1f}s")
+
+        print(f"\n{'range':<24}{'ad-hoc join ms':>16}{'rollups ms':>12}{'speedup':>9}")
+        for label, days, bucket, group_by in (('7 days, daily', 7, 'day', 'specialization'),
+                                              ('30 days, daily', 30, 'day', 'specialization'),
+                                              ('365 days, weekly', 365, 'week', 'specialization'),
+                                              ('90 days, weekly/doctor', 90, 'week', 'doctor')):
+            start, end = (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+            adhoc_ms = _time(lambda: query_db(ADHOC_QUERY, (start, end)), args.runs)
+            _, err = AnalyticsService.get_metrics(start, end, bucket, group_by)
+            if err:
+                sys.exit(f"{label}: {err}")
+            rollup_ms = _time(lambda: AnalyticsService.get_metrics(start, end, bucket, group_by), args.runs)
+            print(f"{label:<24}{adhoc_ms:>16.1f}{rollup_ms:>12.1f}{adhoc_ms / rollup_ms:>8.1f}x")
+
+        refresh_ms = _time(lambda: AnalyticsService.refresh(conn, 1, [today.isoformat()]), args.runs * 20)
+        conn.commit()
+        print(f"\nrollup refresh per write (one doctor-day): {refresh_ms:.2f} ms")
+
+        started = time.perf_counter()
+        done = _churn(rng, args.churn, args.doctors, args.patients)
+        print(f"churn: {args.churn:,} operations in {time.perf_counter() - started:.1f}s "
+              f"({', '.join(f'{count} {name}' for name, count in sorted(done.items()))} succeeded)")
+
+        incremental = {tuple(row) for row in conn.execute('SELECT * FROM appointment_rollups')}
+        cells = conn.execute('SELECT doctor_id, day AS slot_date FROM appointment_rollups').fetchall()
+        conn.execute('DELETE FROM appointment_rollups')
+        AnalyticsService._refresh_pairs(conn, cells)
+        rebuilt = {tuple(row) for row in conn.execute('SELECT * FROM appointment_rollups')}
+        conn.rollback()
+        missing = conn.execute(
+            '''SELECT COUNT(*) FROM (SELECT DISTINCT s.doctor_id, s.slot_date
+                                     FROM appointments a JOIN slots s ON s.id = a.slot_id) cell
+               WHERE NOT EXISTS (SELECT 1 FROM appointment_rollups r
+                                 WHERE r.doctor_id = cell.doctor_id AND r.day = cell.slot_date)'''
+        ).fetchone()[0]
+
+    if incremental != rebuilt or missing:
+        print(f"MISMATCH: {len(incremental ^ rebuilt)} differing rows, {missing} appointment days without a rollup")
+        for row in sorted(incremental ^ rebuilt)[:10]:
+            print(f"  {'incremental' if row in incremental else 'rebuilt    '} {row}")
+        sys.exit(1)
+    print(f"All {len(incremental):,} rollup rows match a rebuild from the base tables.")
+
+
+if __name__ == '__main__':
+    main()
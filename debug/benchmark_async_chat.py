@@ -0,0 +1,192 @@
+"""
+Async chat server benchmark: chat turns on Flask worker threads vs. chat_server.py.
+
+Builds a scratch database and a local mock of the OpenRouter API that takes
+--think-ms to answer, then:
+  - sync:  --turns concurrent chat turns go to the Flask app served by a
+           fixed pool of --workers threads (as gunicorn --threads would),
+           while a probe keeps calling /api/doctors/search on the same app
+  - async: the same turns go to the aiohttp chat server instead, with the
+           same probe on the Flask app
+  - scale: --scale-turns concurrent turns on the chat server alone
+
+Reports turn latency, probe latency (how long doctor search waits for a free
+worker) and, for the async server, peak turns in flight and the threads the
+process needed.
+
+Usage: python debug/benchmark_async_chat.py [--turns 200] [--workers 16] [--scale-turns 2000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from aiohttp import web
+from werkzeug.serving import BaseWSGIServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+REPLY = "That sounds like a tension headache. Rest and drink water. [[RECOMMEND: Neurology]]"
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """The Flask app on a fixed pool of worker threads, like gunicorn --threads N."""
+
+    def __init__(self, app, workers):
+        super().__init__('127.0.0.1', 0, app)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _start_mock(think_ms):
+    """Mock OpenRouter on its own event loop thread: (base_url, stop)."""
+    async def complete(request):
+        body = await request.json()
+        await asyncio.sleep(think_ms / 1000)
+        return web.json_response({'model': body['model'],
+                                  'choices': [{'message': {'role': 'assistant', 'content': REPLY}}]})
+
+    loop = asyncio.new_event_loop()
+    mock = web.Application()
+    mock.router.add_post('/api/v1/chat/completions', complete)
+    runner = web.AppRunner(mock, access_log=None)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0, backlog=4096)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    return f'http://127.0.0.1:{port}/api/v1', stop
+
+
+async def _turn(session, url, cookie, i):
+    started = time.perf_counter()
+    async with session.post(f'{url}/api/chatbot/message', cookies={'session': cookie},
+                            json={'message': f'I have a headache ({i})', 'session_id': f'sess-bench{i % 50}'}) as r:
+        ok = r.status == 200 and (await r.json())['success']
+    return (time.perf_counter() - started) * 1000, ok
+
+
+async def _probe(session, url, stop):
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with session.get(f'{url}/api/doctors/search?q=cardio') as r:
+            await r.read()
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.05)
+    return samples
+
+
+async def _load(chat_url, flask_url, cookie, turns, probe=True):
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=600)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        stop = asyncio.Event()
+        prober = asyncio.create_task(_probe(session, flask_url, stop)) if probe else None
+        started = time.perf_counter()
+        results = await asyncio.gather(*(_turn(session, chat_url, cookie, i) for i in range(turns)))
+        wall = time.perf_counter() - started
+        stop.set()
+        probes = await prober if prober else []
+    latencies = sorted(ms for ms, _ in results)
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'wall': wall,
+        'failed': sum(not ok for _, ok in results),
+        'probe_p50': statistics.median(probes) if probes else 0,
+        'probe_max': max(probes) if probes else 0,
+    }
+
+
+def _row(label, result):
+    print(f"{label:<28}{result['p50']:>9.0f}{result['p99']:>9.0f}{result['wall']:>8.1f}"
+          f"{result['failed']:>8}{result['probe_p50']:>12.1f}{result['probe_max']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16, help='Flask worker threads')
+    parser.add_argument('--scale-turns', type=int, default=2000)
+    parser.add_argument('--think-ms', type=float, default=2000, help='simulated model time per completion')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-async-chat-'), 'chat.db')
+    from app import create_app
+    from chat_server import SERVICE_KEY, create_chat_server, create_flask_app
+    from backend.services.async_llm_client import AsyncLLMClient
+    from backend.services.llm_client import configure_llm_client
+    from backend.utils.database import execute_db
+
+    base_url, stop_mock = _start_mock(args.think_ms)
+    app = create_app()
+    logging.disable(logging.WARNING)
+    settings = {'OPENROUTER_API_KEY': 'mock-key', 'OPENROUTER_BASE_URL': base_url, 'LLM_RETRY_DELAY': 0,
+                'LLM_POOL_SIZE': args.workers}
+    configure_llm_client(settings)
+    with app.app_context():
+        user_id = execute_db(
+            '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+               VALUES ('PAT-BENCH', 'Bench Patient', 'bench@medsync.com', 'x', 1)'''
+        )
+    cookie = app.session_interface.get_signing_serializer(app).dumps({'user_id': user_id, 'role': 'patient'})
+
+    flask_server = _PooledWSGIServer(app, args.workers)
+    threading.Thread(target=flask_server.serve_forever, daemon=True).start()
+    flask_url = f'http://127.0.0.1:{flask_server.server_port}'
+
+    async def run():
+        chat_app = create_chat_server(create_flask_app(), AsyncLLMClient.from_config(settings))
+        runner = web.AppRunner(chat_app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, backlog=4096)
+        await site.start()
+        chat_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        service = chat_app[SERVICE_KEY]
+
+        print(f"mock model answers in {args.think_ms:g} ms; Flask on {args.workers} worker threads, "
+              f"chat server with {service.client.pool_size} LLM connections")
+        print(f"\n{'':<28}{'turn p50':>9}{'p99 ms':>9}{'wall s':>8}{'failed':>8}"
+              f"{'search p50':>12}{'search max':>12}")
+        _row(f'sync: {args.turns} turns on Flask', await _load(flask_url, flask_url, cookie, args.turns))
+        _row(f'async: {args.turns} turns on chat srv', await _load(chat_url, flask_url, cookie, args.turns))
+
+        threads_before = threading.active_count()
+        result = await _load(chat_url, flask_url, cookie, args.scale_turns, probe=False)
+        stats = service.stats()
+        print(f"\nscale: {args.scale_turns} concurrent turns on the chat server: p50 {result['p50']:.0f} ms, "
+              f"p99 {result['p99']:.0f} ms, {result['wall']:.1f}s wall, {result['failed']} failed")
+        print(f"  peak turns in flight {stats['peak_in_flight']}, process threads {threads_before} "
+              f"before -> {threading.active_count()} after ({stats['db_workers']} DB workers)")
+        await runner.cleanup()
+
+    asyncio.run(run())
+    flask_server.shutdown()
+    stop_mock()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Admin dashboard stats benchmark and counter consistency check.
+
+Builds a scratch database with many patients, doctors and appointments
+(the counter triggers maintain dashboard_stats, appointment_status_counts
+and specialization_load as rows go in), then:
+  - compares the old four COUNT(*) queries with AdminService.get_dashboard_stats
+  - measures appointment insert throughput with and without the triggers
+  - applies a random mix of status changes, verifications, specialization
+    changes and deletes, and fails (exit code 1) unless every counter equals
+    a fresh recount
+
+Usage: python debug/benchmark_dashboard_stats.py [--patients 200000] [--appointments 500000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SPECIALIZATIONS = ['Cardiology', 'Neurology', 'Dermatology', 'Orthopedics', 'Pediatrics',
+                   'Psychiatry', 'Oncology', 'Gastroenterology', 'Pulmonology', 'Endocrinology']
+STATUSES = ['scheduled', 'completed', 'cancelled', 'emergency_cancelled', 'rescheduled', 'otp_pending']
+ACTIVE = ('scheduled', 'rescheduled', 'otp_pending')
+
+OLD_QUERIES = [
+    'SELECT COUNT(*) as c FROM users WHERE role="patient"',
+    'SELECT COUNT(*) as c FROM doctors',
+    'SELECT COUNT(*) as c FROM doctors WHERE verified=0',
+    'SELECT COUNT(*) as c FROM appointments',
+]
+
+
+def _seed(conn, rng, patients, doctors, appointments):
+    conn.executemany(
+        '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+           VALUES (?, ?, ?, 'x', 1)''',
+        ((f'PAT-S{i:07d}', f'Stats Patient {i}', f'stats{i}@medsync.com') for i in range(patients))
+    )
+    conn.executemany(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+           VALUES (?, ?, ?, 'x', ?, ?)''',
+        ((f'DOC-S{i:05d}', f'Dr. Stats {i}', f'stats.doc{i}@medsync.com', rng.choice(SPECIALIZATIONS),
+          int(rng.random() < 0.9)) for i in range(doctors))
+    )
+    first_day = date(2026, 1, 1)
+    conn.executemany(
+        '''INSERT INTO slots (doctor_id, slot_date, start_time, end_time, is_booked)
+           VALUES (?, ?, ?, ?, 1)''',
+        ((i % doctors + 1, (first_day + timedelta(days=i // doctors // 20)).isoformat(),
+          f'{8 + i // doctors % 20 // 2:02d}:{i // doctors % 2 * 30:02d}',
+          f'{8 + i // doctors % 20 // 2:02d}:{i // doctors % 2 * 30 + 29:02d}') for i in range(appointments))
+    )
+    conn.commit()
+
+
+def _insert_appointments(conn, rng, start, count, doctors, patients):
+    rows = [(f'APT-S{start + i:08d}', rng.randrange(patients) + 1, (start + i) % doctors + 1, start + i + 1,
+             rng.choice(STATUSES)) for i in range(count)]
+    started = time.perf_counter()
+    conn.executemany(
+        '''INSERT INTO appointments (appointment_id, patient_id, doctor_id, slot_id, status)
+           VALUES (?, ?, ?, ?, ?)''',
+        rows
+    )
+    conn.commit()
+    return count / (time.perf_counter() - started)
+
+
+def _recount(conn):
+    stats = conn.execute(
+        '''SELECT (SELECT COUNT(*) FROM users WHERE role = 'patient'), (SELECT COUNT(*) FROM doctors),
+                  (SELECT COUNT(*) FROM doctors WHERE verified = 0), (SELECT COUNT(*) FROM appointments)'''
+    ).fetchone()
+    by_status = dict(conn.execute('SELECT status, COUNT(*) FROM appointments GROUP BY status').fetchall())
+    load = {row[0]: tuple(row[1:]) for row in conn.execute(
+        f'''SELECT d.specialization, COUNT(DISTINCT d.id), COUNT(DISTINCT CASE WHEN d.verified = 1 THEN d.id END),
+                   COUNT(a.id), COALESCE(SUM(a.status IN {ACTIVE}), 0)
+            FROM doctors d LEFT JOIN appointments a ON a.doctor_id = d.id
+            GROUP BY d.specialization'''
+    )}
+    return tuple(stats), by_status, load
+
+
+def _materialized(conn):
+    stats = conn.execute(
+        '''SELECT total_patients, total_doctors, pending_verifications, total_appointments
+           FROM dashboard_stats WHERE id = 1'''
+    ).fetchone()
+    by_status = dict(conn.execute(
+        'SELECT status, appointments FROM appointment_status_counts WHERE appointments > 0'
+    ).fetchall())
+    load = {row[0]: tuple(row[1:]) for row in conn.execute(
+        '''SELECT specialization, doctors, verified_doctors, appointments, active_appointments
+           FROM specialization_load WHERE doctors > 0 OR appointments > 0'''
+    )}
+    return tuple(stats), by_status, load
+
+
+def _churn(conn, rng, operations, doctors):
+    """Random writes of every kind the triggers handle, one transaction each."""
+    appointment_ids = [row[0] for row in conn.execute('SELECT id FROM appointments')]
+    for _ in range(operations):
+        op = rng.random()
+        if op < 0.6:
+            conn.execute('UPDATE appointments SET status = ? WHERE id = ?',
+                         (rng.choice(STATUSES), rng.choice(appointment_ids)))
+        elif op < 0.7:
+            conn.execute('UPDATE doctors SET verified = 1 - verified WHERE id = ?', (rng.randrange(doctors) + 1,))
+        elif op < 0.78:
+            conn.execute('UPDATE doctors SET specialization = ?, verified = ? WHERE id = ?',
+                         (rng.choice(SPECIALIZATIONS), int(rng.random() < 0.5), rng.randrange(doctors) + 1))
+        elif op < 0.88:
+            appointment_id = appointment_ids.pop(rng.randrange(len(appointment_ids)))
+            conn.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
+        elif op < 0.94:
+            patient_id = conn.execute(
+                '''INSERT INTO users (patient_id, full_name, email, password_hash)
+                   VALUES (?, 'Churn Patient', ?, 'x')''',
+                (f'PAT-C{rng.getrandbits(40):x}', f'churn{rng.getrandbits(40):x}@medsync.com')
+            ).lastrowid
+            if rng.random() < 0.5:
+                conn.execute('DELETE FROM users WHERE id = ?', (patient_id,))
+        else:
+            doctor_id = conn.execute(
+                '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+                   VALUES (?, 'Dr. Churn', ?, 'x', ?, 0)''',
+                (f'DOC-C{rng.getrandbits(40):x}', f'churn.doc{rng.getrandbits(40):x}@medsync.com',
+                 rng.choice(SPECIALIZATIONS))
+            ).lastrowid
+            if rng.random() < 0.5:
+                conn.execute('DELETE FROM doctors WHERE id = ?', (doctor_id,))
+        conn.commit()
+
+
+def _time(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=200000)
+    parser.add_argument('--doctors', type=int, default=2000)
+    parser.add_argument('--appointments', type=int, default=500000)
+    parser.add_argument('--churn', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=19)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-stats-'), 'stats.db')
+    from backend.services.admin_service import AdminService
+    from backend.utils.database import init_db, get_db, query_db, close_db
+
+    rng = random.Random(args.seed)
+    init_db()
+    conn = get_db()
+    _seed(conn, rng, args.patients, args.doctors, args.appointments)
+
+    # Trigger overhead: the same batch size with and without the counter triggers
+    batch = min(50000, args.appointments // 2)
+    with_triggers = _insert_appointments(conn, rng, 0, batch, args.doctors, args.patients)
+    triggers = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'dashboard_%'"
+    ).fetchall()
+    for name, _ in triggers:
+        conn.execute(f'DROP TRIGGER {name}')
+    without_triggers = _insert_appointments(conn, rng, batch, batch, args.doctors, args.patients)
+    conn.execute("DELETE FROM appointments WHERE id > ?", (batch,))
+    for _, sql in triggers:
+        conn.execute(sql)
+    conn.commit()
+    _insert_appointments(conn, rng, batch, args.appointments - batch, args.doctors, args.patients)
+    print(f"{args.patients:,} patients, {args.doctors:,} doctors, {args.appointments:,} appointments")
+    print(f"appointment inserts: {with_triggers:,.0f}/s with counter triggers, "
+          f"{without_triggers:,.0f}/s without ({(1 - with_triggers / without_triggers) * 100:.0f}% overhead)")
+
+    old_ms = _time(lambda: [query_db(q, one=True) for q in OLD_QUERIES], args.runs)
+    new_ms = _time(AdminService.get_dashboard_stats, args.runs)
+    print(f"dashboard stats: 4x COUNT(*) {old_ms:.2f} ms, materialized {new_ms:.3f} ms "
+          f"(with breakdowns, {old_ms / new_ms:,.0f}x)")
+
+    started = time.perf_counter()
+    _churn(conn, rng, args.churn, args.doctors)
+    print(f"churn: {args.churn:,} random writes in {time.perf_counter() - started:.1f}s")
+
+    expected, actual = _recount(conn), _materialized(conn)
+    close_db()
+    if expected != actual:
+        for label, want, got in zip(('totals', 'by status', 'by specialization'), expected, actual):
+            if want != got:
+                print(f"MISMATCH {label}:\n  recount      {want}\n  materialized {got}")
+        sys.exit(1)
+    print("Counters match a full recount.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Doctor search benchmark: FTS5 index vs. the previous LIKE scan, plus the
+typeahead prefix index.
+
+Builds a scratch database with many doctors and disease mappings, then runs
+the same queries through:
+  - LIKE:  the old search_doctors 'all' query (LEFT JOIN on the disease
+           mapping, three leading-wildcard LIKEs, DISTINCT)
+  - FTS5:  DoctorService.search_doctors (BM25-ranked prefix match on the
+           doctor_search index), with the response cache bypassed
+  - suggest: SuggestService.suggest for every prefix of every query, as a
+           search box would send them keystroke by keystroke
+
+Usage: python debug/benchmark_doctor_search.py [--doctors 50000] [--runs 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+FIRST_NAMES = ['Sarah', 'James', 'Priya', 'Michael', 'Emily', 'Robert', 'Lisa', 'Raj', 'Amanda', 'David',
+               'Maria', 'Chen', 'Fatima', 'Olga', 'Kwame', 'Yuki', 'Carlos', 'Aisha', 'Noah', 'Elena']
+LAST_NAMES = ['Mitchell', 'Chen', 'Sharma', 'Brown', 'Davis', 'Wilson', 'Anderson', 'Patel', 'Foster', 'Kim',
+              'Garcia', 'Nakamura', 'Okafor', 'Ivanova', 'Haddad', 'Larsen', 'Moreau', 'Silva', 'Novak', 'Singh']
+SPECIALIZATIONS = {
+    'Cardiology': ['Hypertension', 'Arrhythmia', 'Heart Failure', 'Angina'],
+    'Neurology': ['Migraine', 'Epilepsy', 'Stroke', 'Neuropathy'],
+    'Dermatology': ['Eczema', 'Psoriasis', 'Acne', 'Melanoma'],
+    'Orthopedics': ['Fracture', 'Arthritis', 'Back Pain', 'Scoliosis'],
+    'Pediatrics': ['Chickenpox', 'Measles', 'Colic', 'Croup'],
+    'Gastroenterology': ['Gastritis', 'Ulcer', 'Hepatitis', 'Crohn Disease'],
+    'Pulmonology': ['Asthma', 'COPD', 'Pneumonia', 'Bronchitis'],
+    'Endocrinology': ['Diabetes', 'Thyroid Disorder', 'Osteoporosis', 'Obesity'],
+    'Psychiatry': ['Depression', 'Anxiety', 'Insomnia', 'PTSD'],
+    'Ophthalmology': ['Cataract', 'Glaucoma', 'Conjunctivitis', 'Macular Degeneration'],
+    'ENT': ['Sinusitis', 'Tonsillitis', 'Hearing Loss', 'Vertigo'],
+    'General Medicine': ['Fever', 'Flu', 'Fatigue', 'Allergies'],
+}
+HOSPITALS = ['City Heart Hospital', 'NeuroHealth Center', 'SkinCare Clinic', 'Joint & Spine Center',
+             'Digestive Health Institute', 'Breathing Care Center', 'Vision Care Center', 'Metro General']
+
+LIKE_ALL = '''SELECT DISTINCT d.id, d.doctor_id, d.full_name, d.email, d.phone,
+              d.specialization, d.experience_years, d.hospital, d.bio, d.verified, d.rating
+              FROM doctors d
+              LEFT JOIN disease_specialization_mapping dsm ON d.specialization = dsm.specialization
+              WHERE (d.full_name LIKE ? OR d.specialization LIKE ? OR dsm.disease LIKE ?)
+              AND d.verified = 1
+              ORDER BY d.rating DESC'''
+
+QUERIES = ['mitchell', 'cardio', 'migraine', 'asthma', 'sarah', 'derm', 'diabetes', 'patel',
+           'glaucoma', 'neuro', 'okafor', 'back pain', 'heart', 'psychiatry', 'ulcer', 'zzz']
+
+
+def _seed(conn, doctors, rng):
+    conn.executemany(
+        'INSERT INTO disease_specialization_mapping (disease, specialization) VALUES (?, ?)',
+        [(disease, spec) for spec, diseases in SPECIALIZATIONS.items() for disease in diseases]
+    )
+    specs = list(SPECIALIZATIONS)
+    rows = []
+    for i in range(doctors):
+        spec = rng.choice(specs)
+        rows.append((
+            f'DOC-F{i:06d}', f'Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', f'search{i}@medsync.com',
+            spec, rng.choice(HOSPITALS),
+            f'{spec} specialist treating {", ".join(rng.sample(SPECIALIZATIONS[spec], 2)).lower()}.',
+            1 if rng.random() < 0.9 else 0, round(rng.uniform(3.5, 5.0), 1)
+        ))
+    conn.executemany(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, hospital, bio,
+                                verified, rating)
+           VALUES (?, ?, ?, 'x', ?, ?, ?, ?, ?)''',
+        rows
+    )
+    conn.commit()
+
+
+def _time(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-search-'), 'search.db')
+    from backend.services.doctor_service import DoctorService
+    from backend.utils.database import init_db, get_db, close_db
+    from backend.utils.pagination import DEFAULT_PAGE_SIZE
+
+    init_db()
+    conn = get_db()
+    started = time.perf_counter()
+    _seed(conn, args.doctors, random.Random(args.seed))
+    print(f"Seeded {args.doctors:,} doctors (index maintained by triggers) in {time.perf_counter() - started:.1f}s")
+
+    search = DoctorService.search_doctors.__wrapped__  # bypass the response cache
+    print(f"\n{'query':<14}{'LIKE ms':>10}{'rows':>8}{'FTS5 ms':>10}{'rows':>6}{'speedup':>9}")
+    like_total = fts_total = 0.0
+    for query in QUERIES:
+        pattern = f'%{query}%'
+        like_ms, like_rows = _time(lambda: conn.execute(LIKE_ALL, (pattern, pattern, pattern)).fetchall(), args.runs)
+        fts_ms, (fts_rows, _) = _time(lambda: search(query, 'all'), args.runs)
+        like_total += like_ms
+        fts_total += fts_ms
+        print(f"{query:<14}{like_ms:>10.2f}{len(like_rows):>8}{fts_ms:>10.2f}{len(fts_rows):>6}"
+              f"{like_ms / fts_ms if fts_ms else 0:>8.0f}x")
+    print(f"\n{'total':<14}{like_total:>10.1f}{'':>8}{fts_total:>10.1f}{'':>6}{like_total / fts_total:>8.0f}x")
+    print(f"LIKE returns every match unranked; FTS5 returns the first page ({DEFAULT_PAGE_SIZE}) by BM25.")
+
+    from backend.services.suggest_service import SuggestService
+    started = time.perf_counter()
+    SuggestService.build()
+    stats = SuggestService.stats()
+    print(f"\nSuggest index: {stats['suggestions']:,} suggestions, {stats['keys']:,} keys, "
+          f"built in {(time.perf_counter() - started) * 1000:.0f} ms")
+    prefixes = [query[:length] for query in QUERIES for length in range(1, len(query) + 1)]
+    latencies = []
+    for _ in range(args.runs):
+        for prefix in prefixes:
+            started = time.perf_counter()
+            SuggestService.suggest(prefix)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    print(f"suggest: {len(latencies)} lookups  p50 {latencies[len(latencies) // 2]:.1f} us  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} us  max {latencies[-1]:.1f} us")
+
+    close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+LLM circuit breaker drill: chat-turn latency through an OpenRouter outage.
+
+Starts a local mock of the OpenRouter API whose models can be switched
+between healthy, hanging (no answer before the read timeout) and failing
+(HTTP 500), then runs sequential turns through LLMClient.complete with the
+per-model breakers on, and again with them effectively off (min_calls too
+high to ever trip):
+  1. primary hangs, fallback healthy  → turns should go to the fallback
+  2. both models down                 → turns should go to the local fallback
+  3. both healthy again               → half-open probes should close the breakers
+
+Timeouts and breaker timings are scaled down (--timeout, --open-seconds) so
+the drill takes seconds; the shape is the same at production settings.
+
+Usage: python debug/benchmark_llm_breaker.py [--turns 10] [--timeout 1] [--open-seconds 2]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.services.llm_client import LLMClient  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'I have had a mild headache since yesterday.'}]
+
+
+class _MockOpenRouter(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        mode = self.server.modes.get(body['model'], 'ok')
+        if mode == 'hang':
+            time.sleep(self.server.hang_seconds)
+        if mode == 'ok':
+            status, reply = 200, {'model': body['model'],
+                                  'choices': [{'message': {'role': 'assistant', 'content': 'Rest and hydrate.'}}]}
+        else:
+            status, reply = 500, {'error': {'message': 'upstream unavailable'}}
+        data = json.dumps(reply).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def _turns(client, count):
+    """Latencies (ms) and how each turn was answered: model name or 'local'."""
+    latencies, answered = [], {}
+    for _ in range(count):
+        started = time.perf_counter()
+        response, model, err = client._send(MESSAGES, None, None, 500, 0.7)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response is not None:
+            response.close()
+        key = model if not err else 'local'
+        answered[key] = answered.get(key, 0) + 1
+    return latencies, answered
+
+
+def _until_recovered(client, limit_seconds):
+    """Seconds of turns (each falling back locally) until the primary model answers again."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < limit_seconds:
+        response, model, err = client._send(MESSAGES, None, None, 500, 0.7)
+        if response is not None:
+            response.close()
+        if not err and model == client.primary_model:
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=10, help='turns per phase')
+    parser.add_argument('--timeout', type=float, default=1.0, help='LLM read timeout in seconds')
+    parser.add_argument('--retry-delay', type=float, default=0.2)
+    parser.add_argument('--open-seconds', type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _MockOpenRouter)
+    server.daemon_threads = True
+    server.hang_seconds = args.timeout * 3
+    server.modes = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/api/v1'
+
+    breaker = {'window_seconds': 60, 'min_calls': 4, 'failure_rate': 0.5, 'slow_call_ms': args.timeout * 800,
+               'open_seconds': args.open_seconds, 'max_open_seconds': args.open_seconds * 4}
+    clients = {
+        'breakers on': breaker,
+        'breakers off': {**breaker, 'min_calls': 10 ** 9},
+    }
+
+    phases = (('primary hangs', {'mock/primary': 'hang'}),
+              ('both down', {'mock/primary': 'hang', 'mock/fallback': 'fail'}))
+    print(f"read timeout {args.timeout:g}s, retry delay {args.retry_delay:g}s, 2 models x 2 attempts, "
+          f"breaker opens for {args.open_seconds:g}s\n")
+    print(f"{'phase':<16}{'client':<14}{'p50 ms':>9}{'max ms':>9}{'total s':>9}  answered by")
+    for label, settings in clients.items():
+        client = LLMClient('mock-key', base_url, 'mock/primary', 'mock/fallback', pool_size=4,
+                           read_timeout=args.timeout, retry_delay=args.retry_delay, breaker_settings=settings)
+        client.session.trust_env = False
+        for phase, modes in phases:
+            server.modes = modes
+            latencies, answered = _turns(client, args.turns)
+            print(f"{phase:<16}{label:<14}{statistics.median(latencies):>9.0f}{max(latencies):>9.0f}"
+                  f"{sum(latencies) / 1000:>9.1f}  {', '.join(f'{k} {v}' for k, v in sorted(answered.items()))}")
+
+        server.modes = {}
+        recovered = _until_recovered(client, args.open_seconds * 10)
+        states = {model: stats['state'] for model, stats in client.stats()['breakers'].items()}
+        print(f"{'recovered':<16}{label:<14}{'':>9}{'':>9}"
+              f"{recovered if recovered is None else round(recovered, 1):>9}  breakers {states}")
+        client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+OpenRouter client benchmark: one requests.post per attempt vs. the pooled LLMClient.
+
+Starts a local mock of the OpenRouter chat-completions API and runs the
+same chat turns through:
+  - per-call: requests.post with freshly built headers for every attempt
+              (the old ChatbotService.call_openrouter path)
+  - pooled:   backend.services.llm_client.LLMClient (one keep-alive session)
+
+The mock sleeps --connect-ms whenever it accepts a new connection, standing
+in for the TCP + TLS handshake round trips to the real API (use --tls to
+add a real local TLS handshake on top), and answers --fail-rate of requests
+with HTTP 500 so retries are exercised. Reports per-turn latency and how many
+connections each client opened.
+
+It then compares a blocking completion with a streamed one (stream: true,
+relayed as SSE by /api/chatbot/message/stream) with the mock writing one
+token every --token-ms: time to the first token, to the [[RECOMMEND]] tag
+as ReplyStreamParser sees it, and to the end of the reply.
+
+Usage: python debug/benchmark_llm_client.py [--turns 200] [--threads 8] [--connect-ms 60] [--token-ms 15] [--tls]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.services.chatbot_service import ReplyStreamParser  # noqa: E402
+from backend.services.llm_client import LLMClient  # noqa: E402
+
+MESSAGES = [
+    {'role': 'system', 'content': 'You are MedSync AI, a medical symptom checker.'},
+    {'role': 'user', 'content': 'I have had a mild headache and some dizziness since yesterday evening.'},
+]
+REPLY = ("I'm sorry you're not feeling well. 😟 A mild headache with dizziness is often caused by "
+         "dehydration, missed meals, poor sleep or stress. Drink water 💧, rest in a quiet room and eat "
+         "something light. ⚠️ Seek urgent care for a sudden severe headache, fainting, slurred speech or "
+         "weakness on one side. This is for informational purposes only and not medical advice. Has the "
+         "dizziness got worse when you stand up? Would you like to book an appointment? "
+         "[[RECOMMEND: Neurology]]")
+
+
+class _MockOpenRouter(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+        time.sleep(self.server.connect_delay)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.count('requests')
+        time.sleep(self.server.think_time)
+        if self.server.rng_fail():
+            status, reply = 500, {'error': {'message': 'upstream overloaded'}}
+        elif body.get('stream'):
+            return self._stream(body['model'])
+        else:
+            # A blocking completion arrives only once the model has written every token
+            time.sleep(self.server.token_time * len(REPLY.split(' ')))
+            status, reply = 200, {
+                'model': body['model'],
+                'choices': [{'message': {'role': 'assistant', 'content': REPLY}}],
+            }
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = REPLY.split(' ')
+        try:
+            for i, word in enumerate(words):
+                time.sleep(self.server.token_time)
+                chunk = {'model': model, 'choices': [{'delta': {'content': word if i == 0 else ' ' + word}}]}
+                self._chunk(f'data: {json.dumps(chunk)}\n\n')
+            self._chunk('data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (the chat user went away)
+            self.close_connection = True
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+class _MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, connect_ms, think_ms, fail_rate, seed):
+        super().__init__(('127.0.0.1', 0), _MockOpenRouter)
+        self.connect_delay = connect_ms / 1000
+        self.think_time = think_ms / 1000
+        self.token_time = 0
+        self._rng = random.Random(seed)
+        self._fail_rate = fail_rate
+        self._lock = threading.Lock()
+        self.counters = {'connections': 0, 'requests': 0}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def rng_fail(self):
+        with self._lock:
+            return self._rng.random() < self._fail_rate
+
+    def reset(self):
+        with self._lock:
+            self.counters = {'connections': 0, 'requests': 0}
+
+
+def _self_signed_cert(workdir):
+    if not shutil.which('openssl'):
+        sys.exit('--tls needs the openssl command to create a throwaway certificate')
+    cert, key = os.path.join(workdir, 'mock.crt'), os.path.join(workdir, 'mock.key')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+
+def _per_call(base_url, api_key, verify, max_retries=2):
+    """The old call path: a new connection (and header dict) for every attempt."""
+    def turn():
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'HTTP-Referer': 'https://medsync-ai.com',
+            'X-Title': 'MedSync AI Healthcare Platform'
+        }
+        payload = {'model': 'mock/primary', 'messages': MESSAGES, 'temperature': 0.7, 'max_tokens': 500}
+        for _ in range(max_retries):
+            response = requests.post(f'{base_url}/chat/completions', headers=headers, json=payload,
+                                     timeout=30, verify=verify)
+            if response.status_code == 200:
+                return response.json()['choices'][0]['message']['content']
+        return None
+    return turn
+
+
+def _pooled(client):
+    def turn():
+        content, _ = client.complete(MESSAGES)
+        return content
+    return turn
+
+
+def _streamed_turn(client):
+    """Milliseconds to the first token, to the recommendation event and to the end of the reply."""
+    started = time.perf_counter()
+    deltas, err = client.open_stream(MESSAGES, max_retries=5)
+    if err:
+        return None
+    parser, first, tag = ReplyStreamParser(), None, None
+    for delta in deltas:
+        first = first or time.perf_counter()
+        for event, _ in parser.feed(delta):
+            if event == 'recommendation' and tag is None:
+                tag = time.perf_counter()
+    parser.finish()
+    ended = time.perf_counter()
+    if parser.text != REPLY or tag is None:
+        sys.exit(f'streamed reply did not parse back: {parser.text!r}')
+    return [(t - started) * 1000 for t in (first, tag, ended)]
+
+
+def _run(turn, turns, threads):
+    def timed(_):
+        started = time.perf_counter()
+        ok = turn() is not None
+        return (time.perf_counter() - started) * 1000, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(timed, range(turns)))
+    wall = time.perf_counter() - started
+    latencies = sorted(ms for ms, _ in results)
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'mean': statistics.fmean(latencies),
+        'turns_per_s': turns / wall,
+        'failed': sum(not ok for _, ok in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--connect-ms', type=float, default=60, help='simulated handshake cost per new connection')
+    parser.add_argument('--think-ms', type=float, default=20, help='simulated model time per request')
+    parser.add_argument('--fail-rate', type=float, default=0.05, help='share of requests answered with HTTP 500')
+    parser.add_argument('--token-ms', type=float, default=15, help='simulated time per generated token')
+    parser.add_argument('--stream-turns', type=int, default=20)
+    parser.add_argument('--tls', action='store_true', help='serve the mock over HTTPS with a throwaway cert')
+    parser.add_argument('--seed', type=int, default=21)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)  # retry warnings from the client
+
+    server = _MockServer(args.connect_ms, args.think_ms, args.fail_rate, args.seed)
+    verify, scheme = True, 'http'
+    if args.tls:
+        cert, key = _self_signed_cert(tempfile.mkdtemp(prefix='medsync-llm-'))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        verify, scheme = cert, 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'{scheme}://127.0.0.1:{server.server_address[1]}/api/v1'
+
+    client = LLMClient('mock-key', base_url, 'mock/primary', 'mock/fallback',
+                       pool_size=args.threads, retry_delay=0)
+    client.session.verify = verify
+    # REQUESTS_CA_BUNDLE and friends would otherwise override session.verify
+    client.session.trust_env = False
+
+    print(f"mock OpenRouter at {base_url}: {args.connect_ms:g} ms per new connection, "
+          f"{args.think_ms:g} ms per request, {args.fail_rate:.0%} HTTP 500")
+    print(f"\n{'client':<10}{'threads':>8}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'turns/s':>9}"
+          f"{'conns':>7}{'reqs':>6}{'failed':>8}")
+    for threads in sorted({1, args.threads}):
+        for label, turn in (('per-call', _per_call(base_url, 'mock-key', verify)), ('pooled', _pooled(client))):
+            server.reset()
+            result = _run(turn, args.turns, threads)
+            print(f"{label:<10}{threads:>8}{result['p50']:>9.1f}{result['p99']:>9.1f}{result['mean']:>9.1f}"
+                  f"{result['turns_per_s']:>9.1f}{server.counters['connections']:>7}"
+                  f"{server.counters['requests']:>6}{result['failed']:>8}")
+
+    server.token_time = args.token_ms / 1000
+    server.reset()
+    blocking = []
+    for _ in range(args.stream_turns):
+        started = time.perf_counter()
+        client.complete(MESSAGES, max_retries=5)
+        blocking.append((time.perf_counter() - started) * 1000)
+    streamed = [result for result in (_streamed_turn(client) for _ in range(args.stream_turns)) if result]
+    first, tag, ended = (statistics.median(column) for column in zip(*streamed))
+    print(f"\n{len(REPLY.split(' '))}-token reply at {args.token_ms:g} ms/token, median of {args.stream_turns} turns:")
+    print(f"  blocking completion: reply shown after {statistics.median(blocking):.0f} ms")
+    print(f"  streamed:            first token {first:.0f} ms, [[RECOMMEND]] parsed {tag:.0f} ms, "
+          f"reply complete {ended:.0f} ms ({server.counters['connections']} new connections)")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+LLM hedging benchmark: chat-turn latency with a heavy-tailed primary model.
+
+Starts a local mock of the OpenRouter API where the primary model usually
+answers in --fast-ms (+/- 50%) but takes --slow-ms on a --slow-share of calls (a busy
+upstream at peak), while the fallback model steadily answers in
+--fallback-ms. Runs --turns completions from --concurrency callers through
+LLMClient and AsyncLLMClient, with hedging off and on, and reports turn
+p50/p99, how many turns hedged, how many of those the fallback won, and the
+client's own per-model latency breakdown.
+
+Usage: python debug/benchmark_llm_hedging.py [--turns 400] [--concurrency 8] [--slow-share 0.05]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.services.async_llm_client import AsyncLLMClient  # noqa: E402
+from backend.services.llm_client import LLMClient  # noqa: E402
+from backend.utils.circuit_breaker import percentile  # noqa: E402
+
+MESSAGES = [{'role': 'user', 'content': 'I have had a mild headache since yesterday.'}]
+
+
+class _MockOpenRouter(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        if body['model'] == 'mock/primary':
+            slow = server.rng.random() < server.slow_share
+            time.sleep((server.slow_ms if slow else server.fast_ms * server.rng.uniform(0.5, 1.5)) / 1000)
+        else:
+            time.sleep(server.fallback_ms / 1000)
+        data = json.dumps({'model': body['model'],
+                           'choices': [{'message': {'role': 'assistant', 'content': 'Rest and hydrate.'}}]}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # A hedge's loser that the async client cancelled
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def _timed_sync(client):
+    started = time.perf_counter()
+    content, err = client.complete(MESSAGES)
+    return (time.perf_counter() - started) * 1000, err is None
+
+
+async def _timed_async(client, gate):
+    async with gate:
+        started = time.perf_counter()
+        content, err = await client.complete(MESSAGES)
+        return (time.perf_counter() - started) * 1000, err is None
+
+
+def _run_sync(client, turns, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda _: _timed_sync(client), range(turns)))
+
+
+def _run_async(client, turns, concurrency):
+    async def run():
+        gate = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(*(_timed_async(client, gate) for _ in range(turns)))
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+def _report(label, results, stats):
+    latencies = sorted(ms for ms, _ in results)
+    print(f"{label:<22}{percentile(latencies, 0.5):>9.0f}{percentile(latencies, 0.99):>9.0f}"
+          f"{sum(not ok for _, ok in results):>8}{stats['hedges']:>8}{stats['hedge_wins']:>14}"
+          f"{stats['hedge_delay_ms']['complete']:>10.0f}")
+    return stats['latency']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--fast-ms', type=float, default=200)
+    parser.add_argument('--slow-ms', type=float, default=3000)
+    parser.add_argument('--slow-share', type=float, default=0.05, help='share of primary calls that are slow')
+    parser.add_argument('--fallback-ms', type=float, default=400)
+    parser.add_argument('--percentile', type=float, default=0.9, help='LLM_HEDGE_PERCENTILE')
+    parser.add_argument('--initial-delay-ms', type=float, default=300,
+                        help='LLM_HEDGE_INITIAL_DELAY_MS (until 20 primary samples)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _MockOpenRouter)
+    server.daemon_threads = True
+    server.rng = random.Random(7)
+    server.fast_ms, server.slow_ms = args.fast_ms, args.slow_ms
+    server.slow_share, server.fallback_ms = args.slow_share, args.fallback_ms
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}/api/v1'
+
+    settings = {'percentile': args.percentile, 'min_samples': 20, 'initial_delay_ms': args.initial_delay_ms}
+    print(f"primary {args.fast_ms:g} ms +/- 50%, {args.slow_share:.0%} of calls {args.slow_ms:g} ms; "
+          f"fallback {args.fallback_ms:g} ms; {args.turns} turns from {args.concurrency} callers; "
+          f"hedge at p{args.percentile * 100:g} of the primary\n")
+    print(f"{'':<22}{'p50 ms':>9}{'p99 ms':>9}{'failed':>8}{'hedges':>8}{'fallback won':>14}{'delay ms':>10}")
+
+    breakdowns = {}
+    for hedge in (False, True):
+        client = LLMClient('mock-key', base_url, 'mock/primary', 'mock/fallback', pool_size=args.concurrency,
+                           hedge=hedge, hedge_settings=settings)
+        client.session.trust_env = False
+        results = _run_sync(client, args.turns, args.concurrency)
+        label = f"sync, hedge {'on' if hedge else 'off'}"
+        breakdowns[label] = _report(label, results, client.stats())
+        client.close()
+
+    for hedge in (False, True):
+        client = AsyncLLMClient('mock-key', base_url, 'mock/primary', 'mock/fallback', hedge=hedge,
+                                hedge_settings=settings)
+        results = _run_async(client, args.turns, args.concurrency)
+        label = f"async, hedge {'on' if hedge else 'off'}"
+        breakdowns[label] = _report(label, results, client.stats())
+
+    print("\nper-model latency reported by the client (calls, p50/p99 ms):")
+    for label, latency in breakdowns.items():
+        parts = [f"{model.split('/')[1]} {kind} {s['calls']} ({s['p50_ms']}/{s['p99_ms']})"
+                 for model, kinds in latency.items() for kind, s in kinds.items() if s['calls']]
+        print(f"  {label:<20}{'; '.join(parts)}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
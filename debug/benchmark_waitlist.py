@@ -0,0 +1,182 @@
+"""
+Waitlist matching throughput benchmark.
+
+Builds a scratch database with many doctors and a large waitlist, then
+measures:
+  - join throughput through WaitlistService.join_waitlist
+  - offer latency/throughput when freed slots are matched through the
+    (target, date) waitlist_index, one committed transaction per offer
+  - the same lookups as a filtered query on waitlist_entries, for comparison
+
+Usage: python debug/benchmark_waitlist.py [--entries 100000] [--offers 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+SPECIALIZATIONS = ['Cardiology', 'Neurology', 'Dermatology', 'Orthopedics', 'Pediatrics',
+                   'Psychiatry', 'Oncology', 'Gastroenterology', 'Pulmonology', 'Endocrinology']
+HOURS = ['08:00', '09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00', '16:00', '17:00']
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _random_entry(rng, doctor_ids, today, horizon_days):
+    start = today + timedelta(days=rng.randrange(horizon_days))
+    earliest = rng.choice(HOURS[:6])
+    return {
+        'doctor_id': rng.choice(doctor_ids) if rng.random() < 0.6 else None,
+        'specialization': rng.choice(SPECIALIZATIONS),
+        'start': start.isoformat(),
+        'end': (start + timedelta(days=rng.randrange(3, 21))).isoformat(),
+        'earliest': earliest,
+        'latest': rng.choice([h for h in HOURS if h > earliest] + ['20:00']),
+    }
+
+
+def _seed(conn, doctors, patients):
+    conn.executemany(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+           VALUES (?, ?, ?, 'x', ?, 1)''',
+        [(f'DOC-B{i:05d}', f'Dr. Bench {i}', f'bench.doc{i}@medsync.com', SPECIALIZATIONS[i % len(SPECIALIZATIONS)])
+         for i in range(doctors)]
+    )
+    conn.executemany(
+        '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+           VALUES (?, ?, ?, 'x', 1)''',
+        [(f'PAT-B{i:06d}', f'Patient {i}', f'bench.pat{i}@medsync.com') for i in range(patients)]
+    )
+    conn.commit()
+    return ([row[0] for row in conn.execute('SELECT id FROM doctors ORDER BY id')],
+            [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')])
+
+
+def _bulk_load(conn, rng, entries, doctor_ids, patient_ids, today, horizon_days):
+    """Insert waiting entries and their index rows directly, in one transaction."""
+    from backend.services.waitlist_service import WaitlistService
+
+    conn.execute('BEGIN')
+    from_date = datetime(today.year, today.month, today.day)
+    for i in range(entries):
+        spec = _random_entry(rng, doctor_ids, today, horizon_days)
+        entry = {
+            'patient_id': patient_ids[i % len(patient_ids)], 'doctor_id': spec['doctor_id'],
+            'specialization': None if spec['doctor_id'] else spec['specialization'],
+            'window_start': spec['start'], 'window_end': spec['end'],
+            'earliest_time': spec['earliest'], 'latest_time': spec['latest'],
+        }
+        entry['id'] = conn.execute(
+            '''INSERT INTO waitlist_entries
+               (patient_id, doctor_id, specialization, window_start, window_end, earliest_time, latest_time)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (entry['patient_id'], entry['doctor_id'], entry['specialization'], entry['window_start'],
+             entry['window_end'], entry['earliest_time'], entry['latest_time'])
+        ).lastrowid
+        conn.executemany(
+            '''INSERT INTO waitlist_index
+               (target, wait_date, entry_id, patient_id, earliest_time, latest_time)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            WaitlistService._index_rows(entry, from_date)
+        )
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--offers', type=int, default=2000)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--joins', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='medsync-waitlist-'), 'waitlist.db')
+    from backend.services.waitlist_service import WaitlistService
+    from backend.utils.database import init_db, get_db, close_db
+
+    rng = random.Random(args.seed)
+    today = date.today() + timedelta(days=1)
+    horizon_days = 60
+
+    init_db()
+    conn = get_db()
+    patients = max(args.entries, args.joins) // WaitlistService.MAX_ACTIVE_ENTRIES + 1
+    doctor_ids, patient_ids = _seed(conn, args.doctors, patients)
+    print(f"{args.doctors} doctors, {len(patient_ids)} patients")
+
+    # 1. Joins through the service (validation + entry + index rows, one transaction each)
+    started = time.perf_counter()
+    for i in range(args.joins):
+        spec = _random_entry(rng, doctor_ids, today, horizon_days)
+        _, err = WaitlistService.join_waitlist(
+            patient_ids[i // WaitlistService.MAX_ACTIVE_ENTRIES], doctor_id=spec['doctor_id'],
+            specialization=spec['specialization'], start_date=spec['start'], end_date=spec['end'],
+            earliest_time=spec['earliest'], latest_time=spec['latest']
+        )
+        if err:
+            raise SystemExit(f"join failed: {err}")
+    elapsed = time.perf_counter() - started
+    print(f"join_waitlist: {args.joins} entries in {elapsed:.2f}s ({args.joins / elapsed:,.0f}/s)")
+
+    # 2. Bulk-load the rest of the waitlist
+    started = time.perf_counter()
+    _bulk_load(conn, rng, max(0, args.entries - args.joins), doctor_ids, patient_ids, today, horizon_days)
+    waiting = conn.execute("SELECT COUNT(*) FROM waitlist_entries WHERE status = 'waiting'").fetchone()[0]
+    index_rows = conn.execute('SELECT COUNT(*) FROM waitlist_index').fetchone()[0]
+    print(f"waitlist: {waiting:,} waiting entries, {index_rows:,} index rows "
+          f"(loaded in {time.perf_counter() - started:.1f}s)")
+
+    freed = []
+    for _ in range(args.offers):
+        doctor_id = rng.choice(doctor_ids)
+        start_time = rng.choice(HOURS)
+        freed.append((doctor_id, (today + timedelta(days=rng.randrange(horizon_days))).isoformat(),
+                      start_time, f"{start_time[:2]}:30"))
+    specializations = {row[0]: row[1] for row in conn.execute('SELECT id, specialization FROM doctors')}
+
+    # 3. Baseline: the same first-match lookup as a filtered query on waitlist_entries
+    latencies = []
+    for doctor_id, slot_date, start_time, end_time in freed[:200]:
+        started = time.perf_counter()
+        conn.execute(
+            '''SELECT id FROM waitlist_entries
+               WHERE status = 'waiting' AND (doctor_id = ? OR specialization = ?)
+                 AND window_start <= ? AND window_end >= ?
+                 AND earliest_time <= ? AND latest_time >= ?
+               ORDER BY id LIMIT 1''',
+            (doctor_id, specializations[doctor_id], slot_date, slot_date, start_time, end_time)
+        ).fetchone()
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(f"baseline entries scan: p50 {_percentile(latencies, 50):.3f} ms  "
+          f"p99 {_percentile(latencies, 99):.3f} ms  (lookup only, {len(latencies)} samples)")
+
+    # 4. Matching engine: find + hold + mark offered, committed per freed slot
+    latencies, matched = [], 0
+    total_started = time.perf_counter()
+    for doctor_id, slot_date, start_time, end_time in freed:
+        started = time.perf_counter()
+        conn.execute('BEGIN IMMEDIATE')
+        offer = WaitlistService.offer_slot(conn, doctor_id, slot_date, start_time, end_time,
+                                           specialization=specializations[doctor_id])
+        conn.commit()
+        latencies.append((time.perf_counter() - started) * 1000)
+        matched += offer is not None
+    total = time.perf_counter() - total_started
+    print(f"offer_slot: {len(freed)} freed slots, {matched} matched, {len(freed) / total:,.0f} offers/s  "
+          f"p50 {_percentile(latencies, 50):.3f} ms  p99 {_percentile(latencies, 99):.3f} ms")
+
+    close_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+EXPLAIN QUERY PLAN regression check for the hot-path indexes.
+
+Builds a scratch database from schema.sql, drives the service-layer read
+paths while tracing every statement they issue, and fails (exit code 1) if
+any statement touching appointments, slots, chat_history, notifications,
+users, doctors or appointment_rollups is planned as a full table scan. List endpoints are driven
+with and without a cursor so the keyset conditions are checked too.
+
+Usage: python debug/check_query_plans.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+HOT_TABLES = {'appointments', 'slots', 'chat_history', 'notifications', 'users', 'doctors', 'appointment_rollups'}
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+LATEST = '9999-12-31 23:59:59'  # cursor past every row, for exercising keyset conditions
+SQL_KEYWORDS = {'where', 'join', 'left', 'inner', 'on', 'order', 'group', 'limit', 'set', 'and'}
+
+
+def _alias_map(sql):
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def _full_scans(conn, sql):
+    aliases = _alias_map(sql)
+    scans = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)(.*)', detail)
+        if match and 'USING' not in match.group(2):
+            table = aliases.get(match.group(1), match.group(1))
+            if table in HOT_TABLES:
+                scans.append(detail)
+    return scans
+
+
+def _seed(query_db, execute_db):
+    from backend.services.appointment_service import AppointmentService
+    from backend.services.chatbot_service import ChatbotService
+
+    doctor_id = execute_db(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+           VALUES ('DOC-PLAN01', 'Dr. Plan', 'plan@medsync.com', 'x', 'Cardiology', 1)'''
+    )
+    patient_id = execute_db(
+        '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+           VALUES ('PAT-PLAN01', 'Plan Patient', 'plan.patient@medsync.com', 'x', 1)'''
+    )
+    AppointmentService.save_weekly_availability(
+        doctor_id, [{'weekday': d, 'start_time': '09:00', 'end_time': '12:00'} for d in range(7)]
+    )
+    slot = AppointmentService.get_available_slots(doctor_id)[0]
+    appointment, _ = AppointmentService.book_appointment(
+        patient_id, doctor_id, reason='plan check',
+        slot_date=slot['slot_date'], start_time=slot['start_time']
+    )
+    ChatbotService.save_message(patient_id, 'sess-plan', 'user', 'hello')
+    execute_db(
+        '''INSERT INTO notifications (recipient_type, user_id, title, message)
+           VALUES ('patient', ?, 'Plan', 'Plan check')''',
+        (patient_id,)
+    )
+    return doctor_id, patient_id, appointment
+
+
+def _exercise(doctor_id, patient_id, appointment):
+    from backend.services.admin_service import AdminService
+    from backend.services.analytics_service import AnalyticsService
+    from backend.services.appointment_service import AppointmentService
+    from backend.services.chatbot_service import ChatbotService
+    from backend.services.doctor_service import DoctorService
+    from backend.services.notification_service import NotificationService
+
+    AppointmentService.get_doctor_slots(doctor_id)
+    AppointmentService.get_doctor_slots(doctor_id, appointment['slot_date'], available_only=True)
+    AppointmentService.get_doctor_slots_for_month(doctor_id, appointment['slot_date'][:7], True)
+    AppointmentService.get_next_available_slots(specialization='Cardiology', limit=3)
+    AppointmentService.get_next_available_slots(doctor_ids=[doctor_id], limit=3)
+    AppointmentService.get_patient_appointments(patient_id)
+    AppointmentService.get_patient_appointments(patient_id, 'scheduled')
+    AppointmentService.get_patient_appointments(patient_id, cursor=('9999-12-31', '23:59', 1 << 62))
+    AppointmentService.get_doctor_appointments(doctor_id)
+    AppointmentService.get_doctor_appointments(doctor_id, 'scheduled')
+    AppointmentService.get_doctor_appointments(doctor_id, cursor=('9999-12-31', '23:59', 1 << 62))
+    AppointmentService.get_appointment_by_id(appointment['id'])
+    ChatbotService.get_or_create_session(patient_id)
+    ChatbotService.get_chat_history(patient_id)
+    ChatbotService.get_chat_history(patient_id, 'sess-plan', 8)
+    ChatbotService.get_all_sessions(patient_id)
+    NotificationService.get_patient_notifications(patient_id)
+    NotificationService.get_patient_notifications(patient_id, unread_only=True)
+    NotificationService.get_patient_notifications(patient_id, cursor=(LATEST, 1 << 62))
+    NotificationService.get_doctor_notifications(doctor_id, cursor=(LATEST, 1 << 62))
+    NotificationService.get_unread_count(user_id=patient_id)
+    NotificationService.mark_all_read(user_id=patient_id)
+    AdminService.get_dashboard_stats()
+    AdminService.get_all_appointments()
+    AdminService.get_all_appointments(cursor=(LATEST, 1 << 62))
+    AdminService.get_recent_chat_logs()
+    AdminService.get_recent_chat_logs(cursor=(LATEST, 1 << 62))
+    AdminService.get_all_doctors()
+    AdminService.get_all_doctors(cursor=(LATEST, 1 << 62))
+    AdminService.get_all_patients()
+    AdminService.get_all_patients(cursor=(LATEST, 1 << 62))
+    DoctorService.get_all_doctors.__wrapped__()
+    DoctorService.get_all_doctors.__wrapped__(cursor=(5.0, 1 << 62))
+    DoctorService.get_doctors_by_specialization.__wrapped__('Cardiology')
+    DoctorService.get_doctors_by_specialization.__wrapped__('Cardiology', cursor=(5.0, 1 << 62))
+    AppointmentService.update_appointment_status(appointment['id'], 'scheduled')
+    AnalyticsService.get_metrics(appointment['slot_date'], appointment['slot_date'])
+    AnalyticsService.get_metrics(appointment['slot_date'], appointment['slot_date'], 'week', 'doctor', doctor_id)
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='medsync-plan-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'plan_check.db')
+
+    from backend.utils.database import init_db, get_db, query_db, execute_db, close_db
+    init_db()
+    seeded = _seed(query_db, execute_db)
+
+    statements = []
+    conn = get_db()
+    conn.set_trace_callback(statements.append)
+    _exercise(*seeded)
+    conn.set_trace_callback(None)
+
+    failures = []
+    checked = 0
+    for sql in dict.fromkeys(statements):
+        if not re.match(r'\s*(SELECT|UPDATE|DELETE)', sql, re.IGNORECASE):
+            continue
+        if not HOT_TABLES & set(_alias_map(sql).values()):
+            continue
+        checked += 1
+        scans = _full_scans(conn, sql)
+        if scans:
+            failures.append((' '.join(sql.split()), scans))
+
+    close_db()
+    print(f"Checked {checked} hot-path statements.")
+    for sql, scans in failures:
+        print(f"\nFULL SCAN: {', '.join(scans)}\n  {sql}")
+
+    if failures:
+        print(f"\n{len(failures)} statement(s) fell back to a full table scan.")
+        sys.exit(1)
+    print("No full table scans on hot-path tables.")
+
+
+if __name__ == '__main__':
+    main()
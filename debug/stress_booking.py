@@ -0,0 +1,225 @@
+"""
+Concurrency stress test for slot booking and rescheduling.
+
+Builds a scratch database, then races many threads and many processes at a
+single slot through AppointmentService and checks that exactly one booking
+(or reschedule) wins and that the database agrees:
+
+  - book, threads:        N threads book the same rule-derived slot
+  - book, processes:      N processes book the same persisted slot by id
+  - reschedule, threads:  N patients reschedule their appointment into one slot
+
+It then checks that rescheduling an emergency-cancelled appointment leaves
+its old slot alone once another patient has booked it.
+
+Usage: python debug/stress_booking.py [--threads 200] [--processes 48]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def _configure(db_path, pool_size):
+    os.environ['DATABASE_PATH'] = db_path
+    os.environ['DB_POOL_SIZE'] = str(pool_size)
+    os.environ['DB_POOL_TIMEOUT'] = '60'
+    os.environ['DB_BUSY_TIMEOUT_MS'] = '60000'
+
+
+def _seed(patients):
+    from backend.services.appointment_service import AppointmentService
+    from backend.utils.database import get_db
+
+    conn = get_db()
+    doctor_id = conn.execute(
+        '''INSERT INTO doctors (doctor_id, full_name, email, password_hash, specialization, verified)
+           VALUES ('DOC-STRESS', 'Dr. Stress', 'stress@medsync.com', 'x', 'Cardiology', 1)'''
+    ).lastrowid
+    conn.executemany(
+        '''INSERT INTO users (patient_id, full_name, email, password_hash, is_verified)
+           VALUES (?, ?, ?, 'x', 1)''',
+        [(f'PAT-S{i:05d}', f'Patient {i}', f'stress{i}@medsync.com') for i in range(patients)]
+    )
+    conn.commit()
+    patient_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+
+    AppointmentService.save_weekly_availability(
+        doctor_id, [{'weekday': d, 'start_time': '08:00', 'end_time': '20:00'} for d in range(7)]
+    )
+    return doctor_id, patient_ids
+
+
+def _race(attempt, workers):
+    """Run attempt(i) on `workers` threads released together; returns the per-thread results."""
+    from backend.utils.database import close_db
+
+    barrier = threading.Barrier(workers)
+
+    def _run(i):
+        barrier.wait()
+        try:
+            return attempt(i)
+        finally:
+            close_db()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run, range(workers)))
+
+
+def _process_attempt(args):
+    db_path, patient_id, doctor_id, slot_id, start_at = args
+    _configure(db_path, 2)
+    from backend.services.appointment_service import AppointmentService
+    from backend.utils.database import close_db
+
+    time.sleep(max(0.0, start_at - time.time()))
+    try:
+        appointment, _ = AppointmentService.book_appointment(patient_id, doctor_id, slot_id=slot_id)
+        return appointment is not None
+    finally:
+        close_db()
+
+
+def _window():
+    from datetime import date, timedelta
+    start = date.today() + timedelta(days=1)
+    return start, start + timedelta(days=60)
+
+
+def _bookings_for(conn, slot_id):
+    return conn.execute('SELECT COUNT(*) FROM appointments WHERE slot_id = ?', (slot_id,)).fetchone()[0]
+
+
+def _report(name, wins, expected_rows, actual_rows, elapsed):
+    ok = wins == 1 and actual_rows == expected_rows
+    print(f"{name:<22} winners={wins:<4} appointment rows={actual_rows:<4} "
+          f"{elapsed * 1000:8.1f} ms  {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=48)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='medsync-stress-'), 'stress.db')
+    _configure(db_path, args.threads + 2)
+
+    from backend.services.appointment_service import AppointmentService
+    from backend.services.availability_service import AvailabilityService
+    from backend.utils.database import init_db, get_db
+
+    init_db()
+    doctor_id, patient_ids = _seed(max(args.threads, args.processes) * 2)
+    open_slots = AvailabilityService.next_open_slots([doctor_id], *_window(), limit=3)
+    results = []
+
+    # 1. Threads race for one rule-derived slot, materialized on first claim
+    target = open_slots[0]
+    started = time.perf_counter()
+    wins = _race(
+        lambda i: AppointmentService.book_appointment(
+            patient_ids[i], doctor_id, slot_date=target['slot_date'], start_time=target['start_time']
+        )[0] is not None,
+        args.threads
+    )
+    elapsed = time.perf_counter() - started
+    conn = get_db()
+    slot = conn.execute(
+        'SELECT * FROM slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+        (doctor_id, target['slot_date'], target['start_time'])
+    ).fetchone()
+    results.append(_report('book / threads', sum(wins), 1, _bookings_for(conn, slot['id']), elapsed))
+
+    # 2. Processes race for one persisted slot by id
+    target = open_slots[1]
+    conn.execute(
+        'INSERT INTO slots (doctor_id, slot_date, start_time, end_time) VALUES (?, ?, ?, ?)',
+        (doctor_id, target['slot_date'], target['start_time'], target['end_time'])
+    )
+    conn.commit()
+    slot_id = conn.execute(
+        'SELECT id FROM slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+        (doctor_id, target['slot_date'], target['start_time'])
+    ).fetchone()[0]
+    start_at = time.time() + 3
+    jobs = [(db_path, patient_ids[args.threads + i], doctor_id, slot_id, start_at)
+            for i in range(args.processes)]
+    started = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+        wins = pool.map(_process_attempt, jobs)
+    elapsed = time.perf_counter() - started
+    results.append(_report('book / processes', sum(wins), 1, _bookings_for(conn, slot_id), elapsed))
+
+    # 3. Patients holding separate appointments all reschedule into one slot
+    movers = patient_ids[-args.threads:]
+    appointments = []
+    for offset, patient_id in enumerate(movers):
+        slot = AvailabilityService.next_open_slots([doctor_id], *_window(), limit=1)[0]
+        appointment, err = AppointmentService.book_appointment(
+            patient_id, doctor_id, slot_date=slot['slot_date'], start_time=slot['start_time']
+        )
+        if err:
+            raise SystemExit(f"Could not seed appointment {offset}: {err}")
+        appointments.append(appointment['id'])
+    target = AvailabilityService.next_open_slots([doctor_id], *_window(), limit=1)[0]
+    started = time.perf_counter()
+    wins = _race(
+        lambda i: AppointmentService.reschedule_appointment(
+            appointments[i], None, movers[i],
+            new_slot_date=target['slot_date'], new_start_time=target['start_time']
+        )[0] is not None,
+        args.threads
+    )
+    elapsed = time.perf_counter() - started
+    conn = get_db()
+    slot = conn.execute(
+        'SELECT * FROM slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+        (doctor_id, target['slot_date'], target['start_time'])
+    ).fetchone()
+    results.append(_report('reschedule / threads', sum(wins), 1, _bookings_for(conn, slot['id']), elapsed))
+
+    # 4. An emergency-cancelled slot is rebooked, then the first patient reschedules
+    first, second = patient_ids[args.threads + args.processes:args.threads + args.processes + 2]
+    slot = AvailabilityService.next_open_slots([doctor_id], *_window(), limit=1)[0]
+    appointment, err = AppointmentService.book_appointment(
+        first, doctor_id, slot_date=slot['slot_date'], start_time=slot['start_time']
+    )
+    if err:
+        raise SystemExit(f"Could not seed emergency appointment: {err}")
+    AppointmentService.emergency_cancel(appointment['id'], doctor_id)
+    rebooked, err = AppointmentService.book_appointment(second, doctor_id, slot_id=appointment['slot_id'])
+    if err:
+        raise SystemExit(f"Could not rebook the emergency-cancelled slot: {err}")
+    target = AvailabilityService.next_open_slots([doctor_id], *_window(), limit=1)[0]
+    moved, err = AppointmentService.reschedule_appointment(
+        appointment['id'], None, first, new_slot_date=target['slot_date'], new_start_time=target['start_time']
+    )
+    conn = get_db()
+    still_booked = conn.execute('SELECT is_booked FROM slots WHERE id = ?', (appointment['slot_id'],)).fetchone()[0]
+    ok = moved is not None and still_booked == 1
+    print(f"{'reschedule / rebooked':<22} moved={moved is not None!s:<5} rebooked slot is_booked={still_booked}"
+          f"{'':>12}{'OK' if ok else 'FAIL'}")
+    results.append(ok)
+
+    booked = conn.execute('SELECT COUNT(*) FROM slots WHERE doctor_id = ? AND is_booked = 1', (doctor_id,)).fetchone()[0]
+    live = conn.execute('SELECT COUNT(DISTINCT slot_id) FROM appointments').fetchone()[0]
+    consistent = booked == live
+    print(f"booked slots={booked} slots with appointments={live}  {'OK' if consistent else 'FAIL'}")
+
+    if not (all(results) and consistent):
+        sys.exit(1)
+    print("Exactly one winner per race.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,25 @@
 import sqlite3
 import os
+import sys
 
 # Use same location as app: project root + DATABASE_PATH or 'medsync.db'
-PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from backend.utils.database import migrate_columns  # noqa: E402
+
 DB_PATH = os.path.join(PROJECT_ROOT, os.environ.get('DATABASE_PATH', 'medsync.db'))
+SCHEMA_PATH = os.path.join(PROJECT_ROOT, 'backend', 'schema.sql')
 
 
 def update_schema():
     conn = sqlite3.connect(DB_PATH)
     try:
+        # Columns added to existing tables since the first release, before anything indexes
+        # them (init_db runs the same step on app start)
+        for change in migrate_columns(conn):
+            print(change)
+
         # Add is_verified to users
         try:
             conn.execute("ALTER TABLE users ADD COLUMN is_verified INTEGER DEFAULT 0")
@@ -71,6 +82,76 @@ def update_schema():
         )
         print("Created doctor_availability_rules table and index.")
 
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS doctor_schedule_versions (
+                doctor_id INTEGER PRIMARY KEY,
+                rules_version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+            )
+        """)
+        print("Created doctor_schedule_versions table.")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS slot_holds (
+                hold_token TEXT PRIMARY KEY,
+                doctor_id INTEGER NOT NULL,
+                patient_id INTEGER NOT NULL,
+                slot_date TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                expires_at TIMESTAMP NOT NULL,
+                appointment_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE,
+                FOREIGN KEY (patient_id) REFERENCES users(id) ON DELETE CASCADE,
+                UNIQUE(doctor_id, slot_date, start_time)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_expires ON slot_holds(expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_appointment ON slot_holds(appointment_id)")
+        print("Created slot_holds table.")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS waitlist_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patient_id INTEGER NOT NULL,
+                doctor_id INTEGER,
+                specialization TEXT,
+                window_start TEXT NOT NULL,
+                window_end TEXT NOT NULL,
+                earliest_time TEXT NOT NULL DEFAULT '00:00',
+                latest_time TEXT NOT NULL DEFAULT '23:59',
+                status TEXT DEFAULT 'waiting' CHECK(status IN ('waiting', 'offered', 'fulfilled', 'cancelled', 'expired')),
+                offer_hold_token TEXT,
+                offer_doctor_id INTEGER,
+                offer_slot_date TEXT,
+                offer_start_time TEXT,
+                offered_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (patient_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY (doctor_id) REFERENCES doctors(id) ON DELETE CASCADE
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_entries_patient_status ON waitlist_entries(patient_id, status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_entries_offer ON waitlist_entries(offer_hold_token)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_entries_status_end ON waitlist_entries(status, window_end)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS waitlist_index (
+                target TEXT NOT NULL,
+                wait_date TEXT NOT NULL,
+                entry_id INTEGER NOT NULL,
+                patient_id INTEGER NOT NULL,
+                earliest_time TEXT NOT NULL,
+                latest_time TEXT NOT NULL,
+                PRIMARY KEY (target, wait_date, entry_id),
+                FOREIGN KEY (entry_id) REFERENCES waitlist_entries(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_index_entry ON waitlist_index(entry_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_waitlist_index_date ON waitlist_index(wait_date)")
+        print("Created waitlist tables.")
+
         # Backfill recurring rules from existing slots so older databases can adopt the new flow.
         existing_rule_count = conn.execute("SELECT COUNT(*) FROM doctor_availability_rules").fetchone()[0]
         if existing_rule_count == 0:
@@ -97,6 +178,67 @@ def update_schema():
             if rows:
                 print(f"Backfilled {len(rows)} recurring availability rules from existing slots.")
 
+        # Open slots are now derived from the weekly rules; only stateful rows stay in `slots`
+        conn.execute("DROP TABLE IF EXISTS slot_generation_watermarks")
+        removed = conn.execute(
+            """
+            DELETE FROM slots
+            WHERE is_booked = 0 AND is_blocked = 0
+              AND NOT EXISTS (SELECT 1 FROM appointments a WHERE a.slot_id = slots.id)
+            """
+        ).rowcount
+        print(f"Removed {removed} pre-generated open slots (now derived from weekly rules).")
+
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notifications_user_type_read ON notifications(user_id, recipient_type, is_read)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notifications_doctor_type_read ON notifications(doctor_id, recipient_type, is_read)"
+        )
+
+        # Hot-path indexes (index set v1)
+        index_set_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if index_set_version < 1:
+            for statement in (
+                "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments(patient_id)",
+                "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_status ON appointments(doctor_id, status)",
+                "CREATE INDEX IF NOT EXISTS idx_appointments_slot ON appointments(slot_id)",
+                "CREATE INDEX IF NOT EXISTS idx_appointments_created ON appointments(created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_slots_doctor_date_booked ON slots(doctor_id, slot_date, is_booked)",
+                "CREATE INDEX IF NOT EXISTS idx_chat_history_user_session_created ON chat_history(user_id, session_id, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_chat_history_user_created ON chat_history(user_id, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_chat_history_created ON chat_history(created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_notifications_user_type_read ON notifications(user_id, recipient_type, is_read)",
+            ):
+                conn.execute(statement)
+
+            conn.execute("PRAGMA user_version = 1")
+            print("Created hot-path indexes (index set v1).")
+        else:
+            print(f"Hot-path indexes already at index set v{index_set_version}.")
+
+        # Keyset pagination indexes (index set v2)
+        if index_set_version < 2:
+            for statement in (
+                "CREATE INDEX IF NOT EXISTS idx_users_role_created ON users(role, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_doctors_created ON doctors(created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_doctors_verified_rating ON doctors(verified, rating)",
+                "CREATE INDEX IF NOT EXISTS idx_notifications_user_type_created ON notifications(user_id, recipient_type, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_notifications_doctor_type_created ON notifications(doctor_id, recipient_type, created_at)",
+            ):
+                conn.execute(statement)
+
+            conn.execute("PRAGMA user_version = 2")
+            print("Created keyset pagination indexes (index set v2).")
+
+        # Doctor search FTS5 index, its sync triggers and the backfill live in schema.sql;
+        # every column they reference exists by now, so apply the schema file as-is
+        conn.commit()
+        with open(SCHEMA_PATH) as f:
+            conn.executescript(f.read())
+        indexed = conn.execute("SELECT COUNT(*) FROM doctor_search").fetchone()[0]
+        print(f"Doctor search index covers {indexed} doctors.")
+
         conn.commit()
     except Exception as e:
         print(f"Update failed: {e}")
@@ -47,6 +47,50 @@ const API = {
         return res.json();
     },
 
+    // POST and read a Server-Sent Events reply, calling onEvent(name, data) for each event.
+    // Resolves null once the stream ends; a non-SSE reply (an error envelope) resolves to its JSON.
+    async stream(url, data, onEvent) {
+        const res = await fetch(this.baseUrl + url, {
+            method: 'POST',
+            credentials: 'include',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(data)
+        });
+        if (!res.body || !(res.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+            return res.json();
+        }
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let end;
+            while ((end = buffer.indexOf('\n\n')) >= 0) {
+                const frame = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                let event = 'message', payload = '';
+                for (const line of frame.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) payload += line.slice(5).trim();
+                }
+                if (payload) onEvent(event, JSON.parse(payload));
+            }
+        }
+        return null;
+    },
+
+    // GET one page of a cursor-paginated list; pass the previous page's next_cursor for the page after it
+    async getPage(url, cursor = null) {
+        if (!cursor) return this.get(url);
+        const sep = url.includes('?') ? '&' : '?';
+        return this.get(`${url}${sep}cursor=${encodeURIComponent(cursor)}`);
+    },
+
     async checkSession() {
         try {
             const result = await this.get('/api/auth/session');
@@ -135,9 +135,8 @@ def seed():
 
     print(f"  Seeded {len(mappings)} disease mappings")
 
-    # Seed recurring weekly availability and generate the current month of slots.
+    # Seed recurring weekly availability; open slots are derived from these rules.
     print("Seeding recurring weekly availability...")
-    from datetime import datetime
     from backend.services.appointment_service import AppointmentService
 
     doctor_ids = query_db('SELECT id FROM doctors')
@@ -164,16 +163,9 @@ def seed():
         if err:
             raise RuntimeError(err)
 
-        month_start, month_end = AppointmentService._month_bounds(datetime.now())
-        month_slots = query_db(
-            '''SELECT COUNT(*) as c FROM slots
-               WHERE doctor_id = ? AND slot_date BETWEEN ? AND ?''',
-            (doc['id'], month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d')),
-            one=True
-        )
-        slot_count += month_slots['c'] if month_slots else 0
+        slot_count += len(AppointmentService.get_available_slots(doc['id']))
 
-    print(f"  Seeded {slot_count} availability slots")
+    print(f"  {slot_count} open slots this month (derived from weekly rules)")
 
     # Seed a test patient
     print("Seeding test patient...")
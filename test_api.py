@@ -41,8 +41,11 @@ assert len(slots) > 0, "No slots available"
 print(f"✓ Doctor 1 slots: {len(slots)}")
 
 # Book first available slot
-slot_id = slots[0]['id']
-r = s.post(f'{BASE}/api/appointments/book', json={'slot_id': slot_id})
+# Open slots are rule-derived (no id until booked), so book by doctor/date/time
+slot = slots[0]
+r = s.post(f'{BASE}/api/appointments/book', json={
+    'doctor_id': 1, 'slot_date': slot['slot_date'], 'start_time': slot['start_time']
+})
 assert r.json()['success'], f"Booking failed: {r.json()}"
 apt = r.json()['data']
 apt_id = apt['id']